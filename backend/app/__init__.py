@@ -1,18 +1,80 @@
 from flask import Flask
 from flask_cors import CORS
 import os
+from .jobs import JobManager
+from .utils.checkpoint_manager import CheckpointManager, DEFAULT_CHECKPOINT_DIR, JOB_CHECKPOINT_PREFIX
+from .utils.ingest import UploadRequest
+from .utils.janitor import FileJanitor
+from .utils.result_cache import DEFAULT_CACHE_PATH
+from .utils.result_store import DEFAULT_STORE_PATH
 
 def create_app():
     app = Flask(__name__)
     CORS(app)  # Enable CORS for all routes
+    # Spool uploads straight into UPLOAD_FOLDER so routes can keep them without a copy
+    app.request_class = UploadRequest
     
     # Configure upload and output folders
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), '../uploads')
     app.config['OUTPUT_FOLDER'] = os.path.join(os.path.dirname(__file__), '../output')
+
+    # Number of websites crawled concurrently by the email extractor
+    app.config['EMAIL_CONCURRENCY'] = int(os.getenv('EMAIL_CONCURRENCY', 200))
+    # Number of websites checked concurrently by the site filters
+    app.config['FILTER_CONCURRENCY'] = int(os.getenv('FILTER_CONCURRENCY', 100))
+
+    # On-disk cache of probe and email results shared across jobs
+    app.config['RESULT_CACHE_PATH'] = os.getenv('RESULT_CACHE_PATH', DEFAULT_CACHE_PATH)
+    app.config['PROBE_CACHE_TTL'] = float(os.getenv('PROBE_CACHE_TTL', 6 * 3600))
+    app.config['EMAIL_CACHE_TTL'] = float(os.getenv('EMAIL_CACHE_TTL', 7 * 24 * 3600))
+    app.config['RESULT_CACHE_MAX_ENTRIES'] = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 200000))
+
+    # Permanent, queryable store of every job's sites and emails
+    app.config['RESULT_STORE_PATH'] = os.getenv('RESULT_STORE_PATH', DEFAULT_STORE_PATH)
+
+    # Number of pipeline jobs run at the same time in the background. Jobs live
+    # in this process, so serve the app from a single process (gunicorn.conf.py).
+    # Streamed rows are kept in memory for JOB_ROW_RETENTION seconds after a job ends.
+    app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 4))
+    app.config['JOB_ROW_RETENTION'] = float(os.getenv('JOB_ROW_RETENTION', 300))
+    app.extensions['jobs'] = JobManager(max_workers=app.config['JOB_WORKERS'],
+                                        row_retention=app.config['JOB_ROW_RETENTION'])
+
+    # Checkpoints let interrupted jobs resume; progress is saved every CHECKPOINT_INTERVAL seconds.
+    # Their file names carry a prefix so cleanup never touches other files in the folder.
+    app.config['CHECKPOINT_FOLDER'] = os.getenv('CHECKPOINT_FOLDER', DEFAULT_CHECKPOINT_DIR)
+    app.config['CHECKPOINT_INTERVAL'] = float(os.getenv('CHECKPOINT_INTERVAL', 10))
+    app.config['CHECKPOINT_MAX_AGE_DAYS'] = int(os.getenv('CHECKPOINT_MAX_AGE_DAYS', 7))
+    app.extensions['checkpoints'] = CheckpointManager(app.config['CHECKPOINT_FOLDER'], prefix=JOB_CHECKPOINT_PREFIX)
     
     # Ensure directories exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+
+    # Outputs and uploads untouched for longer than their TTL (0 keeps them), and
+    # job checkpoints older than CHECKPOINT_MAX_AGE_DAYS, are deleted by
+    # `flask --app run cleanup`, or every JANITOR_INTERVAL seconds by the server
+    # when JANITOR_ENABLED is set, as gunicorn.conf.py does. Scripts and tests
+    # creating the app never delete anything. Uploads are kept as long as the
+    # checkpoints that may resume from them by default.
+    app.config['OUTPUT_TTL_HOURS'] = float(os.getenv('OUTPUT_TTL_HOURS', 24))
+    app.config['UPLOAD_TTL_HOURS'] = float(os.getenv('UPLOAD_TTL_HOURS', app.config['CHECKPOINT_MAX_AGE_DAYS'] * 24))
+    app.config['JANITOR_INTERVAL'] = float(os.getenv('JANITOR_INTERVAL', 3600))
+    app.config['JANITOR_ENABLED'] = os.getenv('JANITOR_ENABLED', '').lower() in ('1', 'true', 'yes', 'on')
+    app.extensions['janitor'] = FileJanitor({
+        app.config['OUTPUT_FOLDER']: app.config['OUTPUT_TTL_HOURS'] * 3600,
+        app.config['UPLOAD_FOLDER']: app.config['UPLOAD_TTL_HOURS'] * 3600,
+    }, interval=app.config['JANITOR_INTERVAL'], tasks=[
+        lambda: app.extensions['checkpoints'].cleanup_old_checkpoints(app.config['CHECKPOINT_MAX_AGE_DAYS'])
+    ])
+    if app.config['JANITOR_ENABLED']:
+        app.extensions['janitor'].start()
+
+    @app.cli.command('cleanup')
+    def cleanup_command():
+        """Delete expired outputs, uploads and job checkpoints once."""
+        removed = app.extensions['janitor'].sweep()
+        print(f"Removed {removed} expired files and checkpoints")
     
     # Register blueprints
     from .routes import main
@@ -0,0 +1,154 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# The scan is driven by "at" anchors: a literal '@', its HTML/percent encodings
+# (&#64;, &#x40;, &commat;, %40) and bracketed obfuscations such as [at] or
+# (at). The anchor pattern starts with a character set and checks the rest
+# with lookbehinds, which lets the regex engine skip quickly through the page.
+# Each anchor is then expanded backwards into the local part and forwards into
+# the domain. A pattern such as "[chars]+@domain" instead retries at every
+# position of the page, which dominates run time on multi-megabyte HTML.
+AT_ANCHOR = re.compile(
+    r"[@&%\[({](?:(?<=@)"
+    r"|(?<=&)(?:#0*64;|#[xX]0*40;|commat;)"
+    r"|(?<=%)40"
+    r"|(?<=[\[({])[ \t]*[aA][tT][ \t]*[\])}][ \t]*)"
+)
+MAX_LOCAL_LENGTH = 64
+LOCAL_PART_REVERSED = re.compile(r"[a-zA-Z0-9._%+-]+")
+DOMAIN_PART = re.compile(r"[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+OBFUSCATED_DOMAIN_PART = re.compile(
+    r"[a-zA-Z0-9-]+(?:(?:\.|&#0*46;|[ \t]*[\[({][ \t]*[dD][oO][tT][ \t]*[\])}][ \t]*)[a-zA-Z0-9-]+)+"
+)
+DOT_MARKER = re.compile(r"&#0*46;|[ \t]*[\[({][ \t]*[dD][oO][tT][ \t]*[\])}][ \t]*")
+
+# <script>/<style> bodies are skipped, except JSON-LD which stores use to
+# publish their contact email. The body is matched with an unrolled loop
+# instead of ".*?" so long scripts are consumed in large steps.
+SKIPPED_BLOCK = re.compile(
+    r"<(script|style)\b(?![^>]*ld\+json)[^>]*>[^<]*(?:<(?!/\1)[^<]*)*</\1\s*>",
+    re.IGNORECASE
+)
+
+# Common placeholder addresses from templates and form hints
+PLACEHOLDERS = ('example', 'yourname', 'youremail', 'username', 'domain')
+
+# "Top level domains" that are really file extensions, e.g. logo@2x.png
+FILE_EXTENSIONS = frozenset((
+    'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp', 'avif', 'ico', 'bmp', 'tif', 'tiff',
+    'css', 'js', 'json', 'map', 'woff', 'woff2', 'ttf', 'eot', 'mp4', 'webm', 'pdf'
+))
+
+
+class EmailExtractor:
+    """
+    Single-pass email extractor for large HTML pages.
+
+    Every pattern is compiled once at import time and the page is walked once
+    from anchor to anchor, decoding obfuscations, skipping script/style bodies
+    and image file names, and deduplicating as it goes.
+    """
+
+    def __init__(self, placeholders: Iterable[str] = PLACEHOLDERS,
+                 file_extensions: Iterable[str] = FILE_EXTENSIONS):
+        self.placeholders = tuple(placeholders)
+        self.file_extensions = frozenset(file_extensions)
+        self._placeholder_pattern = re.compile('|'.join(map(re.escape, self.placeholders)) or r'(?!)')
+
+    def is_valid(self, email: str) -> bool:
+        """Check a lowercased address against file-extension and placeholder rules."""
+        if email.rsplit('.', 1)[1] in self.file_extensions:
+            return False
+        return self._placeholder_pattern.search(email) is None
+
+    def _domain_at(self, text: str, position: int, obfuscated: bool):
+        """Return ``(domain, end)`` for the domain starting at ``position``, decoding obfuscated dots."""
+        if not obfuscated:
+            match = DOMAIN_PART.match(text, position)
+            return (match.group(), match.end()) if match else (None, position)
+        match = OBFUSCATED_DOMAIN_PART.match(text, position)
+        if match is None:
+            return None, position
+        domain = DOMAIN_PART.match(DOT_MARKER.sub('.', match.group()))
+        return (domain.group(), match.end()) if domain else (None, position)
+
+    def iter_candidates(self, text: str) -> Iterator[str]:
+        """Yield decoded address candidates in document order, skipping file names."""
+        skipped = SKIPPED_BLOCK.finditer(text)
+        block = next(skipped, None)
+        last_end = 0
+        for anchor in AT_ANCHOR.finditer(text):
+            start = anchor.start()
+            if start < last_end:
+                continue
+            while block is not None and block.end() <= start:
+                block = next(skipped, None)
+            if block is not None and block.start() <= start:
+                continue
+
+            # Cheap forward checks first: most '@' on storefront pages are
+            # retina image names such as logo@2x.png
+            plain = text[start] == '@'
+            domain, domain_end = self._domain_at(text, anchor.end(), obfuscated=not plain)
+            if domain is None or domain.rsplit('.', 1)[1].lower() in self.file_extensions:
+                continue
+
+            local_end = start
+            while not plain and local_end > last_end and text[local_end - 1] in ' \t':
+                local_end -= 1
+            window_start = max(last_end, local_end - MAX_LOCAL_LENGTH)
+            local = LOCAL_PART_REVERSED.match(text[window_start:local_end][::-1])
+            if local is None:
+                continue
+            if (local.end() == local_end - window_start and window_start > last_end
+                    and LOCAL_PART_REVERSED.match(text, window_start - 1)):
+                # The local part runs past MAX_LOCAL_LENGTH: no valid address,
+                # and its tail alone would be one the page never contained
+                continue
+
+            last_end = domain_end
+            yield local.group()[::-1] + '@' + domain
+
+    def extract(self, text: str, limit: Optional[int] = None,
+                seen: Optional[Dict[str, None]] = None) -> List[str]:
+        """
+        Extract unique emails from text.
+
+        Addresses are returned lowercased, and deduplicated in that form, so
+        "Info@Shop.com" and "info@shop.com" on one site count as one email.
+
+        Args:
+            text: HTML or plain text to scan
+            limit: Stop scanning once this many unique emails are known
+            seen: Ordered dict of emails already found, updated in place so
+                callers can scan a page in several pieces
+
+        Returns:
+            List of unique emails found in this text, in document order
+        """
+        if seen is None:
+            seen = {}
+        found = []
+        if limit is not None and len(seen) >= limit:
+            return found
+        rejected = set()
+        for candidate in self.iter_candidates(text):
+            email = candidate.lower()
+            if email in seen or email in rejected:
+                continue
+            if not self.is_valid(email):
+                rejected.add(email)
+                continue
+            seen[email] = None
+            found.append(email)
+            if limit is not None and len(seen) >= limit:
+                break
+        return found
+
+
+default_extractor = EmailExtractor()
+
+
+def extract_emails(text: str, limit: Optional[int] = None) -> List[str]:
+    """Extract unique emails from text with the default extractor."""
+    return default_extractor.extract(text, limit=limit)
@@ -1,12 +1,20 @@
-import csv
 import re
-import requests
+import asyncio
+import aiohttp
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse, urljoin
-import concurrent.futures
-import time
 import logging
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+from .email_extractor import extract_emails
+from ..utils.body_scanner import (DEFAULT_MAX_BYTES, EmailScanner, extract_body_emails, read_body,
+                                  response_encoding, scan_response)
+from ..utils.dns_cache import CachingResolver
+from ..utils.host_health import HostHealth, HostUnavailable, host_health, polite_request
+from ..utils.parse_pool import ParseExecutor, parse_executor
+from ..utils.ingest import UrlSource
+from ..utils.output import open_row_writer
+from ..utils.metrics import IN_FLIGHT, SITE_SECONDS, SITES, TIMEOUTS, MeteredQueue, http_trace
+from ..utils.result_cache import ResultCache
+from ..utils.site_memo import SiteMemo
 
 # Set up logging
 logging.basicConfig(
@@ -19,42 +27,66 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def extract_emails_from_text(text):
-    """Extract email addresses from text using a more comprehensive regex pattern."""
-    # More comprehensive email regex pattern
-    email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-    
-    # Find all matches
-    emails = re.findall(email_pattern, text)
-    
-    # Filter out common false positives and invalid emails
-    filtered_emails = []
-    for email in emails:
-        # Skip emails with invalid characters after the @ symbol
-        if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
+def extract_emails_from_text(text, limit=None):
+    """Extract unique email addresses from text in a single precompiled pass."""
+    return extract_emails(text, limit=limit)
+
+DEFAULT_HEADERS = {
+    # User-Agent to mimic a browser
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Fallback pages guessed when the homepage links to no contact page
+CONTACT_PATHS = ['/contact', '/contact-us', '/about', '/about-us']
+
+# Anchors whose href or text mention one of these words are crawled as contact pages
+CONTACT_LINK_PATTERN = re.compile(r'<a\s[^>]*?href\s*=\s*["\']([^"\'#]+)["\'][^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+CONTACT_KEYWORDS = ('contact', 'about', 'reach-us', 'get-in-touch', 'support', 'impressum')
+
+
+def find_contact_links(html, base_url, max_links=5):
+    """
+    Find same-site contact/about links in a page.
+
+    Args:
+        html: Page HTML
+        base_url: URL the page was fetched from, used to resolve relative links
+        max_links: Maximum number of links to return
+
+    Returns:
+        List of absolute URLs in document order
+    """
+    base_host = urlparse(base_url).netloc.lower()
+    links = []
+    for href, text in CONTACT_LINK_PATTERN.findall(html):
+        target = (href + ' ' + text).lower()
+        if not any(keyword in target for keyword in CONTACT_KEYWORDS):
             continue
-        
-        # Skip emails with common placeholders
-        if any(placeholder in email.lower() for placeholder in ['example', 'yourname', 'youremail', 'username', 'domain']):
+        link = urljoin(base_url, href.strip())
+        parsed = urlparse(link)
+        if parsed.scheme not in ('http', 'https') or parsed.netloc.lower() != base_host:
             continue
-            
-        filtered_emails.append(email)
-    
-    return filtered_emails
-
-def create_session():
-    """Create a requests session with retry capability."""
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=3,
-        backoff_factor=0.5,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["GET", "HEAD"]
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
+        if link.rstrip('/') == base_url.rstrip('/') or link in links:
+            continue
+        links.append(link)
+        if len(links) >= max_links:
+            break
+    return links
+
+
+def parse_homepage(body: bytes, encoding: str, url: str, limit: Optional[int] = None,
+                   max_links: int = 5) -> Tuple[List[str], List[str]]:
+    """
+    Decode a homepage and return its emails and contact links.
+
+    Module-level so a ParseExecutor can run it in a worker process.
+    """
+    html = body.decode(encoding, errors='replace')
+    emails = extract_emails_from_text(html, limit=limit)
+    if limit is not None and len(emails) >= limit:
+        return emails, []
+    return emails, find_contact_links(html, url, max_links)
+
 
 def normalize_url(url):
     """Normalize URL by adding scheme if missing."""
@@ -62,161 +94,360 @@ def normalize_url(url):
         url = 'https://' + url
     return url
 
+
+class EmailFetcher:
+    """
+    Asynchronous email crawler sharing one pooled HTTP client across all sites.
+
+    A single aiohttp connector is created per fetcher, so TCP/TLS connections,
+    keep-alive sockets and DNS lookups are reused between sites instead of
+    being thrown away after every website.
+    """
+
+    def __init__(self, concurrency: int = 200, connection_limit: Optional[int] = None,
+                 limit_per_host: int = 4, timeout: int = 15, contact_timeout: int = 10,
+                 dns_cache_ttl: int = 300, keepalive_timeout: int = 30,
+                 site_deadline: float = 30, stop_after: Optional[int] = None,
+                 max_contact_pages: int = 5, max_body_bytes: int = DEFAULT_MAX_BYTES,
+                 cache: Optional[ResultCache] = None, resolver: Optional[CachingResolver] = None,
+                 health: HostHealth = host_health, parser: ParseExecutor = parse_executor):
+        self.concurrency = concurrency
+        self.connection_limit = connection_limit or concurrency * 2
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.contact_timeout = contact_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.site_deadline = site_deadline
+        self.stop_after = stop_after
+        self.max_contact_pages = max_contact_pages
+        self.max_body_bytes = max_body_bytes
+        self.cache = cache
+        self.resolver = resolver
+        self._owns_resolver = resolver is None
+        self.health = health
+        self.parser = parser
+        self.session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        if self.resolver is None:
+            self.resolver = CachingResolver()
+        connector = aiohttp.TCPConnector(
+            limit=self.connection_limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+            resolver=self.resolver
+        )
+        self.session = aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS,
+                                             trace_configs=[http_trace('emails')])
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.session:
+            await self.session.close()
+            self.session = None
+        if self._owns_resolver and self.resolver is not None:
+            await self.resolver.close()
+            self.resolver = None
+
+    async def fetch_page(self, url: str, timeout: int,
+                         raise_for_status: bool = False) -> Optional[Tuple[bytes, str]]:
+        """
+        Fetch a page and return at most ``max_body_bytes`` of its raw body with
+        its encoding, or None for non-200 responses.
+        """
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        async with polite_request(self.session, 'GET', url, health=self.health, timeout=client_timeout) as response:
+            if raise_for_status:
+                response.raise_for_status()
+            if response.status != 200:
+                return None
+            return await read_body(response, self.max_body_bytes), response_encoding(response)
+
+    async def scan_page(self, url: str, timeout: int) -> List[str]:
+        """
+        Extract the emails of a page. Inline, the page is streamed through an
+        EmailScanner that stops once ``stop_after`` emails are found;
+        otherwise the body is read and parsed on the parse pool.
+        """
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        async with polite_request(self.session, 'GET', url, health=self.health, timeout=client_timeout) as response:
+            if response.status != 200:
+                return []
+            encoding = response_encoding(response)
+            if self.parser.inline:
+                scanner = EmailScanner(encoding, limit=self.stop_after)
+                await scan_response(response, scanner, self.max_body_bytes)
+                return scanner.found
+            body = await read_body(response, self.max_body_bytes)
+        return await self.parser.run(extract_body_emails, body, encoding, self.stop_after)
+
+    def _has_enough(self, emails) -> bool:
+        return self.stop_after is not None and len(emails) >= self.stop_after
+
+    async def _fetch_contact_page(self, contact_url: str) -> List[str]:
+        try:
+            logger.debug(f"Checking contact page: {contact_url}")
+            return await self.scan_page(contact_url, self.contact_timeout)
+        except HostUnavailable:
+            # The host started failing during this crawl; skip its remaining pages quietly
+            return []
+        except Exception as e:
+            logger.debug(f"Failed to fetch contact page {contact_url}: {e}")
+            return []
+
+    async def _crawl_site(self, url: str, emails: Dict[str, None]) -> None:
+        """
+        Fetch the homepage, then every candidate contact page in parallel.
+
+        Emails are collected into the ordered ``emails`` dict as soon as each
+        page completes, so whatever was found survives a deadline cancellation.
+        """
+        page = await self.fetch_page(url, self.timeout, raise_for_status=True)
+        candidates = []
+        if page:
+            body, encoding = page
+            found, candidates = await self.parser.run(parse_homepage, body, encoding, url, self.stop_after,
+                                                      self.max_contact_pages)
+            emails.update(dict.fromkeys(found))
+        if self._has_enough(emails):
+            return
+
+        # Prefer contact links advertised on the homepage over guessed paths
+        if not candidates:
+            parsed_url = urlparse(url)
+            base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+            candidates = [urljoin(base_url, path) for path in CONTACT_PATHS]
+
+        tasks = [asyncio.ensure_future(self._fetch_contact_page(link)) for link in candidates]
+        try:
+            for future in asyncio.as_completed(tasks):
+                emails.update(dict.fromkeys(await future))
+                if self._has_enough(emails):
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def fetch_emails(self, url: str) -> List[str]:
+        """Fetch and extract emails from a given URL and its contact pages."""
+        if self.session is None:
+            raise RuntimeError("EmailFetcher must be used as an async context manager (async with EmailFetcher())")
+        url = normalize_url(url)
+        if self.cache is not None:
+            cached = self.cache.get_emails(url)
+            if cached is not None:
+                return cached
+
+        # Skip dead and failing hosts before they take a crawl slot
+        if not await self.resolver.resolves(url):
+            logger.debug(f"Skipping {url}: domain does not resolve")
+            SITES.labels('emails', 'skipped').inc()
+            return []
+        if not self.health.available(url):
+            logger.debug(f"Skipping {url}: host keeps failing")
+            SITES.labels('emails', 'skipped').inc()
+            return []
+
+        async with self._semaphore:
+            emails = {}
+            crawled = False
+            with IN_FLIGHT.labels('emails').track_inprogress(), SITE_SECONDS.labels('emails').time():
+                try:
+                    logger.debug(f"Fetching emails from: {url}")
+                    await asyncio.wait_for(self._crawl_site(url, emails), timeout=self.site_deadline)
+                    crawled = True
+                except asyncio.TimeoutError:
+                    TIMEOUTS.labels('emails', 'site_deadline').inc()
+                    if emails:
+                        crawled = True
+                        logger.debug(f"Site deadline reached for {url}, keeping {len(emails)} emails")
+                    else:
+                        logger.debug(f"Failed to fetch {url}: timed out")
+                except (aiohttp.ClientError, HostUnavailable) as e:
+                    # Expected for part of any list; counted in the sites metric rather than logged
+                    logger.debug(f"Failed to fetch {url}: {e}")
+                except Exception as e:
+                    logger.error(f"Unknown error with {url}: {e}")
+            SITES.labels('emails', 'failed' if not crawled else 'found' if emails else 'empty').inc()
+
+            # Only successful crawls are cached; failures are retried next time
+            if crawled and self.cache is not None:
+                self.cache.put_emails(url, list(emails))
+
+            # Return unique emails
+            return list(emails)
+
+
 def fetch_emails_from_url(url):
-    """Fetch and extract emails from a given URL and its contact page."""
-    # Create a requests session with retry capability
-    session = create_session()
-    
-    # Normalize the URL
-    url = normalize_url(url)
-    
-    emails = []
+    """Fetch and extract emails from a single URL and its contact pages."""
+    async def run():
+        async with EmailFetcher(concurrency=1) as fetcher:
+            return await fetcher.fetch_emails(url)
+
+    return asyncio.run(run())
+
+
+async def iter_website_emails(fetcher, websites, concurrency):
+    """
+    Stream ``(index, website, emails)`` results for ``(index, website)`` pairs
+    through a bounded worker pool.
+
+    A reader feeds rows into a bounded queue, ``concurrency`` workers crawl
+    continuously and push into a bounded result queue that the caller drains.
+    Both queues hold at most ``2 * concurrency`` items, so memory stays flat
+    regardless of input size. Results are yielded in completion order.
+
+    Each site is crawled once from its root URL; other rows of the same site
+    get the same emails.
+    """
+    done = object()
+    row_queue = MeteredQueue('email_rows', maxsize=concurrency * 2)
+    result_queue = MeteredQueue('email_results', maxsize=concurrency * 2)
+    memo = SiteMemo(fetcher.fetch_emails)
+
+    async def read_rows():
+        # Hosts are resolved while rows wait in the queue
+        for item in fetcher.resolver.prefetch(websites, lambda item: item[1]):
+            await row_queue.put(item)
+        for _ in range(concurrency):
+            await row_queue.put(done)
+
+    async def work():
+        while True:
+            item = await row_queue.get()
+            if item is done:
+                return
+            index, website = item
+            emails = await memo.run(website)
+            await result_queue.put((index, website, emails))
+
+    async def run_workers():
+        try:
+            await asyncio.gather(read_rows(), *(work() for _ in range(concurrency)))
+        except Exception as e:
+            await result_queue.put(e)
+            return
+        await result_queue.put(done)
+
+    producer = asyncio.ensure_future(run_workers())
     try:
-        # User-Agent to mimic a browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        logger.info(f"Fetching emails from: {url}")
-        response = session.get(url, timeout=15, headers=headers)
-        response.raise_for_status()
-        
-        # Extract emails from the main page
-        page_emails = extract_emails_from_text(response.text)
-        emails.extend(page_emails)
-        
-        # Parse domain for creating absolute URLs
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        
-        # Look for contact pages
-        contact_paths = ['/contact', '/contact-us', '/about', '/about-us']
-        for path in contact_paths:
-            try:
-                contact_url = urljoin(base_url, path)
-                logger.info(f"Checking contact page: {contact_url}")
-                
-                response = session.get(contact_url, timeout=10, headers=headers)
-                if response.status_code == 200:
-                    contact_emails = extract_emails_from_text(response.text)
-                    emails.extend(contact_emails)
-            except Exception as e:
-                logger.warning(f"Failed to fetch contact page {path}: {e}")
-        
-        # Return unique emails
-        return list(set(emails))
-    
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to fetch {url}: {e}")
-        return []
-    except Exception as e:
-        logger.error(f"Unknown error with {url}: {e}")
-        return []
-
-def process_website(row, fieldnames):
-    """Process a single website row and return the result."""
-    # Extract website URL from various possible column names
-    website = None
-    for field in ['Website', 'URL', 'Domain', 'Site']:
-        if field in fieldnames and row.get(field):
-            website = row[field].strip()
-            break
-    
-    # If no website found in known fields, use the first value
-    if not website and row:
-        website = list(row.values())[0].strip()
-    
-    # Skip empty websites
-    if not website:
-        return None, []
-    
-    # Fetch emails
-    emails = fetch_emails_from_url(website)
-    return website, emails
+        while True:
+            result = await result_queue.get()
+            if result is done:
+                break
+            if isinstance(result, Exception):
+                raise result
+            yield result
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        row_queue.close()
+        result_queue.close()
+
 
-def fetch_emails_from_csv(input_csv_path, output_csv_path, max_workers=5):
+def fetch_emails_from_csv(input_csv_path, output_csv_path, max_workers=200, site_deadline=30, stop_after=None,
+                          cache=None, progress=None, should_stop=None, on_result=None, checkpoint=None,
+                          recorder=None):
     """
     Extract emails from websites listed in a CSV file and save results.
     
     Args:
         input_csv_path: Path to the CSV file containing websites
         output_csv_path: Path to save the extracted emails
-        max_workers: Maximum number of concurrent workers
+        max_workers: Maximum number of websites crawled concurrently
+        site_deadline: Seconds allowed for crawling a single website
+        stop_after: Stop crawling a website once this many emails are found
+        cache: Optional ResultCache consulted before crawling each domain
+        progress: Optional callback receiving (websites processed, None, input bytes read, input size)
+        should_stop: Optional callable polled after each website to cancel the run
+        on_result: Optional callback receiving each output row as soon as it is written
+        checkpoint: Optional JobCheckpoint recording finished rows; a resumed run
+            rewrites them to the output and only crawls the rest
+        recorder: Optional JobRecorder saving each website's emails to the result store
     """
     try:
-        # Read the input CSV to get the fieldnames
-        with open(input_csv_path, newline='', encoding='utf-8') as test_file:
-            reader = csv.DictReader(test_file)
-            input_fieldnames = reader.fieldnames if reader.fieldnames else []
-        
-        if not input_fieldnames:
-            logger.error("Input CSV appears to be empty or has no headers")
-            return
-            
-        # Create output CSV with appropriate headers
-        with open(input_csv_path, newline='', encoding='utf-8-sig') as infile, \
-             open(output_csv_path, 'w', newline='', encoding='utf-8-sig') as outfile:
-            
-            reader = csv.DictReader(infile)
-            
-            # Prepare output fieldnames and writer
-            output_fieldnames = ['Website', 'Emails', 'Email_Count']
-            writer = csv.DictWriter(outfile, fieldnames=output_fieldnames)
-            writer.writeheader()
-            
-            # Process rows with concurrent workers
-            total_sites = sum(1 for _ in infile)
-            infile.seek(0)  # Reset file pointer after counting
-            next(reader)  # Skip header after resetting
-            
-            logger.info(f"Starting email extraction from {total_sites} websites")
-            
-            # Process in batches to avoid memory issues with very large files
-            batch_size = 100
+        # Websites are read as the workers need them, in a single pass
+        # Written as CSV unless the output path names another format
+        output_fieldnames = ['Website', 'Emails', 'Email_Count']
+        with UrlSource.open(input_csv_path) as source, \
+             open_row_writer(output_csv_path, output_fieldnames, encoding='utf-8-sig') as writer:
+
+            if not source.header:
+                logger.error("Input CSV appears to be empty or has no headers")
+                return
+
+            def report(count):
+                if progress:
+                    progress(count, None, source.bytes_read, source.total_bytes)
+
+            logger.info(f"Starting email extraction from {input_csv_path} ({source.total_bytes} bytes)")
+            report(0)
+
+            websites = enumerate(source)
             processed_count = 0
-            
-            while True:
-                batch = []
-                for _ in range(batch_size):
+            if checkpoint is not None:
+                websites = ((index, website) for index, website in websites if not checkpoint.is_done(index))
+                for _, row in sorted(checkpoint.completed.items()):
+                    if row:
+                        processed_count += 1
+                        writer.writerow(row)
+                        if on_result:
+                            on_result(row)
+                if processed_count:
+                    logger.info(f"Resuming after {processed_count} websites from checkpoint")
+
+            async def run():
+                nonlocal processed_count
+
+                async with EmailFetcher(concurrency=max_workers, site_deadline=site_deadline,
+                                        stop_after=stop_after, cache=cache) as fetcher:
+                    results = iter_website_emails(fetcher, websites, max_workers)
                     try:
-                        row = next(reader)
-                        batch.append(row)
-                    except StopIteration:
-                        break
-                
-                if not batch:
-                    break
-                    
-                with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    future_to_row = {
-                        executor.submit(process_website, row, input_fieldnames): row 
-                        for row in batch
-                    }
-                    
-                    for future in concurrent.futures.as_completed(future_to_row):
-                        website, emails = future.result()
-                        if website:
+                        async for index, website, emails in results:
                             processed_count += 1
                             emails_str = ', '.join(emails) if emails else ''
-                            writer.writerow({
+                            row = {
                                 'Website': website,
                                 'Emails': emails_str,
                                 'Email_Count': len(emails)
-                            })
-                            
+                            }
+                            writer.writerow(row)
+                            if on_result:
+                                on_result(row)
+                            if recorder is not None:
+                                recorder.emails(website, emails)
+
                             # Log progress periodically
                             if processed_count % 10 == 0:
-                                logger.info(f"Processed {processed_count}/{total_sites} websites")
-                                
-                            # Add small delay to avoid overwhelming resources
-                            time.sleep(0.1)
-            
-            logger.info(f"Email extraction completed. Processed {processed_count} websites.")
+                                logger.info(f"Processed {processed_count} websites ({source.percent or 0:.0f}% of input)")
+                            report(processed_count)
+                            if checkpoint is not None:
+                                checkpoint.record(index, row)
+                            if should_stop and should_stop():
+                                logger.info("Email extraction cancelled")
+                                break
+                    finally:
+                        await results.aclose()
+
+                return processed_count
+
+            processed_count = asyncio.run(run())
+            if cache is not None:
+                cache.flush()
+                logger.info(f"Result cache: {cache.hits} hits, {cache.misses} misses")
+            logger.info(f"Email extraction completed. Processed {processed_count} websites "
+                        f"({source.duplicates} duplicates skipped).")
             
     except FileNotFoundError:
         logger.error(f"Input file {input_csv_path} not found")
     except Exception as e:
         logger.error(f"An error occurred during email extraction: {e}")
+        raise
 
 if __name__ == "__main__":
     input_csv = 'websites_filtered.csv'  # Your filtered sites CSV filename
@@ -224,5 +455,5 @@ if __name__ == "__main__":
     
     # Start the extraction process
     logger.info(f"Starting email extraction from {input_csv} to {output_csv}")
-    fetch_emails_from_csv(input_csv, output_csv, max_workers=5)
+    fetch_emails_from_csv(input_csv, output_csv, max_workers=200)
     logger.info(f"Email extraction completed. Results saved to {output_csv}")
\ No newline at end of file
@@ -1,22 +1,203 @@
 import requests
-import csv
-import time
+import math
 import os
-from typing import List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
 import logging
+from ..utils.checkpoint_manager import JobCheckpoint
+from ..utils.host_health import HostHealth, HostUnavailable, host_health
+from ..utils.output import open_row_writer
+from ..utils.metrics import HTTP_PHASE_SECONDS, HTTP_REQUESTS, HTTP_RESPONSE_BYTES, TIMEOUTS, status_outcome
+from ..utils.rate_limit import TokenBucket
+from ..utils.result_store import JobRecorder
+from ..utils.search_cache import SearchCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Result pages shared by every fetcher in this process, keyed by (query, start)
+search_cache = SearchCache(
+    ttl=float(os.getenv('SEARCH_CACHE_TTL', 3600)),
+    max_entries=int(os.getenv('SEARCH_CACHE_SIZE', 1024)),
+)
+
+# SerpAPI quota is per account, so every fetcher shares one request budget
+serpapi_limiter = TokenBucket(
+    rate=float(os.getenv('SERPAPI_RATE', 2)),
+    capacity=int(os.getenv('SERPAPI_BURST', 4)),
+)
+
+# Search endpoint; overridden to point at a local fake in benchmarks
+SERPAPI_URL = os.getenv('SERPAPI_URL', 'https://serpapi.com/search')
+
+def _is_transient(error: requests.RequestException) -> bool:
+    """Whether a failed search request may succeed when sent again: connection errors, timeouts, 429 and 5xx."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = error.response
+    return response is not None and (response.status_code == 429 or response.status_code >= 500)
+
+
 class SiteFetcher:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[SearchCache] = search_cache,
+                 limiter: Optional[TokenBucket] = serpapi_limiter, page_concurrency: int = 4,
+                 page_size: int = 100, max_retries: int = 3, health: HostHealth = host_health,
+                 base_url: Optional[str] = None):
         self.api_key = api_key
-        self.base_url = "https://serpapi.com/search"
+        self.base_url = base_url or SERPAPI_URL
         self.session = requests.Session()
-        self.rate_limit_delay = 1  # Delay between requests in seconds
+        # Backs off between retries and honours Retry-After on 429s
+        self.health = health
+        self.cache = cache
+        self.limiter = limiter
+        self.page_concurrency = max(1, page_concurrency)
+        self.page_size = page_size  # Google caps at 100 per page
+        self.max_retries = max_retries
+
+    def _fetch_page(self, params: dict) -> List[dict]:
+        """Request one result page from SerpAPI and return its organic results."""
+        if self.limiter is not None:
+            self.limiter.acquire()
+        self.health.acquire_sync(self.base_url)
+        start = time.monotonic()
+        try:
+            response = self.session.get(self.base_url, params=params)
+        except requests.RequestException as e:
+            self.health.record(self.base_url, error=True)
+            if isinstance(e, requests.Timeout):
+                HTTP_REQUESTS.labels('search', 'timeout').inc()
+                TIMEOUTS.labels('search', 'connect' if isinstance(e, requests.ConnectTimeout) else 'read').inc()
+            else:
+                HTTP_REQUESTS.labels('search', 'error').inc()
+            raise
+        self.health.record(self.base_url, response.status_code, response.headers)
+        HTTP_REQUESTS.labels('search', status_outcome(response.status_code)).inc()
+        HTTP_RESPONSE_BYTES.labels('search').inc(len(response.content))
+        # requests measures elapsed up to the response headers
+        HTTP_PHASE_SECONDS.labels('search', 'ttfb').observe(response.elapsed.total_seconds())
+        HTTP_PHASE_SECONDS.labels('search', 'total').observe(time.monotonic() - start)
+        response.raise_for_status()
+        data = response.json()
+
+        # Check for API errors
+        if "error" in data:
+            error_msg = data.get("error", "Unknown API error")
+            logger.error(f"API Error: {error_msg}")
+            raise ValueError(f"API Error: {error_msg}")
+
+        return data.get("organic_results", [])
+
+    def _get_page(self, query: str, start: int) -> List[dict]:
+        """
+        Return one result page, served from the cache when possible. Network
+        errors, timeouts, 429 and 5xx responses are retried; any other error,
+        such as a rejected API key, is raised at once. The wait between
+        attempts comes from the host health tracker: Retry-After when SerpAPI
+        sends one, exponential backoff otherwise.
+        """
+        params = {
+            "engine": "google",
+            "q": query,
+            "api_key": self.api_key,
+            "num": self.page_size,
+            "start": start,
+        }
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                if self.cache is None:
+                    return self._fetch_page(params)
+                results, _ = self.cache.get_or_fetch((query, start), lambda: self._fetch_page(params))
+                return results
+            except requests.RequestException as e:
+                logger.error(f"Request failed (attempt {attempt}/{self.max_retries}): {str(e)}")
+                if attempt == self.max_retries or not _is_transient(e):
+                    raise
 
-    def fetch_relevant_sites(self, keyword: str, country: str = "", location: str = "", result_count: int = 50) -> List[str]:
+    def iter_result_pages(self, query: str, result_count: int, start: int = 0) -> Iterator[Tuple[int, List[dict]]]:
+        """
+        Yield ``(offset, results)`` for each organic result page of a query in rank order.
+
+        The first page is fetched alone to learn the real page size. Later
+        pages are requested concurrently in batches sized to the number of
+        results still missing, paced by the shared rate limiter. Iteration ends
+        at the first empty page or failed request; closing the generator early
+        abandons the pages not yet started.
+
+        Args:
+            query: Search query
+            result_count: Number of results the caller expects to need
+            start: Offset of the first page, to continue an earlier search
+        """
+        try:
+            results = self._get_page(query, start)
+        except (requests.RequestException, HostUnavailable):
+            logger.error("Max retries reached, stopping fetch")
+            return
+        if not results:
+            logger.info("No more results found")
+            return
+        yield start, results
+
+        page_size = len(results)
+        received = page_size
+        start += page_size
+        executor = ThreadPoolExecutor(max_workers=self.page_concurrency)
+        try:
+            while True:
+                pages = min(self.page_concurrency, max(1, math.ceil((result_count - received) / page_size)))
+                offsets = [start + i * page_size for i in range(pages)]
+                futures = [executor.submit(self._get_page, query, offset) for offset in offsets]
+                for offset, future in zip(offsets, futures):
+                    try:
+                        results = future.result()
+                    except (requests.RequestException, HostUnavailable, ValueError) as e:
+                        # Past the first page an API error usually means the
+                        # result set ran out, so keep what we have
+                        logger.error(f"Stopping pagination: {str(e)}")
+                        return
+                    if not results:
+                        logger.info("No more results found")
+                        return
+                    received += len(results)
+                    yield offset, results
+                start = offsets[-1] + page_size
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_relevant_sites(self, keyword: str, country: str = "", location: str = "",
+                            result_count: int = 50) -> Iterator[str]:
+        """
+        Yield unique website URLs in rank order as result pages arrive.
+
+        Stops after ``result_count`` URLs; closing the generator early stops
+        fetching further pages.
+        """
+        if not self.api_key:
+            raise ValueError("API key is required")
+
+        query = self._build_query(keyword, country, location)
+        logger.info(f"Querying Google for: {query}")
+
+        seen = set()
+        pages = self.iter_result_pages(query, result_count)
+        try:
+            for _, results in pages:
+                for result in results:
+                    link = result.get("link")
+                    if link and self._is_valid_url(link) and link not in seen:
+                        seen.add(link)
+                        yield link
+                        if len(seen) >= result_count:
+                            return
+        finally:
+            pages.close()
+
+    def fetch_relevant_sites(self, keyword: str, country: str = "", location: str = "", result_count: int = 50,
+                             progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                             should_stop: Optional[Callable[[], bool]] = None,
+                             checkpoint: Optional[JobCheckpoint] = None) -> List[str]:
         """
         Fetch relevant sites based on search criteria.
         
@@ -25,9 +206,13 @@ class SiteFetcher:
             country: Country to search in
             location: City or state to search in
             result_count: Number of results to fetch
+            progress: Called with (sites collected, result_count) after each page
+            should_stop: Polled after each page; returning True ends the search early
+            checkpoint: Stores the URLs collected and the next offset after each
+                page, and continues from them when resuming
             
         Returns:
-            List of website URLs
+            List of website URLs in rank order
         """
         if not self.api_key:
             raise ValueError("API key is required")
@@ -35,56 +220,27 @@ class SiteFetcher:
         query = self._build_query(keyword, country, location)
         logger.info(f"Querying Google for: {query}")
 
-        params = {
-            "engine": "google",
-            "q": query,
-            "api_key": self.api_key,
-            "num": 100  # Google caps at 100 per page
-        }
-
-        all_links = set()
-        start = 0
-        max_retries = 3
-
-        while len(all_links) < result_count:
-            params["start"] = start
-            retry_count = 0
-            
-            while retry_count < max_retries:
-                try:
-                    response = self.session.get(self.base_url, params=params)
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    # Check for API errors
-                    if "error" in data:
-                        error_msg = data.get("error", "Unknown API error")
-                        logger.error(f"API Error: {error_msg}")
-                        raise ValueError(f"API Error: {error_msg}")
-                    
-                    results = data.get("organic_results", [])
-                    if not results:
-                        logger.info("No more results found")
-                        return list(all_links)
+        all_links = dict.fromkeys(checkpoint.state.get("urls", [])) if checkpoint else {}
+        if len(all_links) >= result_count:
+            return list(all_links)[:result_count]
 
-                    for result in results:
-                        link = result.get("link")
-                        if link and self._is_valid_url(link) and link not in all_links:
-                            all_links.add(link)
+        pages = self.iter_result_pages(query, result_count, start=checkpoint.state.get("start", 0) if checkpoint else 0)
+        try:
+            for offset, results in pages:
+                for result in results:
+                    link = result.get("link")
+                    if link and self._is_valid_url(link) and link not in all_links:
+                        all_links[link] = None
                         if len(all_links) >= result_count:
                             return list(all_links)
-
-                    start += 10  # next page
-                    time.sleep(self.rate_limit_delay)  # Rate limiting
-                    break  # Success, exit retry loop
-                    
-                except requests.RequestException as e:
-                    retry_count += 1
-                    logger.error(f"Request failed (attempt {retry_count}/{max_retries}): {str(e)}")
-                    if retry_count == max_retries:
-                        logger.error("Max retries reached, stopping fetch")
-                        return list(all_links)
-                    time.sleep(self.rate_limit_delay * 2)  # Increased delay on retry
+                if checkpoint:
+                    checkpoint.update(urls=list(all_links), start=offset + len(results))
+                if progress:
+                    progress(len(all_links), result_count)
+                if should_stop and should_stop():
+                    break
+        finally:
+            pages.close()
 
         return list(all_links)
 
@@ -102,19 +258,24 @@ class SiteFetcher:
         return url.startswith(('http://', 'https://')) and '.' in url
 
 def save_to_csv(url_list: List[str], filename: str) -> None:
-    """Save URLs to a CSV file."""
+    """Save URLs to a file, as CSV unless the extension names another output format."""
     try:
-        with open(filename, mode="w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["Website URL"])
+        with open_row_writer(filename, ["Website URL"]) as writer:
             for url in url_list:
-                writer.writerow([url])
+                writer.writerow({"Website URL": url})
         logger.info(f"Saved {len(url_list)} URLs to {filename}")
     except IOError as e:
         logger.error(f"Failed to save CSV file: {str(e)}")
         raise
 
-def fetch_sites(keyword: str, country: str, city: str, count: int, output_file: str) -> None:
+def serpapi_key() -> str:
+    """Get API key from environment variable or use default."""
+    return os.getenv('SERPAPI_KEY', '7d2d780a5220ceb67153834a34d7791806989772a5fcd4d9101b2a31b27bd998')
+
+def fetch_sites(keyword: str, country: str, city: str, count: int, output_file: str,
+                progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                should_stop: Optional[Callable[[], bool]] = None,
+                checkpoint: Optional[JobCheckpoint] = None, recorder: Optional[JobRecorder] = None) -> None:
     """
     Main function to fetch sites and save to CSV.
     
@@ -124,14 +285,22 @@ def fetch_sites(keyword: str, country: str, city: str, count: int, output_file:
         city: City to search in
         count: Number of results to fetch
         output_file: Path to save the CSV file
+        progress: Optional callback receiving (sites collected, count)
+        should_stop: Optional callable polled between pages to cancel the search
+        checkpoint: Optional checkpoint to record and resume search progress
+        recorder: Optional JobRecorder saving every site found to the result store
     """
     try:
-        # Get API key from environment variable or use default
-        API_KEY = os.getenv('SERPAPI_KEY', '7d2d780a5220ceb67153834a34d7791806989772a5fcd4d9101b2a31b27bd998')
-        
-        fetcher = SiteFetcher(API_KEY)
-        sites = fetcher.fetch_relevant_sites(keyword, country, city, count)
+        fetcher = SiteFetcher(serpapi_key())
+        sites = fetcher.fetch_relevant_sites(keyword, country, city, count, progress=progress,
+                                             should_stop=should_stop, checkpoint=checkpoint)
+        if progress:
+            progress(len(sites), count)
         
+        if recorder is not None:
+            for url in sites:
+                recorder.found(url)
+
         if sites:
             save_to_csv(sites, output_file)
             logger.info(f"Successfully fetched {len(sites)} sites")
@@ -1,71 +1,253 @@
-import csv
-import requests
+import hashlib
 import time
 import asyncio
 import aiohttp
-from typing import List, Dict, Set
+from typing import Any, Callable, Iterable, List, Dict, Optional, Tuple
 import logging
+from dataclasses import dataclass, field
 from urllib.parse import urlparse
-import concurrent.futures
+from collections import Counter
+from ..utils.body_scanner import DEFAULT_MAX_BYTES, read_body, scan_response
+from ..utils.checkpoint_manager import JobCheckpoint
+from ..utils.dns_cache import CachingResolver
+from ..utils.domains import registered_domain
+from ..utils.fingerprints import PLATFORMS, Fingerprint, PlatformScanner, fingerprint_body
+from ..utils.host_health import HostHealth, host_health, polite_request
+from ..utils.parse_pool import ParseExecutor, parse_executor
+from ..utils.ingest import UrlSource
+from ..utils.output import open_row_writer
+from ..utils.metrics import IN_FLIGHT, SITE_SECONDS, SITES, http_trace
+from ..utils.result_cache import ResultCache
+from ..utils.result_store import JobRecorder
+from ..utils.scheduler import HostScheduler
+from ..utils.site_memo import SiteMemo
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bytes of the page body kept on a probe result for body-based checks
+PROBE_PREFIX_BYTES = 64 * 1024
+
+
+@dataclass
+class ProbeResult:
+    """Everything learnt about a URL from a single request."""
+    url: str
+    method: str
+    status: Optional[int] = None
+    final_url: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    elapsed: Optional[float] = None
+    body_prefix: bytes = b''
+    # Set when the page was fingerprinted: the storefront platform detected
+    # (None if none was) with its confidence, and whether it is Shopify
+    shopify: Optional[bool] = None
+    platform: Optional[str] = None
+    platform_confidence: Optional[float] = None
+    error: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    # The page was unchanged since the validators sent with the request (304),
+    # or its body still hashed to the given content_hash, in which case it was
+    # not fingerprinted again
+    not_modified: bool = False
+    unchanged: bool = False
+
+    @property
+    def is_active(self) -> bool:
+        return self.status is not None and self.status < 400
+
+
+def site_change(previous: Optional[Dict[str, Any]], result: ProbeResult) -> Optional[str]:
+    """
+    Classify how a re-verified site differs from its last recorded check:
+    "new" (never probed before), "dead", "alive" or "platform" (a different
+    storefront platform detected), or None when nothing the filters look at
+    changed.
+    """
+    if previous is None or previous["active"] is None:
+        return "new"
+    if previous["active"] and not result.is_active:
+        return "dead"
+    if not previous["active"] and result.is_active:
+        return "alive"
+    # shopify is only set on fingerprinted pages, so it tells whether both checks looked at the platform
+    if previous["shopify"] is not None and result.shopify is not None and (
+            previous["platform"] != result.platform or previous["shopify"] != result.shopify):
+        return "platform"
+    return None
+
+
 class SiteFilter:
-    def __init__(self, max_workers: int = 10, timeout: int = 5):
+    def __init__(self, max_workers: int = 10, timeout: int = 5, max_body_bytes: int = DEFAULT_MAX_BYTES,
+                 per_host: int = 2, host_delay: float = 0.0, cache: Optional[ResultCache] = None,
+                 resolver: Optional[CachingResolver] = None, health: HostHealth = host_health,
+                 parser: ParseExecutor = parse_executor, recorder: Optional[JobRecorder] = None,
+                 revalidate: bool = False):
+        if revalidate and recorder is None:
+            raise ValueError("Re-verification needs a recorder holding the earlier results")
         self.max_workers = max_workers
         self.timeout = timeout
+        self.max_body_bytes = max_body_bytes
+        self.per_host = per_host
+        self.host_delay = host_delay
+        self.cache = cache
+        self.resolver = resolver
+        self._owns_resolver = resolver is None
+        self.health = health
+        self.parser = parser
+        self.recorder = recorder
+        self.revalidate = revalidate
+        # Re-verified sites by outcome: not_modified, unchanged, modified or failed
+        self.reverified = Counter()
         self.session = None
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        if self.resolver is None:
+            self.resolver = CachingResolver()
+        # Size the connection pool to the scheduler so queued URLs wait in the
+        # scheduler, not on the connector where they would burn their timeout
+        connector = aiohttp.TCPConnector(limit=self.max_workers, limit_per_host=self.per_host,
+                                         ttl_dns_cache=300, resolver=self.resolver)
+        self.session = aiohttp.ClientSession(connector=connector, trace_configs=[http_trace('filter')])
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.close()
+        if self._owns_resolver and self.resolver is not None:
+            await self.resolver.close()
+            self.resolver = None
 
-    async def is_domain_active(self, url: str) -> bool:
-        """Check if a domain is active using HEAD request."""
+    async def probe(self, url: str, method: str = "GET", timeout: Optional[float] = None,
+                    detect_platform: bool = False, validators: Optional[Dict[str, Any]] = None) -> ProbeResult:
+        """
+        Request a URL once and record everything the filters need.
+
+        Args:
+            url: URL to probe
+            method: "GET" to also read a bounded body prefix, or "HEAD"
+            timeout: Request timeout in seconds, defaults to the filter timeout
+            detect_platform: Fingerprint the storefront platform from the
+                headers, cookies and streamed body
+            validators: ``etag`` and ``last_modified`` of an earlier response,
+                sent as If-None-Match/If-Modified-Since so an unchanged page
+                answers 304 without a body, and its ``content_hash``: the
+                body is then read up to ``max_body_bytes`` and, if it hashes
+                the same, marked ``unchanged`` and not fingerprinted again
+
+        Returns:
+            ProbeResult with status, final URL, headers, validators, time to
+            response headers and, for GET, the first PROBE_PREFIX_BYTES of
+            the body. The sha256 ``content_hash`` of the body up to
+            ``max_body_bytes`` is only set when the probe read that far, so a
+            matching hash never hides an edit past the bytes read.
+        """
+        result = ProbeResult(url=url, method=method)
+        # Dead domains fail here in milliseconds instead of on the connection attempt
+        if not await self.resolver.resolves(url):
+            result.error = "DNS lookup failed"
+            return result
+        headers = {}
+        if validators and validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators and validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
         try:
-            async with self.session.head(url, timeout=self.timeout, allow_redirects=True) as response:
-                return response.status < 400
+            start = time.time()
+            async with polite_request(self.session, method, url, health=self.health,
+                                      timeout=aiohttp.ClientTimeout(total=timeout or self.timeout),
+                                      allow_redirects=True, headers=headers) as response:
+                result.elapsed = time.time() - start
+                result.status = response.status
+                result.final_url = str(response.url)
+                result.headers = dict(response.headers)
+                result.etag = response.headers.get("ETag")
+                result.last_modified = response.headers.get("Last-Modified")
+                result.not_modified = response.status == 304 and bool(headers)
+                if method == "GET" and response.status == 200:
+                    if validators is not None:
+                        # Re-verification hashes the whole body, so an edit anywhere in it is seen
+                        body = await read_body(response, self.max_body_bytes)
+                        remaining = 0
+                    else:
+                        body = await read_body(response, min(PROBE_PREFIX_BYTES, self.max_body_bytes))
+                        remaining = 0 if len(body) < PROBE_PREFIX_BYTES else self.max_body_bytes - len(body)
+                    result.body_prefix = body[:PROBE_PREFIX_BYTES]
+                    if remaining == 0:
+                        result.content_hash = hashlib.sha256(body).hexdigest()
+                    if validators and validators.get("content_hash") == result.content_hash:
+                        result.unchanged = True
+                    elif detect_platform:
+                        fingerprint = Fingerprint()
+                        fingerprint.add_headers(response.headers, response.cookies.keys())
+                        await self.fingerprint_body(response, body, fingerprint, remaining)
+                        result.platform, result.platform_confidence = fingerprint.platform()
+                        result.shopify = result.platform == "shopify"
         except Exception as e:
-            logger.debug(f"Domain check failed for {url}: {str(e)}")
+            result.error = str(e) or type(e).__name__
+            logger.debug(f"Probe failed for {url}: {result.error}")
+        return result
+
+    async def fingerprint_body(self, response, prefix: bytes, fingerprint: Fingerprint,
+                               remaining: int = 0) -> None:
+        """
+        Add the body evidence of a response whose first bytes, ``prefix``, were
+        already read. Up to ``remaining`` more bytes of the body are only read
+        while the platform is still open.
+        """
+        if fingerprint.decisive:
+            return
+        if self.parser.inline:
+            # Reading stops as soon as the body settles the platform
+            scanner = PlatformScanner(fingerprint)
+            if not scanner.feed(prefix) and remaining > 0:
+                await scan_response(response, scanner, remaining)
+            return
+        # Read the body here and fingerprint it on the parse pool
+        body = prefix + await read_body(response, remaining) if remaining > 0 else prefix
+        for platform, key, weight in await self.parser.run(fingerprint_body, body):
+            fingerprint.add(platform, key, weight)
+
+    def evaluate(self, result: ProbeResult, filters: Dict) -> bool:
+        """Evaluate every selected filter against a single probe result."""
+        if filters.get("domain_active") and not result.is_active:
+            return False
+
+        if filters.get("only_shopify") and not (result.status == 200 and result.shopify):
+            return False
+
+        # An empty set accepts any detected storefront platform
+        platforms = filters.get("platforms")
+        if platforms is not None and not (result.status == 200 and result.platform and
+                                          (not platforms or result.platform in platforms)):
             return False
 
+        if filters.get("load_time"):
+            if result.status != 200 or result.elapsed is None or result.elapsed > filters["load_time"]:
+                return False
+
+        return True
+
+    async def is_domain_active(self, url: str) -> bool:
+        """Check if a domain is active using HEAD request."""
+        return (await self.probe(url, method="HEAD")).is_active
+
     async def is_shopify_site(self, url: str) -> bool:
         """Check if a site is built with Shopify."""
-        try:
-            async with self.session.get(url, timeout=self.timeout) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    html_lower = html.lower()
-                    # Check for multiple Shopify indicators
-                    indicators = [
-                        "cdn.shopify.com",
-                        "shopify",
-                        "myshopify.com",
-                        "shopify.com",
-                        "shopifycdn.com"
-                    ]
-                    return any(indicator in html_lower for indicator in indicators)
-                return False
-        except Exception as e:
-            logger.debug(f"Shopify check failed for {url}: {str(e)}")
-            return False
+        result = await self.probe(url, detect_platform=True)
+        return result.status == 200 and bool(result.shopify)
+
+    async def fingerprint_site(self, url: str) -> Tuple[Optional[str], Optional[float]]:
+        """Return the storefront platform a site runs on and the confidence, or None if none is detected."""
+        result = await self.probe(url, detect_platform=True)
+        return result.platform, result.platform_confidence
 
     async def check_load_time(self, url: str, max_seconds: int) -> bool:
         """Check if a site loads within the specified time."""
-        try:
-            start = time.time()
-            async with self.session.get(url, timeout=max_seconds) as response:
-                elapsed = time.time() - start
-                return response.status == 200 and elapsed <= max_seconds
-        except Exception as e:
-            logger.debug(f"Load time check failed for {url}: {str(e)}")
-            return False
+        return self.evaluate(await self.probe(url, timeout=max_seconds), {"load_time": max_seconds})
 
     def normalize_url(self, url: str) -> str:
         """Normalize URL format."""
@@ -82,83 +264,294 @@ class SiteFilter:
             return False
 
     async def process_url(self, url: str, filters: Dict) -> bool:
-        """Process a single URL with all filters."""
+        """Process a single URL with all filters using one request."""
         url = self.normalize_url(url)
         if not self.is_valid_url(url):
             return False
+        if self.revalidate:
+            return await self.reverify_url(url, filters)
 
-        if filters.get("domain_active"):
-            if not await self.is_domain_active(url):
-                return False
+        # HEAD is enough when only liveness is asked for; any other filter
+        # needs the GET response, which also answers liveness
+        needs_get = filters.get("only_shopify") or filters.get("platforms") is not None or filters.get("load_time")
+        if not needs_get and not filters.get("domain_active"):
+            if self.recorder is not None:
+                self.recorder.checked(url, True)
+            return True
 
-        if filters.get("only_shopify"):
-            if not await self.is_shopify_site(url):
-                return False
+        method = "GET" if needs_get else "HEAD"
+        detect_platform = bool(filters.get("only_shopify")) or filters.get("platforms") is not None
+        result = self.cached_probe(url, method, detect_platform)
+        if result is None:
+            timeout = max(self.timeout, filters.get("load_time") or 0)
+            with IN_FLIGHT.labels('filter').track_inprogress(), SITE_SECONDS.labels('filter').time():
+                result = await self.probe(url, method=method, timeout=timeout, detect_platform=detect_platform)
+            if self.cache is not None:
+                self.cache.put_probe(url, result.method, result.status, result.final_url, result.elapsed,
+                                     result.shopify, result.error, result.platform, result.platform_confidence)
+        passed = self.evaluate(result, filters)
+        SITES.labels('filter', 'passed' if passed else 'rejected').inc()
+        self.record(url, passed, result)
+        return passed
 
-        if filters.get("load_time"):
-            if not await self.check_load_time(url, filters["load_time"]):
-                return False
+    async def reverify_url(self, url: str, filters: Dict) -> bool:
+        """
+        Re-check a site against its last recorded outcome and record how it changed.
 
-        return True
+        The result cache is bypassed. Sites that last answered 200 with a
+        known platform are requested with their stored validators, so an
+        unchanged page answers 304, or serves a body with the stored hash,
+        and keeps its recorded outcome without being evaluated again.
+        Sites that failed or changed are fingerprinted from scratch.
+        """
+        previous = self.recorder.previous(url)
+        validators = None
+        if previous is not None and previous["status"] == 200 and previous["shopify"] is not None:
+            validators = previous
+        timeout = max(self.timeout, filters.get("load_time") or 0)
+        with IN_FLIGHT.labels('filter').track_inprogress(), SITE_SECONDS.labels('filter').time():
+            result = await self.probe(url, method="GET", timeout=timeout, detect_platform=True,
+                                      validators=validators)
+
+        if result.not_modified or result.unchanged:
+            self.reverified["not_modified" if result.not_modified else "unchanged"] += 1
+            result.status = previous["status"]
+            result.shopify = previous["shopify"]
+            result.platform = previous["platform"]
+            result.platform_confidence = previous["platform_confidence"]
+            result.content_hash = previous["content_hash"]
+            result.etag = result.etag or previous["etag"]
+            result.last_modified = result.last_modified or previous["last_modified"]
+        elif result.error is not None or result.status != 200:
+            self.reverified["failed"] += 1
+        else:
+            self.reverified["modified"] += 1
+
+        passed = self.evaluate(result, filters)
+        SITES.labels('filter', 'passed' if passed else 'rejected').inc()
+        change = site_change(previous, result)
+        self.record(url, passed, result)
+        if change is not None:
+            self.recorder.changed(url, change, previous, result.status, result.shopify, result.platform)
+        return passed
+
+    def record(self, url: str, passed: bool, result: ProbeResult) -> None:
+        if self.recorder is not None:
+            self.recorder.checked(url, passed, result.is_active, result.status, result.shopify, result.elapsed,
+                                  result.etag, result.last_modified, result.content_hash, result.platform,
+                                  result.platform_confidence)
+
+    def cached_probe(self, url: str, method: str, detect_platform: bool) -> Optional[ProbeResult]:
+        """Return a cached probe result for the URL's domain if it answers the requested checks."""
+        if self.cache is None:
+            return None
+        cached = self.cache.get_probe(url)
+        if cached is None:
+            return None
+        # A HEAD result cannot answer GET checks, and a GET made without
+        # fingerprinting cannot answer the platform filters. Shopify matches
+        # cached without a platform came from the old substring check.
+        if method == "GET" and cached["method"] != "GET":
+            return None
+        if detect_platform and cached["status"] == 200 and (
+                cached["shopify"] is None or (cached["shopify"] and cached["platform"] is None)):
+            return None
+        return ProbeResult(url=url, **cached)
+
+    async def filter_urls(self, urls: Iterable[str], filters: Dict,
+                          progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                          should_stop: Optional[Callable[[], bool]] = None,
+                          on_result: Optional[Callable[[str], None]] = None,
+                          checkpoint: Optional[JobCheckpoint] = None) -> List[str]:
+        """
+        Filter URLs asynchronously, keeping the input order.
+
+        URLs are read lazily and scheduled with at most ``max_workers`` in
+        flight overall and ``per_host`` per registered domain. Each site is
+        checked once, on its root URL, and the outcome applies to every URL
+        of that site.
+
+        Args:
+            urls: URLs to check
+            filters: Filter configuration as built by ``apply_filters``
+            progress: Called with (URLs checked, None) after each URL
+            should_stop: Polled after each URL; returning True stops scheduling
+            on_result: Called with each passing URL as soon as it is known,
+                in completion order
+            checkpoint: Records each checked URL (the URL if it passed, None
+                otherwise); URLs it already holds are not checked again
+        """
+        scheduler = HostScheduler(concurrency=self.max_workers, per_host=self.per_host,
+                                  host_delay=self.host_delay, key=lambda item: registered_domain(item[1]),
+                                  name='filter_backlog')
+
+        memo = SiteMemo(lambda url: self.process_url(url, filters))
+
+        async def check(item):
+            return await memo.run(item[1])
 
-    async def filter_urls(self, urls: List[str], filters: Dict) -> List[str]:
-        """Filter a list of URLs asynchronously."""
-        tasks = []
-        for url in urls:
-            task = asyncio.create_task(self.process_url(url, filters))
-            tasks.append((url, task))
+        filtered = []
+        pending = enumerate(urls)
+        if checkpoint is not None:
+            filtered = [(index, url) for index, url in checkpoint.completed.items() if url]
+            pending = ((index, url) for index, url in pending if not checkpoint.is_done(index))
+            if on_result:
+                for _, url in sorted(filtered):
+                    on_result(url)
+        if self.revalidate or filters.get("domain_active") or filters.get("only_shopify") or \
+                filters.get("platforms") is not None or filters.get("load_time"):
+            # Resolve hosts while URLs wait in the scheduler backlog
+            pending = self.resolver.prefetch(pending, lambda item: item[1])
+        checked = len(checkpoint.completed) if checkpoint is not None else 0
+        results = scheduler.run(pending, check)
+        try:
+            async for (index, url), passed, error in results:
+                if error is not None:
+                    logger.error(f"Error processing {url}: {str(error)}")
+                elif passed:
+                    filtered.append((index, url))
+                    if on_result:
+                        on_result(url)
+                if checkpoint is not None:
+                    checkpoint.record(index, url if passed and error is None else None)
+                checked += 1
+                if progress:
+                    progress(checked, None)
+                if should_stop and should_stop():
+                    break
+        finally:
+            await results.aclose()
 
-        filtered_urls = []
-        for url, task in tasks:
-            try:
-                if await task:
-                    filtered_urls.append(url)
-            except Exception as e:
-                logger.error(f"Error processing {url}: {str(e)}")
+        logger.info(f"Checked {memo.checks} sites for {memo.checks + memo.shared} URLs")
+        return [url for _, url in sorted(filtered)]
 
-        return filtered_urls
+def build_filter_config(filters: List[str]) -> Dict:
+    """
+    Convert filter names from the API to a filter configuration.
 
-def apply_filters(input_file: str, filters: List[str], output_file: str) -> None:
+    Names are "active", "shopify", "fast" and "platform". A bare "platform"
+    keeps any site on a known storefront platform; "platform:<name>" (one
+    of PLATFORMS, and repeatable) keeps only sites on those platforms.
+    Raises ValueError for an unknown name.
+    """
+    platforms = None
+    for name in filters:
+        if name in ("active", "shopify", "fast"):
+            continue
+        kind, _, platform = name.partition(":")
+        if kind != "platform" or (platform and platform not in PLATFORMS):
+            raise ValueError(f"Unknown filter: {name}")
+        platforms = platforms or set()
+        if platform:
+            platforms.add(platform)
+    return {
+        "domain_active": "active" in filters,
+        "only_shopify": "shopify" in filters,
+        "platforms": None if platforms is None else frozenset(platforms),
+        "load_time": 5 if "fast" in filters else None
+    }
+
+# Columns of the output written by a re-verification run
+CHANGE_FIELDNAMES = ["Website URL", "Change", "Previous Status", "Status", "Previous Platform", "Platform",
+                     "Previous Shopify", "Shopify"]
+
+
+def change_row(change: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a change recorded in the result store to a row of the re-verification output."""
+    return {
+        "Website URL": change["url"],
+        "Change": change["change"],
+        "Previous Status": change["previous_status"],
+        "Status": change["status"],
+        "Previous Platform": change["previous_platform"],
+        "Platform": change["platform"],
+        "Previous Shopify": change["previous_shopify"],
+        "Shopify": change["shopify"],
+    }
+
+
+def apply_filters(input_file: str, filters: List[str], output_file: str, max_workers: int = 100,
+                  cache: Optional[ResultCache] = None,
+                  progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                  should_stop: Optional[Callable[[], bool]] = None,
+                  on_result: Optional[Callable[[Dict[str, str]], None]] = None,
+                  checkpoint: Optional[JobCheckpoint] = None,
+                  recorder: Optional[JobRecorder] = None, incremental: bool = False) -> None:
     """
     Apply filters to URLs in the input CSV file and save results to output file.
+
+    With ``incremental``, every site is re-verified against what the result
+    store recorded for it (see ``SiteFilter.reverify_url``) and the output
+    lists only the sites that changed: "new", "dead", "alive" or "platform",
+    with their previous and current status and Shopify detection.
     
     Args:
         input_file: Path to input CSV file
         filters: List of filter names to apply
         output_file: Path to save filtered results
+        max_workers: Maximum number of URLs checked concurrently
+        cache: Optional result cache consulted before probing each domain
+        progress: Optional callback receiving (URLs checked, None, input bytes read, input size)
+        should_stop: Optional callable polled after each URL to cancel the run
+        on_result: Optional callback receiving each passing row as it is found
+        checkpoint: Optional checkpoint recording checked rows, so a resumed
+            run only checks the rest
+        recorder: Optional JobRecorder saving each outcome to the result store;
+            required with ``incremental``
+        incremental: Re-verify against the result store and write the changes
     """
     try:
         # Convert filter names to filter configuration
-        filter_config = {
-            "domain_active": "active" in filters,
-            "only_shopify": "shopify" in filters,
-            "load_time": 5 if "fast" in filters else None
-        }
-
-        # Read URLs from input file
-        urls = []
-        with open(input_file, newline="", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            next(reader, None)  # Skip header
-            urls = [row[0].strip() for row in reader if row]
-
-        # Process URLs
-        async def process_urls():
-            async with SiteFilter() as filterer:
-                filtered_urls = await filterer.filter_urls(urls, filter_config)
-                
-                # Save results
-                with open(output_file, "w", newline="", encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["Website URL"])
-                    for url in filtered_urls:
-                        writer.writerow([url])
-                
-                logger.info(f"Filtered {len(filtered_urls)} URLs from {len(urls)} total URLs")
-                return filtered_urls
-
-        # Run async processing
-        filtered_urls = asyncio.run(process_urls())
+        filter_config = build_filter_config(filters)
+
+        # Stream URLs from the input file as the filter consumes them
+        with UrlSource.open(input_file) as source:
+            def report(checked, _total):
+                progress(checked, None, source.bytes_read, source.total_bytes)
+
+            if progress:
+                report(0, None)
+
+            # Process URLs
+            async def process_urls():
+                async with SiteFilter(max_workers=max_workers, cache=cache, recorder=recorder,
+                                      revalidate=incremental) as filterer:
+                    filtered_urls = await filterer.filter_urls(
+                        source, filter_config, progress=report if progress else None, should_stop=should_stop,
+                        on_result=(lambda url: on_result({"Website URL": url})) if on_result and not incremental
+                        else None, checkpoint=checkpoint)
+
+                    if incremental:
+                        # Changes are read back from the store, so a resumed
+                        # run also lists those found before it was interrupted
+                        changes = 0
+                        with open_row_writer(output_file, CHANGE_FIELDNAMES) as writer:
+                            for change in recorder.changes():
+                                row = change_row(change)
+                                writer.writerow(row)
+                                changes += 1
+                                if on_result:
+                                    on_result(row)
+                        counts = ", ".join(f"{count} {outcome}"
+                                           for outcome, count in sorted(filterer.reverified.items()))
+                        logger.info(f"Re-verified {source.rows} URLs ({counts}): {changes} sites changed")
+                        return filtered_urls
+
+                    # Save results
+                    with open_row_writer(output_file, ["Website URL"]) as writer:
+                        for url in filtered_urls:
+                            writer.writerow({"Website URL": url})
+
+                    logger.info(f"Filtered {len(filtered_urls)} URLs from {source.rows} total URLs "
+                                f"({source.duplicates} duplicates skipped)")
+                    return filtered_urls
+
+            # Run async processing
+            filtered_urls = asyncio.run(process_urls())
+
+        if cache is not None:
+            cache.flush()
+            logger.info(f"Result cache: {cache.hits} hits, {cache.misses} misses")
         
     except Exception as e:
         logger.error(f"Error in apply_filters: {str(e)}")
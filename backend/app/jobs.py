@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class Job:
+    """
+    A unit of background work and its progress.
+
+    The running pipeline reports progress through ``update``, publishes
+    output rows through ``add_row`` as soon as they are produced, and polls
+    ``should_stop`` so a cancel request ends it at the next row. Rows are kept
+    while the job runs, and for a short while after, so a late or reconnecting
+    stream can catch up; after that the job's output file holds them.
+    """
+
+    def __init__(self, kind: str, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.done = 0
+        self.total: Optional[int] = None
+        self.bytes_read: Optional[int] = None
+        self.bytes_total: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.rows: List[Dict[str, Any]] = []
+        self._changed = threading.Condition()
+
+    def update(self, done: int, total: Optional[int] = None, bytes_read: Optional[int] = None,
+               bytes_total: Optional[int] = None) -> None:
+        """
+        Record progress: ``done`` rows out of ``total``, if known. Stages that
+        stream their input also report how many of its bytes have been read.
+        """
+        self.done = done
+        if total is not None:
+            self.total = total
+        if bytes_read is not None:
+            self.bytes_read = bytes_read
+        if bytes_total is not None:
+            self.bytes_total = bytes_total
+
+    def add_row(self, row: Dict[str, Any]) -> None:
+        """Publish one output row to stream subscribers."""
+        with self._changed:
+            self.rows.append(row)
+            self._changed.notify_all()
+
+    def release_rows(self) -> None:
+        """Drop the published rows once the job is finished and its output file is written."""
+        with self._changed:
+            self.rows = []
+            self._changed.notify_all()
+
+    def wait_for_change(self, cursor: int, timeout: float) -> None:
+        """Block until there are rows past ``cursor``, the job finishes, or ``timeout`` passes."""
+        with self._changed:
+            if len(self.rows) <= cursor and not self.finished:
+                self._changed.wait(timeout)
+
+    def notify(self) -> None:
+        with self._changed:
+            self._changed.notify_all()
+
+    def should_stop(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status snapshot for the polling API, including rate (rows/s) and ETA (s)."""
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == RUNNING:
+            if self.total is not None and rate > 0:
+                eta = round(max(0, self.total - self.done) / rate, 1)
+            elif self.bytes_total and self.bytes_read:
+                # Row count unknown: extrapolate from the share of input read
+                eta = round(elapsed * max(0, self.bytes_total - self.bytes_read) / self.bytes_read, 1)
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "bytes_read": self.bytes_read,
+            "bytes_total": self.bytes_total,
+            "rate": round(rate, 2),
+            "eta": eta,
+            "elapsed": round(elapsed, 1),
+            "result": self.result,
+            "error": self.error,
+            "cancel_requested": self.cancel_event.is_set(),
+        }
+
+
+class JobManager:
+    """
+    Run pipeline jobs on a background thread pool.
+
+    Jobs are kept in memory and forgotten ``retention`` seconds after they
+    finish, so the manager only needs to live as long as the process. Their
+    rows are released ``row_retention`` seconds after they finish, as by then
+    streams have caught up and the output file has every row.
+
+    Because jobs live in this process, the app must be served by a single
+    process: a status, cancel or stream request reaching another process
+    would not find the job. gunicorn.conf.py runs one threaded worker and
+    refuses to start with more.
+    """
+
+    def __init__(self, max_workers: int = 4, retention: float = 24 * 3600, row_retention: float = 300):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.retention = retention
+        self.row_retention = row_retention
+        self.jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., Optional[Dict[str, Any]]], *args,
+               job_id: Optional[str] = None, **kwargs) -> Job:
+        """
+        Queue ``fn(job, *args, **kwargs)`` and return its job immediately.
+
+        ``fn`` returns the job result (e.g. the output file) as a dict. Pass
+        ``job_id`` to run a resumed job under its original ID.
+        """
+        job = Job(kind, job_id)
+        with self._lock:
+            self._prune()
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._prune()
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Request cancellation. A running job stops at the next row; a queued job
+        still gets its turn so it can clean up, but stops before doing any work.
+        """
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel_event.set()
+        return job
+
+    def _run(self, job: Job, fn: Callable, args: tuple, kwargs: dict) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        status = FAILED
+        try:
+            job.result = fn(job, *args, **kwargs)
+            status = CANCELLED if job.should_stop() else SUCCEEDED
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+            job.error = str(e)
+        finally:
+            # finished_at is set first so a finished job always has it
+            job.finished_at = time.time()
+            job.status = status
+            job.notify()
+
+    def _prune(self) -> None:
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if not job.finished:
+                continue
+            if job.finished_at < now - self.retention:
+                del self.jobs[job_id]
+            elif job.rows and job.finished_at < now - self.row_retention:
+                job.release_rows()
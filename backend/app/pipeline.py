@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .emails.fetch_emails import EmailFetcher
+from .filters.fetch_sites import SiteFetcher, serpapi_key
+from .filters.filter_sites import SiteFilter, build_filter_config
+from .utils.dns_cache import CachingResolver
+from .utils.metrics import MeteredQueue
+from .utils.output import open_row_writer
+from .utils.result_cache import ResultCache
+from .utils.result_store import JobRecorder
+from .utils.site_memo import SiteMemo
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OUTPUT_FIELDNAMES = ['Website', 'Emails', 'Email_Count']
+
+# Marks the end of a stage's output
+DONE = object()
+
+
+async def run_stage(source: asyncio.Queue, sink: asyncio.Queue, handle: Callable[[Any], Awaitable[Any]],
+                    concurrency: int) -> None:
+    """
+    Move items from ``source`` to ``sink`` through ``concurrency`` workers.
+
+    ``handle`` returns the item to pass on, or None to drop it. A failing
+    item is logged and dropped. ``DONE`` is forwarded once every worker has
+    seen the end of the source.
+    """
+    async def work():
+        while True:
+            item = await source.get()
+            if item is DONE:
+                # Put it back so sibling workers stop too
+                await source.put(DONE)
+                return
+            try:
+                result = await handle(item)
+            except Exception as e:
+                logger.error(f"Error processing {item}: {str(e)}")
+                result = None
+            if result is not None:
+                await sink.put(result)
+
+    await asyncio.gather(*(work() for _ in range(concurrency)))
+    await sink.put(DONE)
+
+
+def run_pipeline(keyword: str, country: str, city: str, count: int, filters: List[str], output_file: str,
+                 filter_workers: int = 100, email_workers: int = 200, stop_after: Optional[int] = None,
+                 cache: Optional[ResultCache] = None,
+                 progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None,
+                 on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 recorder: Optional[JobRecorder] = None) -> Dict[str, int]:
+    """
+    Search, filter and extract emails in one streaming run.
+
+    The three stages run concurrently, connected by bounded queues. URLs go
+    to the filter as soon as a SerpAPI page arrives, and sites that pass go
+    straight to email extraction, so the total time approaches that of the
+    slowest stage instead of the sum of all three.
+
+    Args:
+        keyword: Search keyword
+        country: Country to search in
+        city: City to search in
+        count: Number of websites to search for
+        filters: Filter names to apply ("active", "shopify", "fast", "platform" or
+            "platform:<name>"); none keeps every site
+        output_file: Path of the CSV written with Website, Emails and Email_Count
+        filter_workers: Maximum number of websites checked concurrently
+        email_workers: Maximum number of websites crawled concurrently
+        stop_after: Stop crawling a website once this many emails are found
+        cache: Optional result cache shared by the filter and email stages
+        progress: Optional callback receiving (websites finished, websites found so far)
+        should_stop: Optional callable polled after each website to cancel the run
+        on_result: Optional callback receiving each output row as soon as it is written
+        recorder: Optional JobRecorder saving what every stage finds to the result store
+
+    Returns:
+        Counts of websites found, passing the filters and written
+    """
+    filter_config = build_filter_config(filters)
+    counts = {"found": 0, "checked": 0, "passed": 0, "written": 0}
+
+    def report():
+        if progress:
+            # A website is finished once it is filtered out or written
+            progress(counts["checked"] - counts["passed"] + counts["written"], counts["found"])
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        urls = MeteredQueue('pipeline_urls', maxsize=filter_workers * 2)
+        survivors = MeteredQueue('pipeline_survivors', maxsize=email_workers * 2)
+        rows = MeteredQueue('pipeline_rows', maxsize=email_workers * 2)
+        stopped = threading.Event()
+
+        def search():
+            # SiteFetcher is synchronous, so it runs in a thread and hands
+            # URLs to the loop, blocking while the filter stage is busy. The
+            # counts are only touched on the loop, by queue_url.
+            sites = SiteFetcher(serpapi_key()).iter_relevant_sites(keyword, country, city, count)
+            try:
+                for url in sites:
+                    if stopped.is_set():
+                        return
+                    asyncio.run_coroutine_threadsafe(queue_url(url), loop).result()
+                    if recorder is not None:
+                        recorder.found(url)
+            finally:
+                sites.close()
+
+        async def queue_url(url):
+            # Start the DNS lookup now so dead domains are known by the time a filter worker gets here
+            resolver.warm(url)
+            await urls.put(url)
+            counts["found"] += 1
+
+        async def feed():
+            # End the URL stream whether the search finishes or fails, but
+            # not on cancellation, when nothing is left to consume it
+            try:
+                await loop.run_in_executor(None, search)
+            except Exception:
+                await urls.put(DONE)
+                raise
+            await urls.put(DONE)
+
+        async def check(url):
+            passed = await site_checks.run(url)
+            counts["checked"] += 1
+            if passed:
+                counts["passed"] += 1
+            report()
+            return url if passed else None
+
+        async def extract(url):
+            emails = await site_emails.run(url)
+            if recorder is not None:
+                recorder.emails(url, emails)
+            return {'Website': url, 'Emails': ', '.join(emails), 'Email_Count': len(emails)}
+
+        # One resolver for both stages, so the email stage reuses the filter's lookups
+        resolver = CachingResolver()
+        try:
+            async with SiteFilter(max_workers=filter_workers, cache=cache, resolver=resolver,
+                                  recorder=recorder) as filterer, \
+                    EmailFetcher(concurrency=email_workers, stop_after=stop_after, cache=cache,
+                                 resolver=resolver) as fetcher:
+                # Search results often hold several pages of one site; check and crawl each site once
+                site_checks = SiteMemo(lambda url: filterer.process_url(url, filter_config))
+                site_emails = SiteMemo(fetcher.fetch_emails)
+                search_task = asyncio.ensure_future(feed())
+                tasks = [
+                    search_task,
+                    asyncio.ensure_future(run_stage(urls, survivors, check, filter_workers)),
+                    asyncio.ensure_future(run_stage(survivors, rows, extract, email_workers)),
+                ]
+                try:
+                    with open_row_writer(output_file, OUTPUT_FIELDNAMES, encoding='utf-8-sig') as writer:
+                        while True:
+                            # Wake up every second so a cancel is noticed even
+                            # while every site is being filtered out
+                            try:
+                                row = await asyncio.wait_for(rows.get(), timeout=1)
+                            except asyncio.TimeoutError:
+                                row = None
+                            if row is DONE:
+                                break
+                            if row is not None:
+                                writer.writerow(row)
+                                counts["written"] += 1
+                                if on_result:
+                                    on_result(row)
+                                report()
+                            if should_stop and should_stop():
+                                logger.info("Pipeline cancelled")
+                                break
+                    if search_task.done() and search_task.exception() is not None:
+                        raise search_task.exception()
+                finally:
+                    stopped.set()
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    for queue in (urls, survivors, rows):
+                        queue.close()
+        finally:
+            await resolver.close()
+
+    asyncio.run(run())
+    if cache is not None:
+        cache.flush()
+    logger.info(f"Pipeline finished: {counts['found']} sites found, {counts['passed']} passed filters, "
+                f"{counts['written']} written")
+    return counts
@@ -1,10 +1,20 @@
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, Response, request, jsonify, send_file, current_app, url_for
 import os
+import json
+import time
 import uuid
 import logging
 from .filters.fetch_sites import fetch_sites
-from .filters.filter_sites import apply_filters
+from .filters.filter_sites import apply_filters, build_filter_config
 from .emails.fetch_emails import fetch_emails_from_csv
+from .pipeline import run_pipeline
+from .utils.checkpoint_manager import JobCheckpoint
+from .utils.ingest import keep_upload
+from .utils.output import (CONTENT_TYPES, DEFAULT_FORMAT, FORMATS, format_available, gzip_chunks,
+                           output_format, output_path, stream_rows)
+from .utils import metrics
+from .utils.result_cache import ResultCache
+from .utils.result_store import CHANGE_FIELDS, DOMAIN_FIELDS, EMAIL_FIELDS, JOB_FIELDS, ResultStore
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +27,166 @@ OUTPUT_FOLDER = os.path.join(os.path.dirname(__file__), '../output')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+# Seconds between progress events on a job stream
+STREAM_PROGRESS_INTERVAL = 1.0
+
+# Page size of JSON result queries; CSV and NDJSON exports are unlimited by default
+RESULTS_PAGE_SIZE = 100
+RESULTS_MAX_PAGE_SIZE = 1000
+
+
+def result_cache():
+    """Open the shared result cache, or return None if the request opts out with use_cache=false."""
+    use_cache = request.form.get('use_cache')
+    if use_cache is None and request.is_json:
+        use_cache = (request.get_json(silent=True) or {}).get('use_cache')
+    if str(use_cache).lower() in ('0', 'false', 'no', 'off'):
+        return None
+    return ResultCache(
+        current_app.config['RESULT_CACHE_PATH'],
+        probe_ttl=current_app.config['PROBE_CACHE_TTL'],
+        email_ttl=current_app.config['EMAIL_CACHE_TTL'],
+        max_entries=current_app.config['RESULT_CACHE_MAX_ENTRIES'],
+    )
+
+
+def result_store():
+    """Open the result store recording every job's sites and emails."""
+    return ResultStore(current_app.config['RESULT_STORE_PATH'])
+
+
+def request_output_path(prefix):
+    """
+    Return ``(path, None)`` for a new output file in the format named by the
+    request's ``format`` field (csv, csv.gz, ndjson or parquet; csv by
+    default), or ``(None, error response)`` for an unusable format.
+    """
+    fmt = request.form.get('format')
+    if fmt is None and request.is_json:
+        fmt = (request.get_json(silent=True) or {}).get('format')
+    fmt = fmt or DEFAULT_FORMAT
+    if fmt not in FORMATS:
+        return None, (jsonify({"error": f"Unknown output format: {fmt}"}), 400)
+    if not format_available(fmt):
+        return None, (jsonify({"error": f"{fmt} output is not available on this server"}), 400)
+    return output_path(current_app.config['OUTPUT_FOLDER'], prefix, fmt), None
+
+
+def submit_job(kind, fn, *args, **kwargs):
+    """Queue a pipeline on the background job manager and return the 202 response."""
+    job = current_app.extensions['jobs'].submit(kind, fn, *args, **kwargs)
+    return jsonify({
+        "status": "accepted",
+        "job_id": job.id,
+        "status_url": url_for('main.job_status', job_id=job.id)
+    }), 202
+
+
+def remove_upload(filepath):
+    try:
+        os.remove(filepath)
+    except Exception as e:
+        logger.warning(f"Failed to remove temporary file {filepath}: {str(e)}")
+
+
+def checkpoint_opener():
+    """Return ``open(job, checkpoint_type, params)`` bound to the app's checkpoint settings."""
+    manager = current_app.extensions['checkpoints']
+    interval = current_app.config['CHECKPOINT_INTERVAL']
+
+    def open_checkpoint(job, checkpoint_type, params):
+        return JobCheckpoint.open(manager, checkpoint_type, job.id, params, interval)
+
+    return open_checkpoint
+
+
+def run_checkpointed(job, checkpoint, stage, upload=None):
+    """
+    Run ``stage()`` under a checkpoint.
+
+    If the stage fails, the checkpoint and the upload are kept so the job can
+    be resumed. Once it finishes or is cancelled, both are removed.
+    """
+    try:
+        if not job.should_stop():
+            stage()
+    except Exception:
+        checkpoint.save()
+        raise
+    checkpoint.delete()
+    if upload:
+        remove_upload(upload)
+
+
+def run_fetch_sites(job, open_checkpoint, keyword, country, city, count, output_file, store):
+    params = {"keyword": keyword, "country": country, "city": city, "count": count, "output_file": output_file}
+    checkpoint = open_checkpoint(job, 'fetch', params)
+    try:
+        recorder = store.job(job.id, 'fetch-sites', params)
+        run_checkpointed(job, checkpoint, lambda: fetch_sites(
+            keyword, country, city, count, output_file, progress=job.update, should_stop=job.should_stop,
+            checkpoint=checkpoint, recorder=recorder))
+    finally:
+        store.close()
+    return None if job.should_stop() else {"file": output_file}
+
+
+def run_filter_sites(job, open_checkpoint, filepath, filters, output_file, max_workers, cache, store,
+                     incremental=False):
+    params = {"filepath": filepath, "filters": filters, "output_file": output_file, "incremental": incremental}
+    checkpoint = open_checkpoint(job, 'filter', params)
+    try:
+        recorder = store.job(job.id, 'filter-sites', params)
+        run_checkpointed(job, checkpoint, lambda: apply_filters(
+            filepath, filters, output_file, max_workers=max_workers, cache=cache, progress=job.update,
+            should_stop=job.should_stop, on_result=job.add_row, checkpoint=checkpoint, recorder=recorder,
+            incremental=incremental), upload=filepath)
+    finally:
+        if cache is not None:
+            cache.close()
+        store.close()
+    return None if job.should_stop() else {"file": output_file}
+
+
+def run_fetch_emails(job, open_checkpoint, input_path, output_path, stop_after, max_workers, cache, store):
+    params = {"input_path": input_path, "output_path": output_path, "stop_after": stop_after}
+    checkpoint = open_checkpoint(job, 'emails', params)
+    try:
+        recorder = store.job(job.id, 'fetch-emails', params)
+        run_checkpointed(job, checkpoint, lambda: fetch_emails_from_csv(
+            input_path, output_path, max_workers=max_workers, stop_after=stop_after, cache=cache,
+            progress=job.update, should_stop=job.should_stop, on_result=job.add_row, checkpoint=checkpoint,
+            recorder=recorder), upload=input_path)
+    finally:
+        if cache is not None:
+            cache.close()
+        store.close()
+    if job.should_stop():
+        return None
+    if not os.path.exists(output_path):
+        raise RuntimeError("Email extraction produced no output")
+    return {"file": output_path}
+
+
+def run_pipeline_job(job, keyword, country, city, count, filters, output_file, filter_workers, email_workers,
+                     stop_after, cache, store):
+    try:
+        if job.should_stop():
+            return None
+        recorder = store.job(job.id, 'pipeline', {
+            "keyword": keyword, "country": country, "city": city, "count": count, "filters": filters,
+            "output_file": output_file, "stop_after": stop_after
+        })
+        counts = run_pipeline(keyword, country, city, count, filters, output_file, filter_workers=filter_workers,
+                              email_workers=email_workers, stop_after=stop_after, cache=cache,
+                              progress=job.update, should_stop=job.should_stop, on_result=job.add_row,
+                              recorder=recorder)
+    finally:
+        if cache is not None:
+            cache.close()
+        store.close()
+    return None if job.should_stop() else {"file": output_file, **counts}
+
 
 @main.route('/api/fetch-sites', methods=['POST'])
 def fetch_sites_route():
@@ -43,16 +213,13 @@ def fetch_sites_route():
             return jsonify({"error": "Count must be between 1 and 1000"}), 400
 
         # Generate unique output filename
-        output_file = os.path.join(current_app.config['OUTPUT_FOLDER'], f'sites_{uuid.uuid4().hex}.csv')
-        
-        # Fetch sites
-        fetch_sites(keyword, country, city, count, output_file)
+        output_file, error = request_output_path('sites')
+        if error:
+            return error
 
-        return jsonify({
-            "status": "success",
-            "message": "Sites fetched successfully",
-            "file": output_file
-        })
+        # Fetch sites in the background
+        return submit_job('fetch-sites', run_fetch_sites, checkpoint_opener(), keyword, country, city, count,
+                          output_file, result_store())
 
     except Exception as e:
         logger.error(f"Error in fetch_sites_route: {str(e)}")
@@ -75,33 +242,29 @@ def filter_sites_route():
         if not file.filename.endswith('.csv'):
             return jsonify({"error": "Only CSV files are allowed"}), 400
 
-        # Get filters
+        # Get filters; a re-verification run may go without, as it reports changes either way
         filters = request.form.getlist('filters')
-        if not filters:
+        incremental = str(request.form.get('incremental')).lower() in ('1', 'true', 'yes', 'on')
+        if not filters and not incremental:
             return jsonify({"error": "No filters selected"}), 400
+        try:
+            build_filter_config(filters)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Generate output filename
+        output_file, error = request_output_path('changes' if incremental else 'filtered')
+        if error:
+            return error
 
         # Save uploaded file
         filename = f"{uuid.uuid4().hex}.csv"
         filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-
-        # Generate output filename
-        output_file = os.path.join(current_app.config['OUTPUT_FOLDER'], f'filtered_{uuid.uuid4().hex}.csv')
+        keep_upload(file, filepath)
 
-        # Apply filters
-        apply_filters(filepath, filters, output_file)
-
-        # Clean up uploaded file
-        try:
-            os.remove(filepath)
-        except Exception as e:
-            logger.warning(f"Failed to remove temporary file {filepath}: {str(e)}")
-
-        return jsonify({
-            "status": "success",
-            "message": "Filters applied successfully",
-            "file": output_file
-        })
+        # Apply filters in the background; the job removes the upload when done
+        return submit_job('filter-sites', run_filter_sites, checkpoint_opener(), filepath, filters, output_file,
+                          current_app.config['FILTER_CONCURRENCY'], result_cache(), result_store(), incremental)
 
     except Exception as e:
         logger.error(f"Error in filter_sites_route: {str(e)}")
@@ -122,17 +285,35 @@ def download_file():
             current_app.config['UPLOAD_FOLDER']
         ]
         
-        if not any(path.startswith(dir) for dir in allowed_dirs):
+        real_path = os.path.realpath(path)
+        if not any(real_path.startswith(os.path.realpath(dir) + os.sep) for dir in allowed_dirs):
             return jsonify({"error": "Invalid file path"}), 403
 
-        if not os.path.exists(path):
+        if not os.path.isfile(real_path):
             return jsonify({"error": "File not found"}), 404
 
-        return send_file(
-            path,
+        fmt = output_format(real_path)
+        download_name = os.path.basename(real_path)
+        # Text outputs are compressed on the fly for clients that accept it.
+        # Range requests (resumed downloads) get the file as stored, as
+        # offsets into a compressed stream would not be stable.
+        if fmt in ('csv', 'ndjson') and 'gzip' in request.accept_encodings and request.range is None:
+            return Response(gzip_chunks(real_path), mimetype=CONTENT_TYPES[fmt], headers={
+                'Content-Encoding': 'gzip',
+                'Content-Disposition': f'attachment; filename="{download_name}"',
+                'Vary': 'Accept-Encoding'
+            })
+
+        # send_file answers Range and conditional requests from the file itself
+        response = send_file(
+            real_path,
+            mimetype=CONTENT_TYPES[fmt],
             as_attachment=True,
-            download_name=os.path.basename(path)
+            download_name=download_name,
+            conditional=True
         )
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
 
     except Exception as e:
         logger.error(f"Error in download_file: {str(e)}")
@@ -151,17 +332,300 @@ def fetch_emails_route():
     output_folder = current_app.config['OUTPUT_FOLDER']
     os.makedirs(upload_folder, exist_ok=True)
     os.makedirs(output_folder, exist_ok=True)
+    output_file, error = request_output_path('emails')
+    if error:
+        return error
     input_path = os.path.join(upload_folder, f"{uuid.uuid4().hex}.csv")
-    output_path = os.path.join(output_folder, f"emails_{uuid.uuid4().hex}.csv")
-    file.save(input_path)
+    keep_upload(file, input_path)
 
-    # Run email extraction
-    fetch_emails_from_csv(input_path, output_path, max_workers=5)
+    # Optional early stop once a site yields enough emails
+    stop_after = request.form.get('stop_after', type=int)
 
-    # Optionally, clean up input file
+    # Run email extraction in the background; the job removes the upload when done
+    return submit_job('fetch-emails', run_fetch_emails, checkpoint_opener(), input_path, output_file, stop_after,
+                      current_app.config['EMAIL_CONCURRENCY'], result_cache(), result_store())
+
+
+@main.route('/api/pipeline', methods=['POST'])
+def pipeline_route():
+    """Search, filter and extract emails in one streaming background job."""
     try:
-        os.remove(input_path)
-    except Exception:
-        pass
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        # Validate required fields
+        required_fields = ['country', 'city', 'keyword']
+        missing_fields = [field for field in required_fields if not data.get(field)]
+        if missing_fields:
+            return jsonify({"error": f"Missing required fields: {', '.join(missing_fields)}"}), 400
+
+        count = int(data.get('count', 10))
+        if count < 1 or count > 1000:
+            return jsonify({"error": "Count must be between 1 and 1000"}), 400
 
-    return jsonify({"status": "success", "file": output_path})
+        filters = data.get('filters') or []
+        try:
+            build_filter_config(filters)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        stop_after = data.get('stop_after')
+        stop_after = int(stop_after) if stop_after else None
+
+        output_file, error = request_output_path('pipeline')
+        if error:
+            return error
+        return submit_job('pipeline', run_pipeline_job, data['keyword'], data['country'], data['city'], count,
+                          filters, output_file, current_app.config['FILTER_CONCURRENCY'],
+                          current_app.config['EMAIL_CONCURRENCY'], stop_after, result_cache(), result_store())
+
+    except Exception as e:
+        logger.error(f"Error in pipeline_route: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@main.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Return status and progress (done/total, rate, ETA) of a background job."""
+    job = current_app.extensions['jobs'].get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@main.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Ask a queued or running job to stop."""
+    job = current_app.extensions['jobs'].cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@main.route('/api/jobs/<job_id>/resume', methods=['POST'])
+def resume_job(job_id):
+    """Restart an interrupted or failed job from its checkpoint, skipping completed work."""
+    job = current_app.extensions['jobs'].get(job_id)
+    if job is not None and not job.finished:
+        return jsonify({"error": "Job is still running"}), 409
+
+    stored = current_app.extensions['checkpoints'].find_checkpoint(job_id)
+    if stored is None:
+        return jsonify({"error": "No checkpoint found for this job"}), 404
+    checkpoint_type = stored["metadata"].get("type")
+    params = stored["data"].get("params")
+    if not params:
+        return jsonify({"error": "Checkpoint cannot be resumed"}), 409
+
+    if checkpoint_type == 'fetch':
+        return submit_job('fetch-sites', run_fetch_sites, checkpoint_opener(), job_id=job_id,
+                          store=result_store(), **params)
+
+    upload = params.get("filepath") or params.get("input_path")
+    if not upload or not os.path.exists(upload):
+        return jsonify({"error": "The uploaded file for this job is no longer available"}), 409
+    if checkpoint_type == 'filter':
+        return submit_job('filter-sites', run_filter_sites, checkpoint_opener(), job_id=job_id,
+                          max_workers=current_app.config['FILTER_CONCURRENCY'], cache=result_cache(),
+                          store=result_store(), **params)
+    if checkpoint_type == 'emails':
+        return submit_job('fetch-emails', run_fetch_emails, checkpoint_opener(), job_id=job_id,
+                          max_workers=current_app.config['EMAIL_CONCURRENCY'], cache=result_cache(),
+                          store=result_store(), **params)
+    return jsonify({"error": "Checkpoint cannot be resumed"}), 409
+
+
+def sse_message(event, data, event_id=None):
+    """Format one Server-Sent Events message."""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+@main.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    """
+    Stream a job as Server-Sent Events.
+
+    Each output row is sent as a ``row`` event as soon as it is produced,
+    ``progress`` events carry the status snapshot every second, and a final
+    ``end`` event carries the finished job. Row event ids count delivered
+    rows, so a reconnecting client resumes via Last-Event-ID (or ?since=N).
+    Rows stay available for JOB_ROW_RETENTION seconds after the job ends;
+    later, the end event's result points to the output file holding them.
+    """
+    job = current_app.extensions['jobs'].get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    try:
+        start = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+    except ValueError:
+        start = 0
+
+    def events():
+        cursor = max(0, start)
+        last_progress = 0.0
+        while True:
+            # Read the status before the rows so rows added just before the
+            # job finished are still sent ahead of the end event
+            finished = job.finished
+            for row in job.rows[cursor:]:
+                cursor += 1
+                yield sse_message('row', row, cursor)
+            if finished:
+                yield sse_message('end', job.to_dict())
+                return
+            now = time.monotonic()
+            if now - last_progress >= STREAM_PROGRESS_INTERVAL:
+                yield sse_message('progress', job.to_dict())
+                last_progress = now
+            job.wait_for_change(cursor, STREAM_PROGRESS_INTERVAL)
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Keep reverse proxies from buffering the stream
+    })
+
+
+def query_flag(name):
+    """Read an optional true/false query parameter, or raise ValueError."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    if value.lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    if value.lower() in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+
+def query_since():
+    """Read the start of the period asked for, as ``since`` (Unix time) or ``days`` (last N days)."""
+    since = request.args.get('since', type=float)
+    days = request.args.get('days', type=float)
+    if days is not None:
+        since = max(since or 0, time.time() - days * 86400)
+    return since
+
+
+def results_response(store, rows, fieldnames, limit, offset, name):
+    """
+    Answer a result query: a JSON page, or a CSV or NDJSON export streamed
+    straight from the store when ``format`` asks for one. Closes the store.
+    """
+    fmt = request.args.get('format', 'json')
+    if fmt == 'json':
+        try:
+            results = list(rows)
+        finally:
+            store.close()
+        return jsonify({"results": results, "count": len(results), "limit": limit, "offset": offset})
+
+    def export():
+        try:
+            yield from stream_rows(rows, fieldnames, fmt)
+        finally:
+            store.close()
+
+    return Response(export(), mimetype=CONTENT_TYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename="{name}{FORMATS[fmt]}"'
+    })
+
+
+def results_query():
+    """
+    Read the paging and format parameters shared by result queries.
+
+    Returns ``(limit, offset, None)``, or ``(None, None, error response)``.
+    JSON pages hold RESULTS_PAGE_SIZE rows by default; exports are unlimited
+    unless a limit is given.
+    """
+    fmt = request.args.get('format', 'json')
+    if fmt not in ('json', 'csv', 'ndjson'):
+        return None, None, (jsonify({"error": f"Unknown result format: {fmt}"}), 400)
+    limit = request.args.get('limit', type=int)
+    offset = request.args.get('offset', 0, type=int)
+    if fmt == 'json':
+        limit = min(RESULTS_PAGE_SIZE if limit is None else limit, RESULTS_MAX_PAGE_SIZE)
+    if (limit is not None and limit < 1) or offset < 0:
+        return None, None, (jsonify({"error": "limit must be positive and offset not negative"}), 400)
+    return limit, offset, None
+
+
+@main.route('/api/results/domains', methods=['GET'])
+def result_domains():
+    """
+    Query every site recorded by past jobs, most recently seen first.
+
+    Filters: job_id (and stage), shopify, platform, active, has_emails, since/days and
+    q (text in the domain). Paged with limit/offset; format=csv or ndjson
+    exports the matching rows instead of a JSON page.
+    """
+    limit, offset, error = results_query()
+    if error:
+        return error
+    try:
+        filters = {
+            "job_id": request.args.get('job_id') or None,
+            "stage": request.args.get('stage') or None,
+            "shopify": query_flag('shopify'),
+            "platform": request.args.get('platform') or None,
+            "active": query_flag('active'),
+            "has_emails": query_flag('has_emails'),
+            "since": query_since(),
+            "search": request.args.get('q') or None,
+        }
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    store = result_store()
+    rows = store.domains(limit=limit, offset=offset, **filters)
+    return results_response(store, rows, DOMAIN_FIELDS, limit, offset, 'domains')
+
+
+@main.route('/api/results/emails', methods=['GET'])
+def result_emails():
+    """
+    Query every email recorded by past jobs, most recently seen first.
+
+    Filters: domain, job_id and since/days. Paged and exported like
+    /api/results/domains.
+    """
+    limit, offset, error = results_query()
+    if error:
+        return error
+    store = result_store()
+    rows = store.emails(domain=request.args.get('domain') or None, job_id=request.args.get('job_id') or None,
+                        since=query_since(), limit=limit, offset=offset)
+    return results_response(store, rows, EMAIL_FIELDS, limit, offset, 'emails')
+
+
+@main.route('/api/results/jobs/<job_id>/changes', methods=['GET'])
+def result_changes(job_id):
+    """List the sites an incremental filter job found changed; ?change= picks new, dead, alive or platform."""
+    limit, offset, error = results_query()
+    if error:
+        return error
+    store = result_store()
+    rows = store.changes(job_id, change=request.args.get('change') or None, limit=limit, offset=offset)
+    return results_response(store, rows, CHANGE_FIELDS, limit, offset, f'changes_{job_id}')
+
+
+@main.route('/api/results/jobs', methods=['GET'])
+def result_jobs():
+    """List the jobs recorded in the result store, newest first."""
+    limit, offset, error = results_query()
+    if error:
+        return error
+    store = result_store()
+    rows = store.jobs(limit=limit, offset=offset)
+    return results_response(store, rows, JOB_FIELDS, limit, offset, 'jobs')
+
+
+@main.route('/metrics', methods=['GET'])
+def metrics_route():
+    """Expose request, latency, cache and queue metrics in the Prometheus text format."""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
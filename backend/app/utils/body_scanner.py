@@ -0,0 +1,142 @@
+import codecs
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from ..emails.email_extractor import EmailExtractor, default_extractor
+
+# Upper bound on bytes read from any single response body
+DEFAULT_MAX_BYTES = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+OPEN_BLOCK = re.compile(r"<(script|style)\b", re.IGNORECASE)
+CLOSE_BLOCK = {
+    'script': re.compile(r"</script", re.IGNORECASE),
+    'style': re.compile(r"</style", re.IGNORECASE),
+}
+
+
+class BodyScanner(ABC):
+    """
+    Incremental scanner fed with raw response chunks.
+
+    ``feed`` returns True once the scanner has a decisive answer, which tells
+    the reader to stop downloading the rest of the body.
+    """
+
+    @abstractmethod
+    def feed(self, chunk: bytes) -> bool:
+        """Scan the next chunk of the body and return True to stop reading."""
+
+    def finish(self) -> None:
+        """Called once after the last chunk, whether or not reading stopped early."""
+
+
+class EmailScanner(BodyScanner):
+    """
+    Extract emails from a body as it streams in.
+
+    Decoded text is buffered up to the last '>' that is not inside an open
+    <script>/<style> block. No address or obfuscation contains '>', so each
+    flushed piece can be scanned on its own without losing matches.
+    """
+
+    def __init__(self, encoding: str = 'utf-8', limit: Optional[int] = None,
+                 extractor: EmailExtractor = default_extractor):
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.limit = limit
+        self.extractor = extractor
+        self.buffer = ''
+        self.emails: Dict[str, None] = {}
+
+    def _safe_cut(self) -> int:
+        cut = self.buffer.rfind('>') + 1
+        last_open = None
+        for last_open in OPEN_BLOCK.finditer(self.buffer, 0, cut):
+            pass
+        if last_open is not None:
+            closing = CLOSE_BLOCK[last_open.group(1).lower()]
+            if closing.search(self.buffer, last_open.end(), cut) is None:
+                cut = last_open.start()
+        return cut
+
+    def _scan(self, text: str) -> bool:
+        self.extractor.extract(text, limit=self.limit, seen=self.emails)
+        return self.limit is not None and len(self.emails) >= self.limit
+
+    def feed(self, chunk: bytes) -> bool:
+        self.buffer += self.decoder.decode(chunk)
+        cut = self._safe_cut()
+        if cut <= 0:
+            return False
+        text, self.buffer = self.buffer[:cut], self.buffer[cut:]
+        return self._scan(text)
+
+    def finish(self) -> None:
+        self.buffer += self.decoder.decode(b'', final=True)
+        if self.buffer:
+            self._scan(self.buffer)
+            self.buffer = ''
+
+    @property
+    def found(self) -> List[str]:
+        return list(self.emails)
+
+
+def response_encoding(response) -> str:
+    """Best-effort text encoding for an aiohttp response, defaulting to UTF-8."""
+    encoding = response.charset or 'utf-8'
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = 'utf-8'
+    return encoding
+
+
+async def scan_response(response, scanner: BodyScanner, max_bytes: int = DEFAULT_MAX_BYTES,
+                        chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Feed an aiohttp response body to ``scanner`` chunk by chunk.
+
+    Reading stops at ``max_bytes`` or as soon as the scanner reports a decisive
+    match, so neither bandwidth nor memory grow with the size of the page.
+
+    Returns:
+        Number of body bytes read
+    """
+    read = 0
+    try:
+        while read < max_bytes:
+            chunk = await response.content.read(min(chunk_size, max_bytes - read))
+            if not chunk:
+                break
+            read += len(chunk)
+            if scanner.feed(chunk):
+                break
+    finally:
+        scanner.finish()
+    return read
+
+
+async def read_body(response, max_bytes: int = DEFAULT_MAX_BYTES, chunk_size: int = CHUNK_SIZE) -> bytes:
+    """Read at most ``max_bytes`` of a response body as raw bytes."""
+    chunks = []
+    read = 0
+    while read < max_bytes:
+        chunk = await response.content.read(min(chunk_size, max_bytes - read))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        read += len(chunk)
+    return b''.join(chunks)
+
+
+# Whole-body variants of the scanners. They take and return plain values so
+# they can run in a ParseExecutor worker thread or process.
+
+def extract_body_emails(body: bytes, encoding: str = 'utf-8', limit: Optional[int] = None) -> List[str]:
+    """Extract emails from a complete response body."""
+    scanner = EmailScanner(encoding, limit=limit)
+    scanner.feed(body)
+    scanner.finish()
+    return scanner.found
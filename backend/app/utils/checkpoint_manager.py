@@ -0,0 +1,283 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.dirname(__file__), '../checkpoints')
+# File name prefix of the checkpoints written for background jobs
+JOB_CHECKPOINT_PREFIX = 'job-'
+
+
+class CheckpointManager:
+    """
+    Store checkpoints as ``<prefix><type>_<checkpoint_id>.json`` files holding
+    ``{"data": ..., "metadata": {"type", "created_at", "checkpoint_id"}}``.
+
+    Listing and cleanup only consider files with this manager's ``prefix``,
+    so other files in a shared directory are never read or deleted.
+
+    Files are written to a temporary file and renamed over the old one, so a
+    crash mid-write never leaves a truncated checkpoint behind.
+    """
+
+    def __init__(self, checkpoint_dir: Optional[str] = None, prefix: str = ''):
+        """Initialize the checkpoint manager."""
+        self.checkpoint_dir = checkpoint_dir or DEFAULT_CHECKPOINT_DIR
+        self.prefix = prefix
+        self._ensure_checkpoint_dir()
+
+    def _ensure_checkpoint_dir(self) -> None:
+        """Ensure the checkpoint directory exists."""
+        if not os.path.exists(self.checkpoint_dir):
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            logger.info(f"Created checkpoint directory: {self.checkpoint_dir}")
+
+    def _generate_checkpoint_id(self, data: Dict) -> str:
+        """Generate a unique checkpoint ID based on the data."""
+        data_str = json.dumps(data, sort_keys=True)
+        return hashlib.md5(data_str.encode()).hexdigest()
+
+    def _path(self, checkpoint_id: str, checkpoint_type: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{self.prefix}{checkpoint_type}_{checkpoint_id}.json")
+
+    def _rows_path(self, checkpoint_id: str, checkpoint_type: str) -> str:
+        return self._path(checkpoint_id, checkpoint_type) + 'l'
+
+    def append_rows(self, checkpoint_type: str, checkpoint_id: str, rows: Iterable[Tuple[int, Any]]) -> bool:
+        """
+        Append ``(index, result)`` rows to the checkpoint's JSON lines file,
+        next to its ``.json`` file, so saving progress costs only the new rows.
+        """
+        try:
+            with open(self._rows_path(checkpoint_id, checkpoint_type), 'a', encoding='utf-8') as f:
+                for index, result in rows:
+                    f.write(json.dumps([index, result]) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            return True
+        except Exception as e:
+            logger.error(f"Error saving checkpoint rows: {str(e)}")
+            return False
+
+    def load_rows(self, checkpoint_id: str, checkpoint_type: str) -> Dict[int, Any]:
+        """Load the rows appended to a checkpoint; a line cut short by a crash is skipped."""
+        rows = {}
+        try:
+            with open(self._rows_path(checkpoint_id, checkpoint_type), encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        index, result = json.loads(line)
+                    except ValueError:
+                        continue
+                    rows[int(index)] = result
+        except FileNotFoundError:
+            pass
+        return rows
+
+    def save_checkpoint(self, checkpoint_type: str, data: Dict, checkpoint_id: Optional[str] = None) -> Optional[str]:
+        """
+        Save a checkpoint with the given data, replacing any previous version.
+
+        Returns:
+            The checkpoint ID, or None if saving failed
+        """
+        try:
+            checkpoint_id = checkpoint_id or self._generate_checkpoint_id(data)
+            checkpoint_data = {
+                "data": data,
+                "metadata": {
+                    "type": checkpoint_type,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "checkpoint_id": checkpoint_id
+                }
+            }
+            fd, temp_path = tempfile.mkstemp(dir=self.checkpoint_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(checkpoint_data, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self._path(checkpoint_id, checkpoint_type))
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            logger.debug(f"Saved checkpoint: {checkpoint_type}_{checkpoint_id}")
+            return checkpoint_id
+        except Exception as e:
+            logger.error(f"Error saving checkpoint: {str(e)}")
+            return None
+
+    def has_checkpoint(self, checkpoint_id: str, checkpoint_type: str) -> bool:
+        return os.path.exists(self._path(checkpoint_id, checkpoint_type))
+
+    def load_checkpoint(self, checkpoint_id: str, checkpoint_type: str) -> Optional[Dict]:
+        """Load a checkpoint by ID and type."""
+        path = self._path(checkpoint_id, checkpoint_type)
+        if not os.path.exists(path):
+            logger.warning(f"Checkpoint not found: {checkpoint_type}_{checkpoint_id}")
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            logger.info(f"Loaded checkpoint: {checkpoint_type}_{checkpoint_id}")
+            return checkpoint
+        except Exception as e:
+            logger.error(f"Error loading checkpoint: {str(e)}")
+            return None
+
+    def find_checkpoint(self, checkpoint_id: str) -> Optional[Dict]:
+        """Load a checkpoint by ID whatever its type."""
+        for checkpoint in self.list_checkpoints():
+            if checkpoint["id"] == checkpoint_id:
+                return self.load_checkpoint(checkpoint_id, checkpoint["type"])
+        return None
+
+    def list_checkpoints(self, checkpoint_type: Optional[str] = None) -> List[Dict]:
+        """List all checkpoints, newest first, optionally filtered by type."""
+        checkpoints = []
+        try:
+            for filename in os.listdir(self.checkpoint_dir):
+                if not filename.startswith(self.prefix) or not filename.endswith('.json'):
+                    continue
+                if checkpoint_type and not filename.startswith(f"{self.prefix}{checkpoint_type}_"):
+                    continue
+                filepath = os.path.join(self.checkpoint_dir, filename)
+                try:
+                    with open(filepath, encoding='utf-8') as f:
+                        metadata = json.load(f).get("metadata", {})
+                except (OSError, ValueError):
+                    continue
+                checkpoints.append({
+                    "id": metadata.get("checkpoint_id"),
+                    "type": metadata.get("type"),
+                    "created_at": metadata.get("created_at"),
+                    "filename": filename
+                })
+        except Exception as e:
+            logger.error(f"Error listing checkpoints: {str(e)}")
+        return sorted(checkpoints, key=lambda x: x["created_at"] or '', reverse=True)
+
+    def delete_checkpoint(self, checkpoint_id: str, checkpoint_type: str) -> bool:
+        """Delete a checkpoint by ID and type."""
+        try:
+            path = self._path(checkpoint_id, checkpoint_type)
+            rows_path = self._rows_path(checkpoint_id, checkpoint_type)
+            if os.path.exists(rows_path):
+                os.remove(rows_path)
+            if os.path.exists(path):
+                os.remove(path)
+                logger.info(f"Deleted checkpoint: {checkpoint_type}_{checkpoint_id}")
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Error deleting checkpoint: {str(e)}")
+            return False
+
+    def cleanup_old_checkpoints(self, max_age_days: int = 7) -> int:
+        """Clean up checkpoints older than the specified number of days."""
+        count = 0
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+            for checkpoint in self.list_checkpoints():
+                if checkpoint["created_at"] and _utc(checkpoint["created_at"]) < cutoff:
+                    if self.delete_checkpoint(checkpoint["id"], checkpoint["type"]):
+                        count += 1
+            logger.info(f"Cleaned up {count} old checkpoints")
+        except Exception as e:
+            logger.error(f"Error cleaning up checkpoints: {str(e)}")
+        return count
+
+
+def _utc(timestamp: str) -> datetime:
+    """Parse an ISO timestamp, reading one without a timezone as UTC."""
+    parsed = datetime.fromisoformat(timestamp)
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+class JobCheckpoint:
+    """
+    Resumable progress of one pipeline run.
+
+    ``completed`` maps input row indices to their result (an output row,
+    the URL if it passed a filter, ...), and ``state`` holds anything else the stage needs
+    to continue, such as the next search offset. ``params`` records how the
+    run was started so it can be restarted the same way. Changes are written
+    at most every ``interval`` seconds; call ``save`` to force a write. Each
+    write appends only the rows completed since the last one, so saving
+    never grows with the number of rows already done.
+    """
+
+    def __init__(self, manager: CheckpointManager, checkpoint_type: str, checkpoint_id: str,
+                 params: Dict[str, Any], interval: float = 10.0):
+        self.manager = manager
+        self.checkpoint_type = checkpoint_type
+        self.checkpoint_id = checkpoint_id
+        self.params = params
+        self.interval = interval
+        self.completed: Dict[int, Any] = {}
+        self.state: Dict[str, Any] = {}
+        self._unsaved: List[Tuple[int, Any]] = []
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    @classmethod
+    def open(cls, manager: CheckpointManager, checkpoint_type: str, checkpoint_id: str,
+             params: Dict[str, Any], interval: float = 10.0) -> 'JobCheckpoint':
+        """Resume the stored checkpoint with this ID, or start a new one."""
+        checkpoint = cls(manager, checkpoint_type, checkpoint_id, params, interval)
+        stored = None
+        if manager.has_checkpoint(checkpoint_id, checkpoint_type):
+            stored = manager.load_checkpoint(checkpoint_id, checkpoint_type)
+        if stored is not None:
+            checkpoint.completed = manager.load_rows(checkpoint_id, checkpoint_type)
+            checkpoint.state = stored.get("data", {}).get("state", {})
+            logger.info(f"Resuming {checkpoint_type} run {checkpoint_id} after "
+                        f"{len(checkpoint.completed)} completed rows")
+        else:
+            # Rows left behind without their checkpoint belong to no resumable run
+            manager.delete_checkpoint(checkpoint_id, checkpoint_type)
+        return checkpoint
+
+    def is_done(self, index: int) -> bool:
+        return index in self.completed
+
+    def record(self, index: int, result: Any = None) -> None:
+        """Mark a row as completed with its result."""
+        self.completed[index] = result
+        self._unsaved.append((index, result))
+        self._changed()
+
+    def update(self, **state) -> None:
+        """Update stage state such as offsets."""
+        self.state.update(state)
+        self._changed()
+
+    def _changed(self) -> None:
+        self._dirty = True
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save()
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        if self._unsaved:
+            if not self.manager.append_rows(self.checkpoint_type, self.checkpoint_id, self._unsaved):
+                return
+            self._unsaved = []
+        self.manager.save_checkpoint(self.checkpoint_type, {
+            "params": self.params,
+            "state": self.state,
+        }, checkpoint_id=self.checkpoint_id)
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def delete(self) -> None:
+        self.manager.delete_checkpoint(self.checkpoint_id, self.checkpoint_type)
@@ -0,0 +1,226 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from aiohttp.abc import AbstractResolver
+
+from .domains import hostname
+from .metrics import CACHE_LOOKUPS
+
+try:
+    import aiodns
+except ImportError:  # optional: lookups fall back to getaddrinfo on a thread pool
+    aiodns = None
+
+Addresses = List[Dict[str, Any]]
+
+# Bound once: every connection and prefetch goes through the cache
+DNS_HITS = CACHE_LOOKUPS.labels('dns', 'hit')
+DNS_MISSES = CACHE_LOOKUPS.labels('dns', 'miss')
+
+
+class DnsCache:
+    """
+    Process-wide TTL + LRU cache of DNS answers, shared by every job.
+
+    Domains that definitively do not exist are cached as well, for
+    ``negative_ttl`` seconds, so a dead domain that shows up in several
+    uploads is only looked up once.
+    """
+
+    def __init__(self, ttl: float = 300, negative_ttl: float = 600, max_entries: int = 100000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, Optional[Addresses]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, host: str, family: int) -> Tuple[bool, Optional[Addresses]]:
+        """
+        Returns:
+            ``(found, addresses)``; addresses is None for a cached failure
+        """
+        key = (host, family)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, addresses = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    DNS_HITS.inc()
+                    return True, addresses
+                del self._entries[key]
+            self.misses += 1
+            DNS_MISSES.inc()
+            return False, None
+
+    def put(self, host: str, family: int, addresses: Optional[Addresses]) -> None:
+        ttl = self.ttl if addresses else self.negative_ttl
+        with self._lock:
+            self._entries[(host, family)] = (time.monotonic() + ttl, addresses)
+            self._entries.move_to_end((host, family))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Shared across jobs, so a filter run warms the cache for the email run that follows
+dns_cache = DnsCache(
+    ttl=float(os.getenv('DNS_CACHE_TTL', 300)),
+    negative_ttl=float(os.getenv('DNS_NEGATIVE_TTL', 600)),
+)
+
+# Lookups in flight at once per resolver
+DNS_CONCURRENCY = int(os.getenv('DNS_CONCURRENCY', 64))
+
+# getaddrinfo errors meaning the name has no address, as opposed to a
+# resolver failure (EAI_AGAIN, EAI_FAIL, ...) that may not happen next time
+NO_ADDRESS_ERRORS = {socket.EAI_NONAME} | ({socket.EAI_NODATA} if hasattr(socket, 'EAI_NODATA') else set())
+
+
+def _is_definitive(error: Exception) -> bool:
+    """True if a failed lookup proves the name does not resolve, rather than that the resolver failed."""
+    if isinstance(error, socket.gaierror):
+        return error.errno in NO_ADDRESS_ERRORS
+    if aiodns is not None and isinstance(error, aiodns.error.DNSError):
+        return bool(error.args) and error.args[0] in (aiodns.error.ARES_ENOTFOUND, aiodns.error.ARES_ENODATA)
+    # Host names that cannot be encoded for a lookup never resolve
+    return isinstance(error, ValueError)
+
+
+class CachingResolver(AbstractResolver):
+    """
+    aiohttp resolver backed by ``DnsCache``, with bounded concurrency.
+
+    Pass it to ``TCPConnector(resolver=...)`` so connections use the
+    addresses found by ``resolves`` and ``prefetch`` instead of looking the
+    host up again. Concurrent lookups of the same host share one query.
+    Queries go through aiodns when it is installed and otherwise through
+    ``getaddrinfo`` on a dedicated thread pool of ``concurrency`` threads.
+
+    Only definitive answers are cached. A timeout or resolver error raises
+    OSError from ``lookup`` and is not remembered, so the next request for
+    the host asks again instead of treating a live domain as dead.
+    """
+
+    def __init__(self, cache: DnsCache = dns_cache, concurrency: int = DNS_CONCURRENCY, timeout: float = 5):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._executor = None
+        self._dns = None
+        self._prefetching: set = set()
+
+    async def lookup(self, host: str, family: int = socket.AF_INET) -> Optional[Addresses]:
+        """
+        Return the addresses of ``host`` (with port 0), or None if it does not
+        resolve. Raises OSError when the lookup failed without an answer.
+        """
+        found, addresses = self.cache.get(host, family)
+        if found:
+            return addresses
+        key = (host, family)
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = asyncio.ensure_future(self._query(host, family))
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _query(self, host: str, family: int) -> Optional[Addresses]:
+        async with self._semaphore:
+            try:
+                addresses = await asyncio.wait_for(self._getaddrinfo(host, family), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                raise OSError(f"DNS lookup timed out for {host}") from None
+            except Exception as e:
+                if not _is_definitive(e):
+                    # aiodns errors do not derive from OSError, which callers expect
+                    if aiodns is not None and isinstance(e, aiodns.error.DNSError):
+                        raise OSError(f"DNS lookup failed for {host}: {e}") from e
+                    raise
+                addresses = None
+        self.cache.put(host, family, addresses or None)
+        return addresses or None
+
+    async def _getaddrinfo(self, host: str, family: int) -> Addresses:
+        if aiodns is not None:
+            if self._dns is None:
+                self._dns = aiodns.DNSResolver()
+            answer = await self._dns.gethostbyname(host, family or socket.AF_INET)
+            return [{"hostname": host, "host": address, "port": 0,
+                     "family": socket.AF_INET6 if ':' in address else socket.AF_INET,
+                     "proto": 0, "flags": socket.AI_NUMERICHOST} for address in answer.addresses]
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='dns')
+        infos = await asyncio.get_running_loop().run_in_executor(
+            self._executor, socket.getaddrinfo, host, 0, family, socket.SOCK_STREAM, 0, socket.AI_ADDRCONFIG)
+        return [{"hostname": host, "host": address[0], "port": 0, "family": info_family,
+                 "proto": proto, "flags": socket.AI_NUMERICHOST | socket.AI_NUMERICSERV}
+                for info_family, _, proto, _, address in infos]
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> Addresses:
+        addresses = await self.lookup(host, family)
+        if not addresses:
+            raise OSError(f"DNS lookup failed for {host}")
+        return [dict(address, port=port) for address in addresses]
+
+    async def resolves(self, url: str) -> bool:
+        """True unless the host of ``url`` definitively does not resolve; IP addresses always do."""
+        host = hostname(url)
+        if not host:
+            return False
+        if _is_ip(host):
+            return True
+        try:
+            return await self.lookup(host, socket.AF_UNSPEC) is not None
+        except OSError:
+            # No answer either way: let the request try, and look the host up again
+            return True
+
+    def prefetch(self, items: Iterable, url_of: Callable[[Any], str] = lambda item: item) -> Iterator:
+        """
+        Pass ``items`` through unchanged while starting a lookup for each one.
+
+        Must be iterated inside the event loop. Consumers read ahead of their
+        workers (scheduler backlog, queues), so by the time a worker picks an
+        item up its host is usually resolved already and dead domains are
+        dropped without waiting on DNS.
+        """
+        for item in items:
+            self.warm(url_of(item))
+            yield item
+
+    def warm(self, url: str) -> None:
+        """Start looking up the host of ``url`` in the background."""
+        task = asyncio.ensure_future(self.resolves(url))
+        # Keep a reference until done so the task is not garbage collected
+        self._prefetching.add(task)
+        task.add_done_callback(self._prefetching.discard)
+
+    async def close(self) -> None:
+        for task in list(self._prefetching):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._dns is not None:
+            self._dns.cancel()
+            self._dns = None
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        socket.inet_pton(socket.AF_INET6 if ':' in host else socket.AF_INET, host)
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,90 @@
+from urllib.parse import urlparse
+
+try:
+    import tldextract
+except ImportError:  # optional: fall back to the suffix list below
+    tldextract = None
+
+# Second-level public suffixes seen in our lead lists. Registered domains under
+# these keep three labels (shop.co.uk) instead of two (co.uk).
+MULTI_PART_SUFFIXES = frozenset((
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'ltd.uk', 'plc.uk', 'me.uk',
+    'com.au', 'net.au', 'org.au', 'co.nz', 'org.nz', 'co.in', 'net.in', 'org.in', 'firm.in',
+    'co.jp', 'ne.jp', 'or.jp', 'co.kr', 'or.kr', 'com.cn', 'net.cn', 'com.hk', 'com.tw',
+    'com.sg', 'com.my', 'co.id', 'co.th', 'com.ph', 'com.pk', 'com.bd', 'com.vn',
+    'com.br', 'com.mx', 'com.ar', 'com.co', 'com.pe', 'com.tr', 'com.sa', 'com.eg',
+    'co.za', 'com.ng', 'co.ke', 'co.il', 'com.ua', 'com.pl',
+    # Hosting platforms where every subdomain is a separate site
+    'myshopify.com', 'wixsite.com', 'squarespace.com', 'blogspot.com', 'wordpress.com',
+    'github.io', 'netlify.app', 'vercel.app', 'herokuapp.com', 'webflow.io',
+))
+
+# Leading labels that only pick a variant of the same site (www.shop.com, m.shop.com)
+ALIAS_SUBDOMAINS = frozenset(('www', 'www1', 'www2', 'www3', 'm', 'mobile', 'amp'))
+
+# Uses the bundled public suffix list snapshot, never the network
+_extract = tldextract.TLDExtract(suffix_list_urls=(), include_psl_private_domains=True) if tldextract else None
+
+
+def hostname(url: str) -> str:
+    """Return the lowercased host of a URL, accepting URLs without a scheme."""
+    if '://' not in url:
+        url = 'https://' + url
+    return (urlparse(url).hostname or '').rstrip('.')
+
+
+def registered_domain(url: str) -> str:
+    """
+    Return the registered domain of a URL or host, e.g. ``shop.example.co.uk``
+    becomes ``example.co.uk``. IP addresses and single-label hosts are returned
+    unchanged.
+    """
+    host = hostname(url)
+    labels = host.split('.')
+    if len(labels) <= 2 or host.replace('.', '').isdigit():
+        return host
+    if _extract is not None:
+        return _extract(host).registered_domain or host
+    if '.'.join(labels[-2:]) in MULTI_PART_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def canonical_host(url: str) -> str:
+    """
+    Return the host identifying a site: lowercased, with alias labels such as
+    ``www.`` or ``m.`` removed down to the registered domain, so
+    ``www.shop.co.uk`` and ``m.shop.co.uk`` both become ``shop.co.uk`` while
+    ``blog.shop.co.uk`` stays as it is.
+    """
+    host = hostname(url)
+    domain = registered_domain(host)
+    labels = host.split('.')
+    while len(labels) > 1 and labels[0] in ALIAS_SUBDOMAINS and '.'.join(labels) != domain:
+        labels.pop(0)
+    return '.'.join(labels)
+
+
+def site_key(url: str) -> str:
+    """Dedupe key for the site a URL belongs to: canonical host plus any explicit port."""
+    if '://' not in url:
+        url = 'https://' + url
+    try:
+        port = urlparse(url).port
+    except ValueError:  # malformed port
+        port = None
+    host = canonical_host(url)
+    return f"{host}:{port}" if port else host
+
+
+def site_url(url: str) -> str:
+    """
+    Return the root URL of the site a URL belongs to, e.g.
+    ``www.shop.com/blog/post?id=1`` becomes ``https://www.shop.com/``. The
+    scheme defaults to https and the host is kept as given, since some sites
+    only answer on their ``www.`` name.
+    """
+    if '://' not in url:
+        url = 'https://' + url
+    parsed = urlparse(url)
+    return f"{parsed.scheme.lower()}://{parsed.netloc.lower()}/"
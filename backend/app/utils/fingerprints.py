@@ -0,0 +1,191 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .body_scanner import BodyScanner
+
+# Storefront platforms the fingerprints can tell apart
+PLATFORMS = ('shopify', 'woocommerce', 'magento', 'bigcommerce', 'wix', 'squarespace')
+
+# Confidence needed before a platform is reported, and at which reading stops
+# (one strong signature, such as the platform's asset host, is enough)
+MIN_CONFIDENCE = 0.5
+DECISIVE_CONFIDENCE = 0.9
+
+
+@dataclass(frozen=True)
+class Signature:
+    """
+    One piece of evidence for a platform, with ``weight`` the confidence it
+    gives on its own (0-1).
+
+    ``pattern`` is a lowercase substring of the page body, a header name
+    (optionally with ``value``, a lowercase substring of its value) or a
+    cookie name prefix, depending on the list it is in.
+    """
+    platform: str
+    pattern: str
+    weight: float
+    value: Optional[str] = None
+
+
+# Asset hosts, script paths and markup only the platform emits. Bare platform
+# names are left out on purpose: "shopify" appears in the text of countless
+# sites that merely link to or write about it.
+BODY_SIGNATURES = [
+    Signature('shopify', 'cdn.shopify.com', 0.9),
+    Signature('shopify', 'shopify.theme', 0.9),
+    Signature('shopify', '.myshopify.com', 0.7),
+    Signature('shopify', 'shopify-section', 0.7),
+    Signature('shopify', 'shopify-payment-button', 0.7),
+    Signature('woocommerce', 'wp-content/plugins/woocommerce', 0.9),
+    Signature('woocommerce', 'woocommerce-no-js', 0.8),
+    Signature('woocommerce', 'wc-blocks', 0.5),
+    Signature('woocommerce', 'wc_add_to_cart_params', 0.8),
+    Signature('magento', 'data-mage-init', 0.9),
+    Signature('magento', 'mage/cookies', 0.8),
+    Signature('magento', 'magento_ui', 0.7),
+    Signature('magento', 'requirejs-config.js', 0.4),
+    Signature('bigcommerce', 'cdn11.bigcommerce.com', 0.9),
+    Signature('bigcommerce', 'bigcommerce.com/s-', 0.8),
+    Signature('bigcommerce', 'stencil-utils', 0.6),
+    Signature('wix', 'static.wixstatic.com', 0.9),
+    Signature('wix', 'static.parastorage.com', 0.9),
+    Signature('wix', 'wix-thunderbolt', 0.8),
+    Signature('squarespace', 'static1.squarespace.com', 0.9),
+    Signature('squarespace', 'assets.squarespace.com', 0.9),
+    Signature('squarespace', 'this is squarespace.', 0.9),
+]
+
+HEADER_SIGNATURES = [
+    Signature('shopify', 'x-shopid', 0.9),
+    Signature('shopify', 'x-shopify-stage', 0.9),
+    Signature('shopify', 'powered-by', 0.9, 'shopify'),
+    Signature('magento', 'x-magento-tags', 0.9),
+    Signature('magento', 'x-magento-cache-debug', 0.9),
+    Signature('bigcommerce', 'x-bc-storefront-render-mode', 0.9),
+    Signature('wix', 'x-wix-request-id', 0.9),
+    Signature('squarespace', 'server', 0.9, 'squarespace'),
+    Signature('woocommerce', 'link', 0.5, 'wc/store'),
+]
+
+COOKIE_SIGNATURES = [
+    Signature('shopify', '_shopify_', 0.8),
+    Signature('shopify', 'cart_sig', 0.5),
+    Signature('woocommerce', 'woocommerce_', 0.8),
+    Signature('woocommerce', 'wp_woocommerce_session_', 0.9),
+    Signature('magento', 'mage-cache-', 0.8),
+    Signature('bigcommerce', 'shop_session_token', 0.7),
+    Signature('bigcommerce', 'fornax_anonymousid', 0.6),
+    Signature('wix', 'svsession', 0.7),
+    Signature('squarespace', 'ss_cvr', 0.7),
+]
+
+# <meta name="generator"> values naming a platform
+GENERATOR_NAMES = {
+    'woocommerce': 'woocommerce',
+    'magento': 'magento',
+    'bigcommerce': 'bigcommerce',
+    'wix.com': 'wix',
+    'squarespace': 'squarespace',
+    'shopify': 'shopify',
+}
+GENERATOR_WEIGHT = 0.9
+GENERATOR_TAG = rb'<meta[^>]{0,200}?generator[^>]{0,200}>'
+
+# Every body signature and the generator tag compiled into one alternation,
+# so a chunk is searched in a single pass however many signatures there are
+_BODY_PATTERNS = {signature.pattern.encode('ascii'): signature for signature in BODY_SIGNATURES}
+BODY_MATCHER = re.compile(
+    b'|'.join([re.escape(pattern) for pattern in sorted(_BODY_PATTERNS, key=len, reverse=True)] + [GENERATOR_TAG]))
+# Bytes kept between chunks so a match split across two chunks is still found
+_OVERLAP = 420
+
+
+def body_evidence(window: bytes) -> List[Tuple[str, str, float]]:
+    """Return ``(platform, evidence key, weight)`` for every signature in a lowercased body window."""
+    evidence = []
+    for match in BODY_MATCHER.finditer(window):
+        text = match.group()
+        signature = _BODY_PATTERNS.get(text)
+        if signature is not None:
+            evidence.append((signature.platform, 'body:' + signature.pattern, signature.weight))
+            continue
+        for name, platform in GENERATOR_NAMES.items():
+            if name.encode('ascii') in text:
+                evidence.append((platform, 'generator:' + name, GENERATOR_WEIGHT))
+    return evidence
+
+
+class Fingerprint:
+    """
+    Evidence collected for each platform.
+
+    Each distinct piece of evidence counts once, and independent pieces add
+    up as ``1 - prod(1 - weight)``, so two medium signals beat one and no
+    amount of evidence passes 1.
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, set] = {}
+        self._misses: Dict[str, float] = {}
+
+    def add(self, platform: str, key: str, weight: float) -> None:
+        keys = self._keys.setdefault(platform, set())
+        if key not in keys:
+            keys.add(key)
+            self._misses[platform] = self._misses.get(platform, 1.0) * (1 - weight)
+
+    def add_headers(self, headers: Mapping[str, str], cookies: Iterable[str] = ()) -> None:
+        """Add the evidence of response headers and the names of the cookies the response sets."""
+        lowered = {name.lower(): value.lower() for name, value in headers.items()}
+        for signature in HEADER_SIGNATURES:
+            value = lowered.get(signature.pattern)
+            if value is not None and (signature.value is None or signature.value in value):
+                self.add(signature.platform, 'header:' + signature.pattern, signature.weight)
+        for cookie in cookies:
+            cookie = cookie.lower()
+            for signature in COOKIE_SIGNATURES:
+                if cookie.startswith(signature.pattern):
+                    self.add(signature.platform, 'cookie:' + signature.pattern, signature.weight)
+
+    def confidence(self, platform: str) -> float:
+        return 1 - self._misses.get(platform, 1.0)
+
+    def best(self) -> Tuple[Optional[str], float]:
+        """Return the most likely platform and its confidence, or (None, 0.0) without any evidence."""
+        if not self._misses:
+            return None, 0.0
+        platform = min(self._misses, key=self._misses.get)
+        return platform, round(self.confidence(platform), 3)
+
+    def platform(self) -> Tuple[Optional[str], float]:
+        """Return the detected platform and its confidence, or None when no platform reaches MIN_CONFIDENCE."""
+        platform, confidence = self.best()
+        return (platform, confidence) if confidence >= MIN_CONFIDENCE else (None, confidence)
+
+    @property
+    def decisive(self) -> bool:
+        return self.best()[1] >= DECISIVE_CONFIDENCE
+
+
+class PlatformScanner(BodyScanner):
+    """Stream a body into a Fingerprint, stopping once one platform is certain."""
+
+    def __init__(self, fingerprint: Fingerprint):
+        self.fingerprint = fingerprint
+        self.tail = b''
+
+    def feed(self, chunk: bytes) -> bool:
+        if self.fingerprint.decisive:
+            return True
+        window = self.tail + chunk.lower()
+        for platform, key, weight in body_evidence(window):
+            self.fingerprint.add(platform, key, weight)
+        self.tail = window[-_OVERLAP:]
+        return self.fingerprint.decisive
+
+
+def fingerprint_body(body: bytes) -> List[Tuple[str, str, float]]:
+    """Return the body evidence of a complete response body; runs on a ParseExecutor."""
+    return body_evidence(body.lower())
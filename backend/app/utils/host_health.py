@@ -0,0 +1,212 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Mapping, Optional
+
+import aiohttp
+
+from .domains import site_key
+from .metrics import RequestTiming
+from .rate_limit import TokenBucket
+
+# Statuses meaning "slow down" rather than "broken"
+THROTTLE_STATUSES = (429, 503)
+
+
+class HostUnavailable(Exception):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+
+class _HostState:
+    __slots__ = ('bucket', 'failures', 'blocked_until', 'open_until')
+
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate=rate, capacity=burst)
+        self.failures = 0
+        self.blocked_until = 0.0
+        self.open_until = 0.0
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostHealth:
+    """
+    Per-host politeness and failure tracking shared by every HTTP client.
+
+    Each host (canonical host and port) gets a token bucket of ``rate``
+    requests per second. The rate adapts: a 429/503 halves it, down to
+    ``min_rate``, and every success wins back a tenth of the base rate.
+    ``Retry-After`` holds all requests to the host for that long, up to
+    ``max_retry_after``. Failures without one back off exponentially.
+
+    After ``failure_threshold`` consecutive failures (connection errors,
+    timeouts, 5xx, 429) the circuit opens. For ``cooldown`` seconds,
+    ``acquire`` then raises ``HostUnavailable`` at once instead of waiting on
+    a dead host. The first request after the cooldown is a trial: success
+    closes the circuit, failure opens it again.
+
+    Thread-safe, so the synchronous SerpAPI client and every async job can
+    share one instance.
+    """
+
+    def __init__(self, rate: float = 5, burst: float = 10, min_rate: float = 0.2,
+                 failure_threshold: int = 5, cooldown: float = 300, backoff: float = 0.5,
+                 max_retry_after: float = 60, max_hosts: int = 50000):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        self.max_hosts = max_hosts
+        self._hosts: "OrderedDict[str, _HostState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, url: str) -> _HostState:
+        key = site_key(url)
+        state = self._hosts.get(key)
+        if state is None:
+            state = self._hosts[key] = _HostState(self.rate, self.burst)
+            while len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(key)
+        return state
+
+    def available(self, url: str) -> bool:
+        """False while the host's circuit is open."""
+        with self._lock:
+            return self._state(url).open_until <= time.monotonic()
+
+    def _reserve(self, url: str) -> float:
+        """Check the circuit and take a token; return how long to wait before sending."""
+        with self._lock:
+            state = self._state(url)
+            now = time.monotonic()
+            if state.open_until > now:
+                raise HostUnavailable(f"{site_key(url)} is failing, skipped for {state.open_until - now:.0f}s")
+            if state.failures >= self.failure_threshold:
+                # Cooldown over: let this request through as the trial and hold the rest
+                state.open_until = now + self.cooldown
+            wait = state.bucket.reserve(1)
+            return max(wait, state.blocked_until - now)
+
+    async def acquire(self, url: str) -> None:
+        """Wait until a request to ``url``'s host may be sent; raises HostUnavailable if its circuit is open."""
+        wait = self._reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, url: str) -> None:
+        """Blocking variant of ``acquire`` for thread-based clients."""
+        wait = self._reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    def record(self, url: str, status: Optional[int] = None, headers: Optional[Mapping[str, str]] = None,
+               error: bool = False) -> None:
+        """
+        Record the outcome of a request: its status and headers, or ``error``
+        for a request that got no response.
+        """
+        throttled = status in THROTTLE_STATUSES
+        failed = error or throttled or (status is not None and status >= 500)
+        with self._lock:
+            state = self._state(url)
+            now = time.monotonic()
+            bucket = state.bucket
+            if not failed:
+                state.failures = 0
+                state.open_until = 0.0
+                bucket.rate = min(self.rate, bucket.rate + self.rate / 10)
+                return
+
+            state.failures += 1
+            if throttled and self.rate > 0:
+                bucket.rate = max(self.min_rate, bucket.rate / 2)
+            delay = retry_after_seconds((headers or {}).get('Retry-After')) if throttled else None
+            if delay is None:
+                delay = self.backoff * 2 ** (state.failures - 1)
+            state.blocked_until = max(state.blocked_until, now + min(delay, self.max_retry_after))
+            if state.failures >= self.failure_threshold:
+                state.open_until = now + self.cooldown
+
+    def should_retry(self, status: Optional[int], headers: Optional[Mapping[str, str]] = None) -> bool:
+        """
+        True for a throttled response worth retrying once: the host did not
+        ask for a longer wait than ``max_retry_after``. The next ``acquire``
+        already waits for the Retry-After period.
+        """
+        if status not in THROTTLE_STATUSES:
+            return False
+        delay = retry_after_seconds((headers or {}).get('Retry-After'))
+        return delay is None or delay <= self.max_retry_after
+
+    def clear(self) -> None:
+        with self._lock:
+            self._hosts.clear()
+
+
+# Shared by every stage and job, so a host that failed for one is avoided by all
+host_health = HostHealth(
+    rate=float(os.getenv('HOST_RATE', 5)),
+    burst=float(os.getenv('HOST_BURST', 10)),
+    failure_threshold=int(os.getenv('HOST_FAILURE_THRESHOLD', 5)),
+    cooldown=float(os.getenv('HOST_COOLDOWN', 300)),
+    max_retry_after=float(os.getenv('HOST_MAX_RETRY_AFTER', 60)),
+)
+
+
+@asynccontextmanager
+async def polite_request(session: aiohttp.ClientSession, method: str, url: str,
+                         health: HostHealth = host_health, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+    """
+    ``session.request`` paced and tracked by ``health``.
+
+    Waits for the host's turn, records the outcome and retries a throttled
+    response once after its Retry-After period. Raises HostUnavailable
+    without sending anything while the host's circuit is open. Sessions
+    traced with ``metrics.http_trace`` also get the total time and bytes of
+    each response recorded.
+    """
+    for attempt in range(2):
+        await health.acquire(url)
+        timing = RequestTiming()
+        try:
+            response = await session.request(method, url, trace_request_ctx=timing, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            health.record(url, error=True)
+            raise
+        health.record(url, response.status, response.headers)
+        if attempt == 0 and health.should_retry(response.status, response.headers):
+            response.release()
+            timing.finish(response)
+            continue
+        break
+    timed_out = False
+    try:
+        yield response
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        # The body failed after the headers arrived
+        health.record(url, error=True)
+        timed_out = isinstance(e, asyncio.TimeoutError)
+        raise
+    finally:
+        response.release()
+        timing.finish(response, timed_out)
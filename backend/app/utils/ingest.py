@@ -0,0 +1,193 @@
+import csv
+import io
+import os
+import tempfile
+from typing import BinaryIO, Iterator, List, Optional
+
+from flask import Request, current_app
+
+from .domains import canonical_host, hostname
+
+# Header names that hold the website, in order of preference, compared case-insensitively
+URL_COLUMNS = ('website', 'website url', 'url', 'domain', 'site')
+
+
+def find_url_columns(header: List[str]) -> List[int]:
+    """Return the indices of known website columns in ``header``, best first."""
+    names = [name.strip().lower() for name in header]
+    return [names.index(column) for column in URL_COLUMNS if column in names]
+
+
+def looks_like_url(value: str) -> bool:
+    """True for values such as ``shop.com`` or ``https://shop.com/``, used to spot header-less files."""
+    value = value.strip()
+    return bool(value) and ' ' not in value and '.' in hostname(value)
+
+
+def url_key(url: str) -> str:
+    """Dedupe key for a website: canonical host followed by path and query, minus trailing slashes."""
+    if '://' not in url:
+        url = 'https://' + url
+    host = canonical_host(url)
+    rest = url.split('://', 1)[1]
+    slash = rest.find('/')
+    path = rest[slash:].split('#', 1)[0].rstrip('/') if slash >= 0 else ''
+    return host + path
+
+
+class CountingReader(io.RawIOBase):
+    """Raw stream wrapper counting the bytes read through it."""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        self.bytes_read += len(data)
+        return len(data)
+
+
+class UrlSource:
+    """
+    Single-pass iterator over the website URLs of a CSV upload.
+
+    The file is decoded and parsed as it is read, so memory does not grow with
+    its size apart from the set of seen URLs. The website column is chosen
+    from the header with the Website/URL/Domain/Site heuristics; rows where
+    that column is empty fall back to their first value. Files without a
+    header are detected when the first cell already looks like a URL. Repeated
+    websites (same host and path, ignoring scheme, ``www.`` and trailing
+    slashes) are skipped.
+
+    ``bytes_read`` and ``total_bytes`` report progress through the input.
+    """
+
+    def __init__(self, stream: BinaryIO, total_bytes: Optional[int] = None, dedupe: bool = True):
+        self.stream = None
+        self.counter = CountingReader(stream)
+        self.total_bytes = total_bytes
+        self.dedupe = dedupe
+        self.reader = csv.reader(io.TextIOWrapper(io.BufferedReader(self.counter), encoding='utf-8-sig',
+                                                  errors='replace', newline=''))
+        self.header: List[str] = []
+        self.columns: List[int] = []
+        self.rows = 0
+        self.duplicates = 0
+        self._first_row: Optional[List[str]] = None
+        self._read_header()
+
+    @classmethod
+    def open(cls, path: str, dedupe: bool = True) -> 'UrlSource':
+        """Open a CSV file as a source; use it as a context manager to close the file."""
+        f = open(path, 'rb')
+        try:
+            source = cls(f, total_bytes=os.fstat(f.fileno()).st_size, dedupe=dedupe)
+        except BaseException:
+            f.close()
+            raise
+        source.stream = f
+        return source
+
+    def close(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def __enter__(self) -> 'UrlSource':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _read_header(self) -> None:
+        first = next(self.reader, None)
+        if not first:
+            return
+        self.columns = find_url_columns(first)
+        if not self.columns and looks_like_url(first[0]):
+            # No header: the first line is already data
+            self._first_row = first
+            self.header = ['Website']
+        else:
+            self.header = first
+
+    @property
+    def bytes_read(self) -> int:
+        return self.counter.bytes_read
+
+    @property
+    def percent(self) -> Optional[float]:
+        if not self.total_bytes:
+            return None
+        return min(100.0, 100.0 * self.bytes_read / self.total_bytes)
+
+    def website(self, row: List[str]) -> str:
+        """Extract the website from a parsed row, trying the known columns first."""
+        for column in self.columns:
+            if column < len(row) and row[column].strip():
+                return row[column].strip()
+        # If no website found in known fields, use the first value
+        return row[0].strip() if row else ''
+
+    def __iter__(self) -> Iterator[str]:
+        seen = set()
+        rows = self.reader
+        if self._first_row is not None:
+            rows = _chain_first(self._first_row, rows)
+            self._first_row = None
+        for row in rows:
+            website = self.website(row)
+            if not website:
+                continue
+            self.rows += 1
+            if self.dedupe:
+                key = url_key(website)
+                if key in seen:
+                    self.duplicates += 1
+                    continue
+                seen.add(key)
+            yield website
+
+
+def _chain_first(first: List[str], rows) -> Iterator[List[str]]:
+    yield first
+    yield from rows
+
+
+class UploadRequest(Request):
+    """
+    Request that spools uploaded files straight into the upload folder.
+
+    Routes keep an upload with ``keep_upload``, which renames the spooled file
+    instead of copying it, so each upload is written to disk exactly once.
+    Spooled files that no route kept are removed when the request closes.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.NamedTemporaryFile('wb+', dir=current_app.config['UPLOAD_FOLDER'],
+                                           suffix='.upload', delete=False)
+
+    def close(self) -> None:
+        spooled = []
+        if 'files' in self.__dict__:
+            spooled = [getattr(f.stream, 'name', None) for _, f in self.files.items(multi=True)]
+        super().close()
+        for path in spooled:
+            if isinstance(path, str) and os.path.exists(path):
+                os.remove(path)
+
+
+def keep_upload(file, path: str) -> None:
+    """Move an uploaded file to ``path``, renaming the spooled file when possible."""
+    spooled = getattr(file.stream, 'name', None)
+    if isinstance(spooled, str) and os.path.exists(spooled):
+        # Close first: an open file cannot be renamed on Windows
+        file.stream.close()
+        os.replace(spooled, path)
+    else:
+        file.save(path)
@@ -0,0 +1,70 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class FileJanitor:
+    """
+    Deletes files that have not been modified for longer than their folder's
+    TTL, on a background thread every ``interval`` seconds once started.
+    The first sweep also waits one interval, so starting the janitor never
+    deletes anything right away.
+
+    ``folders`` maps each folder to its TTL in seconds; a TTL of 0 keeps
+    everything in that folder. Outputs still being written are safe, as
+    their writers flush, and so touch the file, every few seconds.
+    ``tasks`` are further cleanups run with every sweep, such as expiring
+    checkpoints; each returns how many items it removed.
+    """
+
+    def __init__(self, folders: Dict[str, float], interval: float = 3600,
+                 tasks: Iterable[Callable[[], int]] = ()):
+        self.folders = folders
+        self.interval = interval
+        self.tasks = list(tasks)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep(self) -> int:
+        """Delete every expired file now and return how many were removed."""
+        removed = 0
+        now = time.time()
+        for folder, ttl in self.folders.items():
+            if ttl <= 0 or not os.path.isdir(folder):
+                continue
+            for entry in os.scandir(folder):
+                try:
+                    if entry.is_file() and now - entry.stat().st_mtime > ttl:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    # Removed by another worker or its job in the meantime
+                    continue
+                except OSError as e:
+                    logger.warning(f"Failed to remove expired file {entry.path}: {str(e)}")
+        if removed:
+            logger.info(f"Removed {removed} expired files")
+        for task in self.tasks:
+            removed += task()
+        return removed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"File cleanup failed: {str(e)}")
+
+    def start(self) -> None:
+        if self._thread is None and (self.tasks or any(ttl > 0 for ttl in self.folders.values())):
+            self._thread = threading.Thread(target=self._run, name='file-janitor', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
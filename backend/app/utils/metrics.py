@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, Tuple
+
+import aiohttp
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+NAMESPACE = 'finder'
+
+# Seconds, from a cached DNS answer to a site that hits its deadline
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUESTS = Counter(
+    'http_requests', 'HTTP requests sent, by stage and outcome (status class, error, timeout or cancelled)',
+    ['stage', 'outcome'], namespace=NAMESPACE)
+HTTP_RESPONSE_BYTES = Counter(
+    'http_response_bytes', 'Response body bytes downloaded', ['stage'], namespace=NAMESPACE)
+HTTP_PHASE_SECONDS = Histogram(
+    'http_phase_seconds', 'Request latency by phase: dns, connect, ttfb (request sent to headers) and total',
+    ['stage', 'phase'], buckets=LATENCY_BUCKETS, namespace=NAMESPACE)
+TIMEOUTS = Counter(
+    'timeouts', 'Timeouts by cause: connect, read (waiting for headers), body or site_deadline',
+    ['stage', 'cause'], namespace=NAMESPACE)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups', 'Cache lookups by cache and result (hit or miss)', ['cache', 'result'], namespace=NAMESPACE)
+SITES = Counter(
+    'sites', 'Sites finished per stage, by outcome', ['stage', 'outcome'], namespace=NAMESPACE)
+SITE_SECONDS = Histogram(
+    'site_seconds', 'Time spent on one site per stage', ['stage'], buckets=LATENCY_BUCKETS, namespace=NAMESPACE)
+IN_FLIGHT = Gauge(
+    'in_flight', 'Sites being processed per stage', ['stage'], namespace=NAMESPACE, multiprocess_mode='livesum')
+QUEUE_DEPTH = Gauge(
+    'queue_depth', 'Items waiting between stages', ['queue'], namespace=NAMESPACE, multiprocess_mode='livesum')
+
+
+def status_outcome(status: int) -> str:
+    return f"{status // 100}xx"
+
+
+class RequestTiming:
+    """
+    Passed as ``trace_request_ctx`` by ``polite_request``. The trace hooks
+    fill in the stage, so the total time and the bytes downloaded, which
+    depend on how much of the body the caller read, can be recorded once the
+    response is released.
+    """
+    __slots__ = ('stage', 'start')
+
+    def __init__(self):
+        self.stage = None
+        self.start = time.monotonic()
+
+    def finish(self, response: aiohttp.ClientResponse, timed_out: bool = False) -> None:
+        if self.stage is None:
+            return
+        if timed_out:
+            TIMEOUTS.labels(self.stage, 'body').inc()
+        HTTP_RESPONSE_BYTES.labels(self.stage).inc(getattr(response.content, 'total_bytes', 0))
+        HTTP_PHASE_SECONDS.labels(self.stage, 'total').observe(time.monotonic() - self.start)
+
+
+def http_trace(stage: str) -> aiohttp.TraceConfig:
+    """
+    aiohttp TraceConfig recording requests, timeouts and DNS, connect and
+    TTFB latency under ``stage``.
+    """
+    def context(trace_request_ctx=None):
+        return SimpleNamespace(trace_request_ctx=trace_request_ctx, start=0.0, dns_start=0.0, dns=0.0,
+                               connect_start=0.0, connected=False)
+
+    trace = aiohttp.TraceConfig(trace_config_ctx_factory=context)
+    phases = {phase: HTTP_PHASE_SECONDS.labels(stage, phase) for phase in ('dns', 'connect', 'ttfb')}
+
+    async def on_request_start(session, ctx, params):
+        ctx.start = time.monotonic()
+        if isinstance(ctx.trace_request_ctx, RequestTiming):
+            ctx.trace_request_ctx.stage = stage
+
+    async def on_dns_resolvehost_start(session, ctx, params):
+        ctx.dns_start = time.monotonic()
+
+    async def on_dns_resolvehost_end(session, ctx, params):
+        ctx.dns = time.monotonic() - ctx.dns_start
+        phases['dns'].observe(ctx.dns)
+
+    async def on_connection_create_start(session, ctx, params):
+        ctx.connect_start = time.monotonic()
+
+    async def on_connection_create_end(session, ctx, params):
+        # Connection creation includes the DNS lookup; count it only once
+        ctx.connected = True
+        phases['connect'].observe(max(0.0, time.monotonic() - ctx.connect_start - ctx.dns))
+
+    async def on_connection_reuseconn(session, ctx, params):
+        ctx.connected = True
+
+    async def on_request_end(session, ctx, params):
+        phases['ttfb'].observe(time.monotonic() - ctx.start)
+        HTTP_REQUESTS.labels(stage, status_outcome(params.response.status)).inc()
+
+    async def on_request_exception(session, ctx, params):
+        if isinstance(params.exception, asyncio.CancelledError):
+            # Abandoned by the caller, e.g. at the site deadline, which is counted on its own
+            HTTP_REQUESTS.labels(stage, 'cancelled').inc()
+        elif isinstance(params.exception, asyncio.TimeoutError):
+            HTTP_REQUESTS.labels(stage, 'timeout').inc()
+            TIMEOUTS.labels(stage, 'read' if ctx.connected else 'connect').inc()
+        else:
+            HTTP_REQUESTS.labels(stage, 'error').inc()
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace.on_connection_create_start.append(on_connection_create_start)
+    trace.on_connection_create_end.append(on_connection_create_end)
+    trace.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_exception)
+    trace.freeze()
+    return trace
+
+
+class MeteredQueue(asyncio.Queue):
+    """asyncio.Queue whose size is added to the ``queue_depth`` gauge under ``name``."""
+
+    def __init__(self, name: str, maxsize: int = 0):
+        super().__init__(maxsize)
+        self._depth = QUEUE_DEPTH.labels(name)
+
+    def _put(self, item: Any) -> None:
+        super()._put(item)
+        self._depth.inc()
+
+    def _get(self) -> Any:
+        self._depth.dec()
+        return super()._get()
+
+    def close(self) -> None:
+        """Drop the items left behind once the consumers are gone, so the gauge goes back down."""
+        while not self.empty():
+            self.get_nowait()
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    Return the metrics in the Prometheus text format with their content type.
+
+    When samples come from several processes, set PROMETHEUS_MULTIPROC_DIR
+    to a shared empty directory so they are aggregated. The app itself is
+    served by a single gunicorn worker, as its jobs live in that process.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
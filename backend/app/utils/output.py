@@ -0,0 +1,241 @@
+import csv
+import gzip
+import io
+import json
+import os
+import time
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional: only needed for Parquet output
+    pyarrow = None
+
+# Output format names accepted by the API and the file extension of each
+FORMATS = {
+    'csv': '.csv',
+    'csv.gz': '.csv.gz',
+    'ndjson': '.ndjson',
+    'parquet': '.parquet',
+}
+DEFAULT_FORMAT = 'csv'
+
+# Content types used when serving each format
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'csv.gz': 'application/gzip',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def format_available(fmt: str) -> bool:
+    return fmt in FORMATS and (fmt != 'parquet' or pyarrow is not None)
+
+
+def output_format(path: str) -> str:
+    """Return the format of an output file from its extension; unknown extensions are CSV."""
+    # Longest extensions first, so .csv.gz is not taken for .gz
+    for fmt, extension in sorted(FORMATS.items(), key=lambda item: -len(item[1])):
+        if path.endswith(extension):
+            return fmt
+    return DEFAULT_FORMAT
+
+
+def output_path(folder: str, prefix: str, fmt: str = DEFAULT_FORMAT) -> str:
+    """Return a new unique output file path for a stage, e.g. ``emails_<uuid>.ndjson``."""
+    return os.path.join(folder, f"{prefix}_{uuid.uuid4().hex}{FORMATS[fmt]}")
+
+
+def gzip_chunks(path: str, chunk_size: int = 64 * 1024, level: int = 6) -> Iterator[bytes]:
+    """Yield a file gzip-compressed, reading and compressing one chunk at a time."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+    yield compressor.flush()
+
+
+def stream_rows(rows: Iterator[Dict[str, Any]], fieldnames: List[str], fmt: str = DEFAULT_FORMAT,
+                batch_size: int = 500) -> Iterator[str]:
+    """Yield rows as CSV (with a header) or NDJSON text, ``batch_size`` rows per chunk, for streamed responses."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore') if fmt == 'csv' else None
+    if writer is not None:
+        writer.writeheader()
+    for count, row in enumerate(rows, 1):
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps({name: row.get(name) for name in fieldnames}, ensure_ascii=False) + '\n')
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class RowWriter(ABC):
+    """
+    Writes result rows to an output file as they are produced.
+
+    Rows are buffered by the underlying file and flushed at least every
+    ``flush_interval`` seconds, so a file being written can be downloaded
+    and followed while its job runs. Use as a context manager.
+    """
+
+    def __init__(self, path: str, fieldnames: List[str], flush_interval: float = 2.0):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.flush_interval = flush_interval
+        self.rows = 0
+        self._last_flush = time.monotonic()
+
+    def writerow(self, row: Dict[str, Any]) -> None:
+        self._write(row)
+        self.rows += 1
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    @abstractmethod
+    def _write(self, row: Dict[str, Any]) -> None:
+        """Write one row to the underlying file."""
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'RowWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class CsvRowWriter(RowWriter):
+    """CSV with a header row, optionally gzip-compressed."""
+
+    def __init__(self, path: str, fieldnames: List[str], encoding: str = 'utf-8', compress: bool = False,
+                 flush_interval: float = 2.0):
+        super().__init__(path, fieldnames, flush_interval)
+        if compress:
+            # Every flush ends a deflate block, so the file so far can always be decompressed
+            self._file = gzip.open(path, 'wt', newline='', encoding=encoding, compresslevel=6)
+        else:
+            self._file = open(path, 'w', newline='', encoding=encoding)
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        self._writer.writeheader()
+
+    def _write(self, row: Dict[str, Any]) -> None:
+        self._writer.writerow(row)
+
+    def flush(self) -> None:
+        self._file.flush()
+        super().flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class NdjsonRowWriter(RowWriter):
+    """One JSON object per line."""
+
+    def __init__(self, path: str, fieldnames: List[str], flush_interval: float = 2.0):
+        super().__init__(path, fieldnames, flush_interval)
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def _write(self, row: Dict[str, Any]) -> None:
+        self._file.write(json.dumps({name: row.get(name) for name in self.fieldnames}, ensure_ascii=False) + '\n')
+
+    def flush(self) -> None:
+        self._file.flush()
+        super().flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetRowWriter(RowWriter):
+    """
+    Parquet written one row group of ``row_group_size`` rows at a time.
+
+    Column types come from the first row that has a value for them: ints,
+    floats and booleans keep their type, anything else is stored as text.
+    Unlike the text formats the file is only readable once closed.
+    """
+
+    def __init__(self, path: str, fieldnames: List[str], row_group_size: int = 10000,
+                 flush_interval: float = 2.0):
+        if pyarrow is None:
+            raise RuntimeError("Parquet output requires the pyarrow package")
+        super().__init__(path, fieldnames, flush_interval)
+        self.row_group_size = row_group_size
+        self._columns: Dict[str, list] = {name: [] for name in fieldnames}
+        self._buffered = 0
+        self._writer = None
+
+    def _write(self, row: Dict[str, Any]) -> None:
+        for name in self.fieldnames:
+            self._columns[name].append(row.get(name))
+        self._buffered += 1
+        if self._buffered >= self.row_group_size:
+            self._write_row_group()
+
+    def flush(self) -> None:
+        # Row groups are written by size; tiny groups would bloat the file
+        super().flush()
+
+    def _arrow_type(self, values: list):
+        for value in values:
+            if isinstance(value, bool):
+                return pyarrow.bool_()
+            if isinstance(value, int):
+                return pyarrow.int64()
+            if isinstance(value, float):
+                return pyarrow.float64()
+            if value is not None:
+                break
+        return pyarrow.string()
+
+    def _write_row_group(self) -> None:
+        if self._writer is None:
+            schema = pyarrow.schema([(name, self._arrow_type(self._columns[name])) for name in self.fieldnames])
+            self._writer = pyarrow.parquet.ParquetWriter(self.path, schema, compression='zstd')
+        schema = self._writer.schema
+        arrays = []
+        for name in self.fieldnames:
+            field_type = schema.field(name).type
+            values = self._columns[name]
+            if field_type == pyarrow.string():
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(pyarrow.array(values, type=field_type))
+        self._writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+        self._columns = {name: [] for name in self.fieldnames}
+        self._buffered = 0
+
+    def close(self) -> None:
+        if self._buffered or self._writer is None:
+            self._write_row_group()
+        self._writer.close()
+
+
+def open_row_writer(path: str, fieldnames: List[str], encoding: str = 'utf-8',
+                    fmt: Optional[str] = None) -> RowWriter:
+    """Open a writer for ``path`` in ``fmt``, by default the format its extension names."""
+    fmt = fmt or output_format(path)
+    if fmt == 'ndjson':
+        return NdjsonRowWriter(path, fieldnames)
+    if fmt == 'parquet':
+        return ParquetRowWriter(path, fieldnames)
+    return CsvRowWriter(path, fieldnames, encoding=encoding, compress=fmt == 'csv.gz')
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INLINE = 'inline'
+THREAD = 'thread'
+PROCESS = 'process'
+PARSE_MODES = (INLINE, THREAD, PROCESS)
+
+
+class ParseExecutor:
+    """
+    Where CPU-bound page parsing (decoding, lowercasing, regex extraction) runs.
+
+    - ``inline``: on the event loop. Bodies are scanned as they stream in,
+      so a match can stop the download early. Best at low concurrency.
+    - ``thread``: on a thread pool. This frees the event loop, but parsing
+      still shares the GIL.
+    - ``process``: on a pool of ``workers`` processes, one per core by
+      default, so parsing scales with cores while network I/O stays on the
+      event loop.
+
+    In the pooled modes each body is read in full (still bounded by the
+    caller's byte limit) and sent to the worker as raw bytes. Bytes pickle
+    as a plain copy, and decoding happens in the worker. Functions passed to
+    ``run`` must be module-level so they can be pickled.
+
+    The pool is created on first use and shared by every job in the process.
+    Worker processes are spawned, which re-imports the main module, so
+    scripts using ``process`` need the usual ``if __name__ == '__main__'``
+    guard.
+    """
+
+    def __init__(self, mode: str = INLINE, workers: Optional[int] = None):
+        if mode not in PARSE_MODES:
+            raise ValueError(f"Unknown parse mode {mode!r}, expected one of {', '.join(PARSE_MODES)}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def inline(self) -> bool:
+        return self.mode == INLINE
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == PROCESS:
+                    # spawn rather than fork: the parent runs job and event-loop threads
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='parse')
+                logger.info(f"Started {self.mode} parse pool with {self.workers} workers")
+            return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run ``fn(*args)`` according to the mode and return its result."""
+        if self.inline:
+            return fn(*args)
+        executor = self._get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool for later calls
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# PARSE_MODE selects inline, thread or process parsing; PARSE_WORKERS defaults to the core count
+parse_executor = ParseExecutor(
+    mode=os.getenv('PARSE_MODE', INLINE),
+    workers=int(os.getenv('PARSE_WORKERS', 0)) or None,
+)
@@ -0,0 +1,175 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .domains import canonical_host
+from .metrics import CACHE_LOOKUPS
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '../../cache/results.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    domain TEXT PRIMARY KEY,
+    method TEXT NOT NULL,
+    status INTEGER,
+    final_url TEXT,
+    elapsed REAL,
+    shopify INTEGER,
+    platform TEXT,
+    platform_confidence REAL,
+    error TEXT,
+    expires_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS probes_updated_at ON probes (updated_at);
+CREATE TABLE IF NOT EXISTS emails (
+    domain TEXT PRIMARY KEY,
+    emails TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS emails_updated_at ON emails (updated_at);
+"""
+
+
+def ensure_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]) -> None:
+    """Add ``columns`` (name to SQL type) missing from a table created by an older version."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, column_type in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+
+def cache_key(url: str) -> str:
+    """Normalize a URL to the domain used as cache key: its canonical host, without ``www.`` or ``m.``."""
+    return canonical_host(url)
+
+
+class ResultCache:
+    """
+    On-disk TTL cache of site probe outcomes and extracted emails.
+
+    Entries are keyed by normalized domain so overlapping uploads reuse each
+    other's work. Failed probes are kept for a shorter ``negative_ttl`` so a
+    transient outage does not hide a site for hours. Each table is trimmed to
+    ``max_entries`` rows, oldest first, when the cache is flushed.
+
+    The connection is opened lazily in the thread that first uses the cache,
+    and access is serialized with a lock, so an instance can be created in a
+    request thread and used from a worker.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, probe_ttl: float = 6 * 3600,
+                 email_ttl: float = 7 * 24 * 3600, negative_ttl: float = 15 * 60,
+                 max_entries: int = 200000, commit_every: int = 100):
+        self.path = path
+        self.probe_ttl = probe_ttl
+        self.email_ttl = email_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            ensure_columns(self._conn, 'probes', {'platform': 'TEXT', 'platform_confidence': 'REAL'})
+        return self._conn
+
+    def _write(self, sql: str, params: tuple) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(sql, params)
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                conn.commit()
+                self._uncommitted = 0
+
+    def _read(self, table: str, sql: str, params: tuple):
+        with self._lock:
+            row = self._connection().execute(sql, params).fetchone()
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        CACHE_LOOKUPS.labels(table, 'miss' if row is None else 'hit').inc()
+        return row
+
+    def get_probe(self, url: str) -> Optional[dict]:
+        """Return the cached probe outcome for the URL's domain, or None if missing or expired."""
+        row = self._read(
+            'probes', "SELECT method, status, final_url, elapsed, shopify, platform, platform_confidence, error "
+            "FROM probes WHERE domain = ? AND expires_at > ?", (cache_key(url), time.time()))
+        if row is None:
+            return None
+        method, status, final_url, elapsed, shopify, platform, platform_confidence, error = row
+        return {
+            "method": method,
+            "status": status,
+            "final_url": final_url,
+            "elapsed": elapsed,
+            "shopify": None if shopify is None else bool(shopify),
+            "platform": platform,
+            "platform_confidence": platform_confidence,
+            "error": error,
+        }
+
+    def put_probe(self, url: str, method: str, status: Optional[int], final_url: Optional[str],
+                  elapsed: Optional[float], shopify: Optional[bool], error: Optional[str],
+                  platform: Optional[str] = None, platform_confidence: Optional[float] = None) -> None:
+        """Store a probe outcome; failures expire after ``negative_ttl``."""
+        now = time.time()
+        ttl = self.negative_ttl if error or status is None or status >= 400 else self.probe_ttl
+        self._write(
+            "INSERT OR REPLACE INTO probes (domain, method, status, final_url, elapsed, shopify, platform, "
+            "platform_confidence, error, expires_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (cache_key(url), method, status, final_url, elapsed,
+             None if shopify is None else int(shopify), platform, platform_confidence, error, now + ttl, now))
+
+    def get_emails(self, url: str) -> Optional[List[str]]:
+        """Return cached emails for the URL's domain, or None if missing or expired."""
+        row = self._read('emails', "SELECT emails FROM emails WHERE domain = ? AND expires_at > ?",
+                         (cache_key(url), time.time()))
+        return None if row is None else json.loads(row[0])
+
+    def put_emails(self, url: str, emails: List[str]) -> None:
+        """Store the emails extracted from a successfully crawled domain."""
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO emails (domain, emails, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+            (cache_key(url), json.dumps(emails), now + self.email_ttl, now))
+
+    def flush(self) -> None:
+        """Commit pending writes, drop expired entries and trim each table to ``max_entries``."""
+        with self._lock:
+            if self._conn is None:
+                return
+            now = time.time()
+            for table in ('probes', 'emails'):
+                self._conn.execute(f"DELETE FROM {table} WHERE expires_at <= ?", (now,))
+                (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+                if count > self.max_entries:
+                    self._conn.execute(
+                        f"DELETE FROM {table} WHERE rowid IN "
+                        f"(SELECT rowid FROM {table} ORDER BY updated_at ASC LIMIT ?)",
+                        (count - self.max_entries,))
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
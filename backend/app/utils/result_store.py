@@ -0,0 +1,402 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote
+
+from .domains import canonical_host
+from .result_cache import ensure_columns
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(__file__), '../../data/results.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT,
+    started_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS domains (
+    domain TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_job_id TEXT,
+    status INTEGER,
+    active INTEGER,
+    shopify INTEGER,
+    platform TEXT,
+    platform_confidence REAL,
+    load_time REAL,
+    checked_at REAL,
+    email_count INTEGER NOT NULL DEFAULT 0,
+    emails_checked_at REAL
+);
+CREATE INDEX IF NOT EXISTS domains_last_seen ON domains (last_seen);
+CREATE INDEX IF NOT EXISTS domains_shopify ON domains (shopify, checked_at);
+CREATE INDEX IF NOT EXISTS domains_email_count ON domains (email_count, emails_checked_at);
+CREATE TABLE IF NOT EXISTS emails (
+    domain TEXT NOT NULL,
+    email TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_job_id TEXT,
+    PRIMARY KEY (domain, email)
+);
+CREATE INDEX IF NOT EXISTS emails_email ON emails (email);
+CREATE INDEX IF NOT EXISTS emails_last_seen ON emails (last_seen);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    url TEXT NOT NULL,
+    passed INTEGER,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (job_id, stage, domain)
+);
+CREATE INDEX IF NOT EXISTS job_results_domain ON job_results (domain);
+CREATE TABLE IF NOT EXISTS validators (
+    domain TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    job_id TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    url TEXT NOT NULL,
+    change TEXT NOT NULL,
+    previous_status INTEGER,
+    status INTEGER,
+    previous_shopify INTEGER,
+    shopify INTEGER,
+    previous_platform TEXT,
+    platform TEXT,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (job_id, domain)
+);
+"""
+
+DOMAIN_FIELDS = ['domain', 'url', 'first_seen', 'last_seen', 'last_job_id', 'status', 'active', 'shopify',
+                 'platform', 'platform_confidence', 'load_time', 'checked_at', 'email_count', 'emails_checked_at']
+EMAIL_FIELDS = ['email', 'domain', 'first_seen', 'last_seen', 'last_job_id']
+JOB_FIELDS = ['id', 'kind', 'params', 'started_at']
+CHANGE_FIELDS = ['domain', 'url', 'change', 'previous_status', 'status', 'previous_shopify', 'shopify',
+                 'previous_platform', 'platform', 'recorded_at']
+SITE_STATE_FIELDS = ['status', 'active', 'shopify', 'platform', 'platform_confidence', 'load_time', 'checked_at',
+                     'etag', 'last_modified', 'content_hash']
+
+_BOOLEAN_FIELDS = ('active', 'shopify', 'previous_shopify')
+
+
+class ResultStore:
+    """
+    Permanent, queryable record of every site and email the jobs produced.
+
+    Unlike the per-job output files, results are normalized per domain and
+    per email: a domain row holds its latest filter outcome (status,
+    platform, load time) and email count, and each email is stored once per
+    domain with when it was first and last seen and by which job.
+    ``job_results`` records which domains each job's stages handled, so any
+    job's results can be exported again.
+
+    Uses the same connection handling as ResultCache: opened lazily, shared
+    behind a lock, writes committed every ``commit_every`` rows.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, commit_every: int = 100):
+        self.path = path
+        self.commit_every = commit_every
+        self._conn = None
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            # Columns added after the first release of the store
+            ensure_columns(self._conn, 'domains', {'platform': 'TEXT', 'platform_confidence': 'REAL'})
+            ensure_columns(self._conn, 'changes', {'previous_platform': 'TEXT', 'platform': 'TEXT'})
+            self._conn.execute("CREATE INDEX IF NOT EXISTS domains_platform ON domains (platform, checked_at)")
+        return self._conn
+
+    def _write(self, statements: Iterable[tuple]) -> None:
+        """Run ``(sql, params)`` statements together and commit once enough rows are pending."""
+        with self._lock:
+            conn = self._connection()
+            for sql, params in statements:
+                conn.execute(sql, params)
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                conn.commit()
+                self._uncommitted = 0
+
+    def job(self, job_id: str, kind: str, params: Optional[Dict[str, Any]] = None) -> 'JobRecorder':
+        """Register a job, or continue a resumed one, and return a recorder for its results."""
+        self._write([(
+            "INSERT OR IGNORE INTO jobs (id, kind, params, started_at) VALUES (?, ?, ?, ?)",
+            (job_id, kind, json.dumps(params or {}), time.time()))])
+        return JobRecorder(self, job_id)
+
+    def _seen(self, job_id: str, stage: str, domain: str, url: str, passed: Optional[bool],
+              now: float) -> List[tuple]:
+        return [
+            ("INSERT INTO domains (domain, url, first_seen, last_seen, last_job_id) VALUES (?, ?, ?, ?, ?) "
+             "ON CONFLICT (domain) DO UPDATE SET last_seen = excluded.last_seen, "
+             "last_job_id = excluded.last_job_id",
+             (domain, url, now, now, job_id)),
+            ("INSERT OR REPLACE INTO job_results (job_id, stage, domain, url, passed, recorded_at) "
+             "VALUES (?, ?, ?, ?, ?, ?)",
+             (job_id, stage, domain, url, None if passed is None else int(passed), now)),
+        ]
+
+    def record_found(self, job_id: str, url: str) -> None:
+        domain = canonical_host(url)
+        if domain:
+            self._write(self._seen(job_id, 'search', domain, url, None, time.time()))
+
+    def record_check(self, job_id: str, url: str, passed: bool, active: Optional[bool] = None,
+                     status: Optional[int] = None, shopify: Optional[bool] = None,
+                     load_time: Optional[float] = None, etag: Optional[str] = None,
+                     last_modified: Optional[str] = None, content_hash: Optional[str] = None,
+                     platform: Optional[str] = None, platform_confidence: Optional[float] = None) -> None:
+        domain = canonical_host(url)
+        if not domain:
+            return
+        now = time.time()
+        statements = self._seen(job_id, 'filter', domain, url, passed, now)
+        # Sites passed without a request (no checks selected) keep their last probe
+        if active is not None:
+            # A probe that did not fingerprint the page (shopify None) keeps the earlier platform
+            statements.append((
+                "UPDATE domains SET status = ?, active = ?, shopify = COALESCE(?, shopify), "
+                "platform = CASE WHEN ? IS NULL THEN platform ELSE ? END, "
+                "platform_confidence = CASE WHEN ? IS NULL THEN platform_confidence ELSE ? END, "
+                "load_time = ?, checked_at = ? WHERE domain = ?",
+                (status, int(active), None if shopify is None else int(shopify), shopify, platform, shopify,
+                 platform_confidence, load_time, now, domain)))
+        # Validators only describe a page this probe downloaded (the hash is
+        # set on those alone); failures, HEAD and cached results keep the last ones
+        if status == 200 and content_hash is not None:
+            statements.append((
+                "INSERT OR REPLACE INTO validators (domain, etag, last_modified, content_hash, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (domain, etag, last_modified, content_hash, now)))
+        self._write(statements)
+
+    def record_change(self, job_id: str, url: str, change: str, previous: Optional[Dict[str, Any]],
+                      status: Optional[int], shopify: Optional[bool], platform: Optional[str] = None) -> None:
+        domain = canonical_host(url)
+        if not domain:
+            return
+        previous = previous or {}
+        previous_shopify = previous.get('shopify')
+        self._write([(
+            "INSERT OR REPLACE INTO changes (job_id, domain, url, change, previous_status, status, previous_shopify, "
+            "shopify, previous_platform, platform, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, domain, url, change, previous.get('status'),
+             status, None if previous_shopify is None else int(previous_shopify),
+             None if shopify is None else int(shopify), previous.get('platform'), platform, time.time()))])
+
+    def site_state(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the last probe outcome and validators recorded for a URL's domain, or None."""
+        domain = canonical_host(url)
+        if not domain:
+            return None
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT d.status, d.active, d.shopify, d.platform, d.platform_confidence, d.load_time, d.checked_at, "
+                "v.etag, v.last_modified, v.content_hash "
+                "FROM domains d LEFT JOIN validators v ON v.domain = d.domain WHERE d.domain = ?",
+                (domain,)).fetchone()
+        if row is None:
+            return None
+        state = dict(zip(SITE_STATE_FIELDS, row))
+        for name in _BOOLEAN_FIELDS:
+            if state.get(name) is not None:
+                state[name] = bool(state[name])
+        return state
+
+    def record_emails(self, job_id: str, url: str, emails: List[str]) -> None:
+        domain = canonical_host(url)
+        if not domain:
+            return
+        now = time.time()
+        statements = self._seen(job_id, 'emails', domain, url, bool(emails), now)
+        for email in emails:
+            statements.append((
+                "INSERT INTO emails (domain, email, first_seen, last_seen, last_job_id) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (domain, email) DO UPDATE SET last_seen = excluded.last_seen, "
+                "last_job_id = excluded.last_job_id",
+                (domain, email.lower(), now, now, job_id)))
+        statements.append((
+            "UPDATE domains SET email_count = (SELECT COUNT(*) FROM emails WHERE domain = ?), "
+            "emails_checked_at = ? WHERE domain = ?",
+            (domain, now, domain)))
+        self._write(statements)
+
+    def _query(self, sql: str, params: list, fields: List[str], batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        # Committed first so a job's own results are visible; rows are fetched
+        # in batches so an export never holds the whole result in memory. Each
+        # query reads through its own read-only connection, so a slow export
+        # never shares a connection (or its lock) with the jobs writing.
+        with self._lock:
+            self._connection().commit()
+            self._uncommitted = 0
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(self.path))}?mode=ro", uri=True, timeout=30,
+                               check_same_thread=False)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                for row in rows:
+                    item = dict(zip(fields, row))
+                    for name in _BOOLEAN_FIELDS:
+                        if item.get(name) is not None:
+                            item[name] = bool(item[name])
+                    yield item
+        finally:
+            conn.close()
+
+    def domains(self, job_id: Optional[str] = None, stage: Optional[str] = None, shopify: Optional[bool] = None,
+                platform: Optional[str] = None, active: Optional[bool] = None, has_emails: Optional[bool] = None,
+                since: Optional[float] = None, search: Optional[str] = None, limit: Optional[int] = None,
+                offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate domain records, most recently seen first.
+
+        Args:
+            job_id: Only domains handled by this job
+            stage: With ``job_id``, only domains handled by this stage of it
+                ("search", "filter" or "emails")
+            shopify: Only Shopify stores (True) or only other sites (False)
+            platform: Only stores detected as this platform ("shopify", "woocommerce", ...)
+            active: Only domains whose last check answered below 400 (True) or not (False)
+            has_emails: Only domains with (True) or without (False) known emails
+            since: Only domains seen at or after this Unix time
+            search: Only domains containing this text
+        """
+        clauses, params = [], []
+        if job_id is not None:
+            sub = "SELECT domain FROM job_results WHERE job_id = ?"
+            params.append(job_id)
+            if stage is not None:
+                sub += " AND stage = ?"
+                params.append(stage)
+            clauses.append(f"domain IN ({sub})")
+        for column, value in (('shopify', shopify), ('active', active)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(int(value))
+        if platform is not None:
+            clauses.append("platform = ?")
+            params.append(platform)
+        if has_emails is not None:
+            clauses.append("email_count > 0" if has_emails else "email_count = 0")
+        if since is not None:
+            clauses.append("last_seen >= ?")
+            params.append(since)
+        if search:
+            clauses.append("instr(domain, ?) > 0")
+            params.append(search.lower())
+        sql = f"SELECT {', '.join(DOMAIN_FIELDS)} FROM domains"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY last_seen DESC LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        return self._query(sql, params, DOMAIN_FIELDS)
+
+    def emails(self, domain: Optional[str] = None, job_id: Optional[str] = None, since: Optional[float] = None,
+               limit: Optional[int] = None, offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """Iterate email records, most recently seen first, optionally for one domain, job or period."""
+        clauses, params = [], []
+        if domain:
+            clauses.append("domain = ?")
+            params.append(canonical_host(domain))
+        if job_id is not None:
+            clauses.append("domain IN (SELECT domain FROM job_results WHERE job_id = ? AND stage = 'emails')")
+            params.append(job_id)
+        if since is not None:
+            clauses.append("last_seen >= ?")
+            params.append(since)
+        sql = f"SELECT {', '.join(EMAIL_FIELDS)} FROM emails"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY last_seen DESC LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        return self._query(sql, params, EMAIL_FIELDS)
+
+    def changes(self, job_id: str, change: Optional[str] = None, limit: Optional[int] = None,
+                offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """Iterate the status and platform changes a re-verification job found, by domain."""
+        sql = f"SELECT {', '.join(CHANGE_FIELDS)} FROM changes WHERE job_id = ?"
+        params = [job_id]
+        if change is not None:
+            sql += " AND change = ?"
+            params.append(change)
+        sql += " ORDER BY domain LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        return self._query(sql, params, CHANGE_FIELDS)
+
+    def jobs(self, limit: Optional[int] = None, offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """Iterate recorded jobs, newest first."""
+        return self._query(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs ORDER BY started_at DESC LIMIT ? OFFSET ?",
+                           [-1 if limit is None else limit, offset], JOB_FIELDS)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._uncommitted = 0
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobRecorder:
+    """Records the results of one job's stages into a ResultStore."""
+
+    def __init__(self, store: ResultStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+
+    def found(self, url: str) -> None:
+        """A search result."""
+        self.store.record_found(self.job_id, url)
+
+    def checked(self, url: str, passed: bool, active: Optional[bool] = None, status: Optional[int] = None,
+                shopify: Optional[bool] = None, load_time: Optional[float] = None, etag: Optional[str] = None,
+                last_modified: Optional[str] = None, content_hash: Optional[str] = None,
+                platform: Optional[str] = None, platform_confidence: Optional[float] = None) -> None:
+        """A filter outcome; ``active`` is None when the site was passed without a request."""
+        self.store.record_check(self.job_id, url, passed, active, status, shopify, load_time, etag,
+                                last_modified, content_hash, platform, platform_confidence)
+
+    def changed(self, url: str, change: str, previous: Optional[Dict[str, Any]], status: Optional[int],
+                shopify: Optional[bool], platform: Optional[str] = None) -> None:
+        """A re-verified site whose status or platform differs from its last check."""
+        self.store.record_change(self.job_id, url, change, previous, status, shopify, platform)
+
+    def previous(self, url: str) -> Optional[Dict[str, Any]]:
+        """What the store knew about a site before this job checked it."""
+        return self.store.site_state(url)
+
+    def changes(self) -> Iterator[Dict[str, Any]]:
+        return self.store.changes(self.job_id)
+
+    def emails(self, url: str, emails: List[str]) -> None:
+        """The emails extracted from a site."""
+        self.store.record_emails(self.job_id, url, emails)
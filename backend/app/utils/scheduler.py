@@ -0,0 +1,121 @@
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from .domains import registered_domain
+from .metrics import QUEUE_DEPTH
+
+class HostScheduler:
+    """
+    Run a coroutine over a lazy stream of URLs with host-aware limits.
+
+    Items are pulled from the input iterator only as the backlog drains, so a
+    50k-row upload never becomes 50k tasks. Dispatch is bounded by a global
+    concurrency limit and a per-host limit, and a politeness delay spaces out
+    request starts to the same registered domain. Waiting items are queued per
+    domain and served round-robin so one large domain cannot starve the rest.
+    The backlog size is reported on the ``queue_depth`` gauge under ``name``.
+    """
+
+    def __init__(self, concurrency: int = 100, per_host: int = 2, host_delay: float = 0.0,
+                 backlog: Optional[int] = None, key: Callable[[Any], str] = registered_domain,
+                 name: str = 'scheduler_backlog'):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.host_delay = host_delay
+        self.backlog = backlog or self.concurrency * 10
+        self.key = key
+        self.name = name
+
+    async def run(self, items: Iterable, worker: Callable[[Any], Awaitable]) -> AsyncIterator[Tuple[Any, Any, Optional[BaseException]]]:
+        """
+        Yield ``(item, result, error)`` for every item in completion order.
+
+        ``error`` is the exception raised by ``worker`` for that item, if any;
+        one failing item never stops the run.
+        """
+        loop = asyncio.get_running_loop()
+        source = iter(items)
+        exhausted = False
+        buffered = 0
+        pending: Dict[str, deque] = {}
+        ready = deque()
+        active: Dict[str, int] = {}
+        next_start: Dict[str, float] = {}
+        tasks: Dict[asyncio.Task, Tuple[Any, str]] = {}
+        depth = QUEUE_DEPTH.labels(self.name)
+
+        try:
+            while True:
+                # Refill the per-domain queues from the lazy source
+                while not exhausted and buffered < self.backlog:
+                    try:
+                        item = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    key = self.key(item)
+                    if key not in pending:
+                        pending[key] = deque()
+                        ready.append(key)
+                    pending[key].append(item)
+                    buffered += 1
+                    depth.inc()
+
+                # Dispatch round-robin over domains with free capacity, one
+                # item per domain per pass, until nothing more can start
+                now = loop.time()
+                wake_at = None
+                dispatched = True
+                while dispatched and ready and len(tasks) < self.concurrency:
+                    dispatched = False
+                    for _ in range(len(ready)):
+                        if len(tasks) >= self.concurrency:
+                            break
+                        key = ready.popleft()
+                        if active.get(key, 0) >= self.per_host:
+                            ready.append(key)
+                            continue
+                        start_at = next_start.get(key, 0)
+                        if start_at > now:
+                            wake_at = start_at if wake_at is None else min(wake_at, start_at)
+                            ready.append(key)
+                            continue
+
+                        item = pending[key].popleft()
+                        buffered -= 1
+                        depth.dec()
+                        active[key] = active.get(key, 0) + 1
+                        if self.host_delay:
+                            next_start[key] = now + self.host_delay
+                            if len(next_start) > self.backlog * 2:
+                                # Forget domains whose politeness window has passed
+                                next_start = {k: t for k, t in next_start.items() if t > now}
+                        tasks[asyncio.ensure_future(worker(item))] = (item, key)
+                        dispatched = True
+                        if pending[key]:
+                            ready.append(key)
+                        else:
+                            del pending[key]
+
+                if not tasks:
+                    if exhausted and not pending:
+                        break
+                    await asyncio.sleep(max(0, (wake_at or now) - now))
+                    continue
+
+                timeout = None if wake_at is None else max(0, wake_at - now)
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    item, key = tasks.pop(task)
+                    active[key] -= 1
+                    if not active[key]:
+                        del active[key]
+                    error = task.exception()
+                    yield item, (None if error else task.result()), error
+        finally:
+            depth.dec(buffered)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
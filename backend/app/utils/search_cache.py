@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from .metrics import CACHE_LOOKUPS
+
+
+class SearchCache:
+    """
+    In-memory TTL + LRU cache of search result pages.
+
+    ``get_or_fetch`` also coalesces concurrent misses: when several threads ask
+    for the same key at once, only the first one calls upstream and the others
+    wait for its answer. Failed fetches are never cached; every waiter sees the
+    same exception.
+    """
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Return the cached value for ``key``, calling ``fetch`` on a miss.
+
+        Returns:
+            ``(value, fetched)`` where ``fetched`` is True only for the call
+            that actually went upstream
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_LOOKUPS.labels('search', 'hit').inc()
+                    return value, False
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                self.misses += 1
+                CACHE_LOOKUPS.labels('search', 'miss').inc()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result(), False
+
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        future.set_result(value)
+        return value, True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
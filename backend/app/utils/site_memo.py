@@ -0,0 +1,36 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from .domains import site_key, site_url
+
+
+class SiteMemo:
+    """
+    Run a network check once per site and share its result with every URL
+    of that site.
+
+    URLs are grouped by ``site_key`` (canonical host and port), and the check
+    is given the site's root URL from ``site_url``, so ten article links from
+    one news site cost a single request. The first URL of a site starts the
+    check; later ones wait for the same result instead of repeating it.
+    Results are kept for the lifetime of the memo, i.e. one run.
+    """
+
+    def __init__(self, check: Callable[[str], Awaitable[Any]]):
+        self.check = check
+        self.results: Dict[str, asyncio.Future] = {}
+        self.checks = 0
+        self.shared = 0
+
+    async def run(self, url: str) -> Any:
+        """Return the check result for the site ``url`` belongs to."""
+        key = site_key(url)
+        future = self.results.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self.check(site_url(url)))
+            self.results[key] = future
+            self.checks += 1
+        else:
+            self.shared += 1
+        # Shielded so a cancelled waiter does not cancel the check for the others
+        return await asyncio.shield(future)
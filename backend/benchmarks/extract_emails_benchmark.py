@@ -0,0 +1,107 @@
+"""
+Micro-benchmark for email extraction on large HTML pages.
+
+Compares the original per-call-compiled extractor with the single-pass
+EmailExtractor and reports throughput in MB/s.
+
+Usage (from the backend directory):
+    python -m benchmarks.extract_emails_benchmark --size-mb 4 --repeat 5 --profile storefront
+"""
+import argparse
+import random
+import re
+import time
+
+from app.emails.email_extractor import extract_emails
+
+
+def legacy_extract_emails_from_text(text):
+    """The extractor as it was before EmailExtractor, kept for comparison."""
+    email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+    emails = re.findall(email_pattern, text)
+    filtered_emails = []
+    for email in emails:
+        if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
+            continue
+        if any(placeholder in email.lower() for placeholder in ['example', 'yourname', 'youremail', 'username', 'domain']):
+            continue
+        filtered_emails.append(email)
+    return filtered_emails
+
+
+# Weighted block templates per page profile. "storefront" mimics a real
+# multi-megabyte store page: mostly inline JSON/JS, CSS and product markup
+# with a few contact addresses. "dense" is an email-heavy worst case.
+PROFILES = {
+    'storefront': [
+        (30, '<script>window.ShopifyAnalytics.meta.product = {{"id":{n},"variants":[{{"id":{n}{d},'
+             '"price":{n}00,"name":"Frame {n} - Black","sku":"FR-{n}","barcode":"89{n}{d}"}}],'
+             '"images":["//cdn.shopify.com/s/files/1/{d}/products/frame-{n}@2x.jpg"]}};</script>\n'),
+        (15, '<style>.product-{n}{{margin:0 auto;padding:{d}px;background:url(/img/bg@{d}x.jpg)}}'
+             '.grid-{n} .item:hover{{transform:scale(1.0{d})}}</style>\n'),
+        (40, '<div class="product-card"><img srcset="/cdn/shop/products/item-{n}@2x.png 2x" alt="Item {n}">'
+             '<a href="/products/item-{n}">Premium product {n}</a><span class="price">$ {n}.99</span></div>\n'),
+        (14, '<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor {n}.</p>\n'),
+        (1, '<footer>Contact us at sales@store{d}.com or <a href="mailto:support&#64;store{d}.com">email us</a>'
+            ', returns [at] store{d} [dot] com</footer>\n'),
+    ],
+    'dense': [
+        (1, '<div class="product-card"><img src="/cdn/shop/products/item-{n}@2x.png" alt="Item {n}">'
+            '<a href="/products/item-{n}">Premium product {n}</a><span class="price">$ {n}.99</span></div>\n'),
+        (1, '<script>window.analytics.push({{"event":"view","id":{n},"ts":"2024-01-{d:02d}"}});</script>\n'),
+        (1, '<style>.item-{n}{{margin:0 auto;padding:{d}px;background:url(/img/bg@{d}x.jpg)}}</style>\n'),
+        (1, '<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor {n}.</p>\n'),
+        (1, '<footer>Contact us at sales{n}@store{d}.com or support [at] store{d} [dot] com</footer>\n'),
+        (1, '<a href="mailto:orders{n}&#64;store{d}.com">Email us</a>\n'),
+    ],
+}
+
+
+def build_page(size_mb: float, profile: str = 'storefront', seed: int = 42) -> str:
+    """Build a page of roughly ``size_mb`` megabytes from the given profile."""
+    rng = random.Random(seed)
+    weights, blocks = zip(*PROFILES[profile])
+    target = int(size_mb * 1024 * 1024)
+    parts = ['<html><head><title>Store</title></head><body>\n']
+    size = len(parts[0])
+    while size < target:
+        block = rng.choices(blocks, weights)[0].format(n=rng.randint(1, 5000), d=rng.randint(1, 28))
+        parts.append(block)
+        size += len(block)
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def measure(func, text: str, repeat: int):
+    """Return (best seconds per call, result of last call)."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=4, help='Size of the synthetic page in MB')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per extractor (best is reported)')
+    parser.add_argument('--profile', choices=sorted(PROFILES) + ['all'], default='all',
+                        help='Synthetic page profile to benchmark')
+    args = parser.parse_args()
+
+    profiles = sorted(PROFILES) if args.profile == 'all' else [args.profile]
+    for profile in profiles:
+        text = build_page(args.size_mb, profile)
+        megabytes = len(text.encode('utf-8')) / (1024 * 1024)
+        print(f"[{profile}] page size: {megabytes:.2f} MB")
+
+        for name, func in [('legacy', legacy_extract_emails_from_text), ('single-pass', extract_emails)]:
+            seconds, emails = measure(func, text, args.repeat)
+            print(f"{name:>12}: {megabytes / seconds:8.2f} MB/s  "
+                  f"({seconds * 1000:.1f} ms, {len(emails)} emails, {len(set(emails))} unique)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+"""
+Local mock web farm for offline benchmarks.
+
+A single aiohttp server answers for thousands of virtual hosts
+(``site<N>.test``, each its own registered domain, under the reserved
+``.test`` TLD), telling them apart by their Host header, and also
+serves a fake SerpAPI ``/search`` endpoint that ranks those hosts. Every
+site gets a deterministic profile from the seed:
+
+- normal: homepage with embedded emails and a contact link, plus a
+  contact page with obfuscated addresses
+- slow: like normal, with extra latency on every response
+- huge: homepage padded to ``huge_kb`` of markup
+- hang: never answers within any client timeout
+- error: every page returns 500
+- dead: the host does not resolve; the server never sees it
+
+A share of the sites also carries Shopify markers. ``/__stats`` reports
+request counts and, per host, the time from its first request to its last
+response. ``/__reset`` clears the stats between stages.
+
+Run standalone for manual testing (from the backend directory):
+    python -m benchmarks.mock_farm --sites 1000 --port 8900
+"""
+import argparse
+import asyncio
+import multiprocessing
+import random
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import requests
+from aiohttp import web
+
+FARM_TLD = 'test'
+KINDS = ('dead', 'hang', 'error', 'huge', 'slow', 'normal')
+
+
+@dataclass
+class FarmConfig:
+    sites: int = 2000
+    latency_ms: float = 20
+    jitter_ms: float = 10
+    slow: float = 0.05
+    slow_ms: float = 1500
+    huge: float = 0.02
+    huge_kb: int = 4096
+    hang: float = 0.01
+    hang_s: float = 120
+    error: float = 0.03
+    dead: float = 0.05
+    shopify: float = 0.3
+    emails_per_site: int = 2
+    seed: int = 42
+
+
+def site_host(index: int) -> str:
+    return f"site{index}.{FARM_TLD}"
+
+
+def site_index(host: str) -> Optional[int]:
+    """Return N for ``site<N>.test[:port]``, or None for any other host."""
+    name = host.split(':', 1)[0]
+    if not name.startswith('site') or not name.endswith('.' + FARM_TLD):
+        return None
+    number = name[4:-len(FARM_TLD) - 1]
+    return int(number) if number.isdigit() else None
+
+
+class Farm:
+    """The deterministic site plan shared by the server and the benchmark client."""
+
+    def __init__(self, config: FarmConfig):
+        self.config = config
+
+    def _rng(self, index: int) -> random.Random:
+        return random.Random(self.config.seed * 1000003 + index)
+
+    def kind(self, index: int) -> str:
+        roll = self._rng(index).random()
+        for kind in KINDS[:-1]:
+            share = getattr(self.config, kind)
+            if roll < share:
+                return kind
+            roll -= share
+        return 'normal'
+
+    def is_shopify(self, index: int) -> bool:
+        rng = self._rng(index)
+        rng.random()
+        return rng.random() < self.config.shopify
+
+    def emails(self, index: int) -> List[str]:
+        return [f"{name}{index}@{site_host(index)}"
+                for name in ('info', 'sales', 'hello', 'orders')[:self.config.emails_per_site]]
+
+
+class FarmServer:
+    """aiohttp application serving the farm and recording what it was asked."""
+
+    def __init__(self, config: FarmConfig):
+        self.config = config
+        self.farm = Farm(config)
+        self.padding = self._build_padding(config.huge_kb * 1024)
+        self.reset()
+
+    @staticmethod
+    def _build_padding(size: int) -> bytes:
+        block = ('<div class="product-card"><img srcset="/cdn/shop/products/item@2x.png 2x" alt="Item">'
+                 '<a href="/products/item">Premium product</a><span class="price">$ 19.99</span></div>\n')
+        return (block * (size // len(block) + 1)).encode()[:size]
+
+    def reset(self) -> None:
+        self.requests: Dict[str, int] = {'home': 0, 'contact': 0, 'search': 0, 'other': 0}
+        self.spans: Dict[str, List[float]] = {}
+        self.search_durations: List[float] = []
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        return app
+
+    async def _pause(self, extra_ms: float = 0) -> None:
+        jitter = random.uniform(0, self.config.jitter_ms)
+        await asyncio.sleep((self.config.latency_ms + jitter + extra_ms) / 1000)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        path = request.path
+        if path == '/__stats':
+            return web.json_response(self.stats())
+        if path == '/__reset':
+            self.reset()
+            return web.json_response({})
+
+        start = time.monotonic()
+        index = site_index(request.host)
+        kind = 'search' if index is None and path == '/search' else \
+            'home' if path == '/' else 'contact' if path == '/pages/contact' else 'other'
+        self.requests[kind] += 1
+        span = None
+        if index is not None:
+            span = self.spans.setdefault(request.host, [start, start])
+        try:
+            if index is None:
+                if path == '/search':
+                    return await self.search(request)
+                return web.Response(status=404)
+            return await self.site(index, path)
+        finally:
+            # Runs on client disconnect too, as handlers are cancelled then
+            end = time.monotonic()
+            if span is not None:
+                span[1] = max(span[1], end)
+            elif kind == 'search':
+                self.search_durations.append(end - start)
+
+    async def site(self, index: int, path: str) -> web.Response:
+        kind = self.farm.kind(index)
+        if kind == 'hang':
+            await asyncio.sleep(self.config.hang_s)
+        await self._pause(self.config.slow_ms if kind == 'slow' else 0)
+        if kind in ('error', 'dead'):
+            return web.Response(status=500)
+        if path == '/':
+            return web.Response(body=self.homepage(index, kind), content_type='text/html')
+        if path == '/pages/contact':
+            return web.Response(text=self.contact_page(index), content_type='text/html')
+        return web.Response(status=404)
+
+    def homepage(self, index: int, kind: str) -> bytes:
+        head = '<script src="https://cdn.shopify.com/s/files/1/theme.js"></script>' \
+            if self.farm.is_shopify(index) else '<link rel="stylesheet" href="/assets/site.css">'
+        emails = self.farm.emails(index)
+        body = (f'<html><head><title>Site {index}</title>{head}</head><body>'
+                f'<header><a href="/pages/contact">Contact us</a></header>'
+                f'<p>Write to {emails[0] if emails else "us"} for orders.</p>')
+        padding = self.padding if kind == 'huge' else b''
+        return body.encode() + padding + b'</body></html>'
+
+    def contact_page(self, index: int) -> str:
+        host = site_host(index)
+        parts = [f'{email.split("@")[0]} [at] {host.replace(".", " [dot] ")}' for email in self.farm.emails(index)]
+        return (f'<html><body><h1>Contact</h1><p>{", ".join(parts)}</p>'
+                f'<a href="mailto:support&#64;{host}">Support</a></body></html>')
+
+    async def search(self, request: web.Request) -> web.Response:
+        """Fake SerpAPI: ranks farm sites, then article pages of the same sites."""
+        await self._pause()
+        num = min(100, int(request.query.get('num', 10)))
+        start = int(request.query.get('start', 0))
+        port = request.transport.get_extra_info('sockname')[1]
+        sites = self.config.sites
+        results = []
+        for rank in range(start, min(start + num, sites * 3)):
+            link = f"http://{site_host(rank % sites)}:{port}/"
+            if rank >= sites:
+                link += f"blog/post-{rank // sites}"
+            results.append({"position": rank + 1, "link": link, "title": f"Result {rank + 1}"})
+        return web.json_response({"organic_results": results})
+
+    def stats(self) -> dict:
+        return {
+            "requests": dict(self.requests, total=sum(self.requests.values())),
+            "site_latencies": [end - start for start, end in self.spans.values()],
+            "search_latencies": self.search_durations,
+        }
+
+
+async def serve(config: FarmConfig, host: str = '127.0.0.1', port: int = 0, ready=None) -> None:
+    server = FarmServer(config)
+    # Cancel handlers on disconnect so hanging pages stop counting once the client gives up
+    runner = web.AppRunner(server.app(), handler_cancellation=True, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port, backlog=4096)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    if ready is not None:
+        ready.put(bound_port)
+    else:
+        print(f"Mock farm serving {config.sites} sites on http://{host}:{bound_port}")
+    await asyncio.Event().wait()
+
+
+def _serve_in_process(config_dict: dict, ready) -> None:
+    asyncio.run(serve(FarmConfig(**config_dict), ready=ready))
+
+
+class FarmProcess:
+    """
+    Run the farm in a child process, so its CPU and memory stay out of the
+    benchmarked process. Use as a context manager.
+    """
+
+    def __init__(self, config: FarmConfig):
+        self.config = config
+        self.farm = Farm(config)
+        self.port: Optional[int] = None
+        self.process = None
+
+    def __enter__(self) -> 'FarmProcess':
+        context = multiprocessing.get_context('spawn')
+        ready = context.Queue()
+        self.process = context.Process(target=_serve_in_process, args=(asdict(self.config), ready), daemon=True)
+        self.process.start()
+        self.port = ready.get(timeout=60)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.process.terminate()
+        self.process.join(timeout=10)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def site_url(self, index: int, path: str = '/') -> str:
+        return f"http://{site_host(index)}:{self.port}{path}"
+
+    def stats(self) -> dict:
+        return requests.get(self.base_url + '/__stats', timeout=30).json()
+
+    def reset(self) -> None:
+        requests.post(self.base_url + '/__reset', timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sites', type=int, default=FarmConfig.sites, help='Number of virtual hosts')
+    parser.add_argument('--port', type=int, default=8900, help='Port to listen on')
+    args = parser.parse_args()
+    asyncio.run(serve(FarmConfig(sites=args.sites), port=args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+End-to-end benchmark of the search, filter and email stages against a
+local mock web farm (see benchmarks/mock_farm.py), fully offline.
+
+Farm hostnames are answered from the shared DNS cache, so no lookup leaves
+the machine. Dead sites are cached as failed lookups. The SerpAPI client is
+pointed at the farm's fake search endpoint. All stages share one farm,
+whose statistics are reset before each stage along with the host health
+and search caches, so every stage starts cold. The benchmark reports
+sites/s, p50/p95/p99 per-site latency (measured by the farm, from a
+host's first request to its last response), peak RSS and the requests
+served.
+
+Usage (from the backend directory):
+    python -m benchmarks.pipeline_benchmark --sites 2000 --stages search,filter,emails,pipeline
+    PARSE_MODE=process python -m benchmarks.pipeline_benchmark --sites 5000 --json results.json
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import resource
+import socket
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.emails.fetch_emails import fetch_emails_from_csv
+from app.filters import fetch_sites
+from app.filters.fetch_sites import SiteFetcher
+from app.filters.filter_sites import apply_filters
+from app.pipeline import run_pipeline
+from app.utils.dns_cache import dns_cache
+from app.utils.host_health import host_health
+
+from .mock_farm import FarmConfig, FarmProcess, site_host
+
+STAGES = ('search', 'filter', 'emails', 'pipeline')
+
+
+class PeakRss:
+    """Samples this process's resident set size in a background thread and keeps the peak."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current() -> int:
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            # No procfs: fall back to the lifetime peak, in KB on Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+    def __enter__(self) -> 'PeakRss':
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def seed_dns(farm: FarmProcess) -> None:
+    """Answer farm hostnames locally: live sites resolve to loopback, dead ones fail."""
+    dns_cache.ttl = dns_cache.negative_ttl = float('inf')
+    for index in range(farm.config.sites):
+        host = site_host(index)
+        addresses = None
+        if farm.farm.kind(index) != 'dead':
+            addresses = [{"hostname": host, "host": '127.0.0.1', "port": 0, "family": socket.AF_INET,
+                          "proto": 0, "flags": socket.AI_NUMERICHOST | socket.AI_NUMERICSERV}]
+        for family in (socket.AF_UNSPEC, socket.AF_INET):
+            dns_cache.put(host, family, addresses)
+
+
+def write_sites_csv(farm: FarmProcess, path: str) -> None:
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Website URL'])
+        for index in range(farm.config.sites):
+            writer.writerow([farm.site_url(index)])
+
+
+def run_stage(name: str, farm: FarmProcess, args, workdir: str) -> Dict:
+    input_csv = os.path.join(workdir, 'sites.csv')
+    output_csv = os.path.join(workdir, f'{name}_output.csv')
+    filters = args.filters.split(',') if args.filters else []
+
+    stages: Dict[str, Callable[[], None]] = {
+        'search': lambda: SiteFetcher('bench', cache=None, limiter=None, base_url=farm.base_url + '/search')
+            .fetch_relevant_sites('bench', result_count=farm.config.sites),
+        'filter': lambda: apply_filters(input_csv, filters, output_csv, max_workers=args.filter_workers),
+        'emails': lambda: fetch_emails_from_csv(input_csv, output_csv, max_workers=args.email_workers,
+                                                site_deadline=args.site_deadline),
+        'pipeline': lambda: run_pipeline('bench', '', '', farm.config.sites, filters, output_csv,
+                                         filter_workers=args.filter_workers, email_workers=args.email_workers),
+    }
+
+    # Every stage starts cold: no remembered host failures, cached searches or old farm stats
+    host_health.clear()
+    fetch_sites.search_cache.clear()
+    farm.reset()
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        stages[name]()
+        seconds = time.perf_counter() - start
+    stats = farm.stats()
+
+    latencies = stats['search_latencies'] if name == 'search' else stats['site_latencies']
+    return {
+        "stage": name,
+        "sites": farm.config.sites,
+        "seconds": seconds,
+        "sites_per_second": farm.config.sites / seconds if seconds else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "peak_rss_mb": rss.peak / (1024 * 1024),
+        "requests": stats['requests'],
+    }
+
+
+def format_seconds(value: Optional[float]) -> str:
+    return f"{value * 1000:8.0f}ms" if value is not None else f"{'-':>10}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sites', type=int, default=FarmConfig.sites, help='Number of sites in the farm')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"Comma-separated stages from {', '.join(STAGES)}")
+    parser.add_argument('--filters', default='active,shopify', help='Filters for the filter and pipeline stages')
+    parser.add_argument('--filter-workers', type=int, default=100, help='Concurrent site checks')
+    parser.add_argument('--email-workers', type=int, default=200, help='Concurrent site crawls')
+    parser.add_argument('--site-deadline', type=float, default=30, help='Seconds allowed per site in the email stage')
+    parser.add_argument('--latency-ms', type=float, default=FarmConfig.latency_ms, help='Base latency of farm responses')
+    parser.add_argument('--hang-s', type=float, default=FarmConfig.hang_s, help='How long hanging sites stall')
+    parser.add_argument('--seed', type=int, default=FarmConfig.seed, help='Seed of the farm layout')
+    parser.add_argument('--json', metavar='PATH', help='Also write the results as JSON')
+    parser.add_argument('--verbose', action='store_true', help='Keep application logging')
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    if not args.verbose:
+        # Per-site errors are expected here and would flood email_extraction.log
+        logging.disable(logging.ERROR)
+
+    config = FarmConfig(sites=args.sites, latency_ms=args.latency_ms, hang_s=args.hang_s, seed=args.seed)
+    results = []
+    with FarmProcess(config) as farm, tempfile.TemporaryDirectory() as workdir:
+        seed_dns(farm)
+        write_sites_csv(farm, os.path.join(workdir, 'sites.csv'))
+        # The pipeline builds its own SiteFetcher, so point the default endpoint at the farm
+        fetch_sites.SERPAPI_URL = farm.base_url + '/search'
+        fetch_sites.serpapi_limiter.rate = 0
+
+        kinds = [farm.farm.kind(index) for index in range(config.sites)]
+        print(f"Farm: {config.sites} sites on port {farm.port} "
+              f"({', '.join(f'{kind} {kinds.count(kind)}' for kind in sorted(set(kinds)))})")
+        print(f"{'stage':>10} {'seconds':>9} {'sites/s':>9} {'p50':>10} {'p95':>10} {'p99':>10} "
+              f"{'peak RSS':>10} {'requests':>9}")
+        for stage in stages:
+            result = run_stage(stage, farm, args, workdir)
+            results.append(result)
+            print(f"{stage:>10} {result['seconds']:9.2f} {result['sites_per_second']:9.1f} "
+                  f"{format_seconds(result['p50'])} {format_seconds(result['p95'])} {format_seconds(result['p99'])} "
+                  f"{result['peak_rss_mb']:8.1f}MB {result['requests']['total']:9d}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+import os
+
+# Background jobs, their progress and their event streams live in the memory
+# of the process that started them, so the app is served by a single worker.
+# Threads keep long-lived event streams from blocking other requests.
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = 1
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+# The single server process is the one that deletes expired files
+raw_env = ['JANITOR_ENABLED=' + os.getenv('JANITOR_ENABLED', '1')]
+
+
+def on_starting(server):
+    if server.cfg.workers != 1:
+        raise RuntimeError(
+            f"The app must run in a single worker process (got {server.cfg.workers}); "
+            "raise GUNICORN_THREADS for more concurrent requests instead")
@@ -0,0 +1,63 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from app.utils.checkpoint_manager import CheckpointManager, JobCheckpoint
+
+
+def test_resume_restores_rows_and_state(tmp_path):
+    manager = CheckpointManager(str(tmp_path), prefix='job-')
+    checkpoint = JobCheckpoint.open(manager, 'emails', 'abc', {'column': 'url'}, interval=0)
+    checkpoint.record(0, ['a@example.com'])
+    checkpoint.record(2, None)
+    checkpoint.update(start=3)
+    checkpoint.save()
+
+    resumed = JobCheckpoint.open(manager, 'emails', 'abc', {'column': 'url'})
+    assert resumed.completed == {0: ['a@example.com'], 2: None}
+    assert resumed.state == {'start': 3}
+
+
+def test_saves_append_only_new_rows(tmp_path):
+    manager = CheckpointManager(str(tmp_path), prefix='job-')
+    checkpoint = JobCheckpoint.open(manager, 'filter', 'abc', {}, interval=0)
+    for index in range(3):
+        checkpoint.record(index, f'https://{index}.example')
+        checkpoint.save()
+
+    rows_path = tmp_path / 'job-filter_abc.jsonl'
+    assert len(rows_path.read_text().splitlines()) == 3
+    assert 'completed' not in json.loads((tmp_path / 'job-filter_abc.json').read_text())['data']
+
+
+def test_truncated_last_row_is_skipped(tmp_path):
+    manager = CheckpointManager(str(tmp_path), prefix='job-')
+    checkpoint = JobCheckpoint.open(manager, 'filter', 'abc', {}, interval=0)
+    checkpoint.record(0, 'https://example.com')
+    checkpoint.save()
+    with open(tmp_path / 'job-filter_abc.jsonl', 'a') as f:
+        f.write('[1, "https://exa')
+
+    assert JobCheckpoint.open(manager, 'filter', 'abc', {}).completed == {0: 'https://example.com'}
+
+
+def test_delete_removes_rows(tmp_path):
+    manager = CheckpointManager(str(tmp_path), prefix='job-')
+    checkpoint = JobCheckpoint.open(manager, 'filter', 'abc', {}, interval=0)
+    checkpoint.record(0, None)
+    checkpoint.save()
+    checkpoint.delete()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cleanup_reads_naive_timestamps_as_utc(tmp_path):
+    manager = CheckpointManager(str(tmp_path), prefix='job-')
+    manager.save_checkpoint('filter', {}, checkpoint_id='old')
+    path = tmp_path / 'job-filter_old.json'
+    stored = json.loads(path.read_text())
+    stored['metadata']['created_at'] = (datetime.now(timezone.utc) - timedelta(days=8)).replace(tzinfo=None).isoformat()
+    path.write_text(json.dumps(stored))
+    manager.save_checkpoint('filter', {}, checkpoint_id='new')
+
+    assert manager.cleanup_old_checkpoints(max_age_days=7) == 1
+    assert [p.name for p in tmp_path.iterdir()] == ['job-filter_new.json']
@@ -0,0 +1,50 @@
+import asyncio
+import socket
+
+import pytest
+
+from app.utils.dns_cache import CachingResolver, DnsCache, _is_definitive
+
+
+@pytest.mark.parametrize('error, definitive', [
+    (socket.gaierror(socket.EAI_NONAME, 'Name or service not known'), True),
+    (socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution'), False),
+    (socket.gaierror(socket.EAI_FAIL, 'Non-recoverable failure in name resolution'), False),
+    (ConnectionResetError(), False),
+    (OSError('DNS lookup timed out'), False),
+    (UnicodeError('label too long'), True),
+])
+def test_is_definitive(error, definitive):
+    assert _is_definitive(error) is definitive
+
+
+@pytest.mark.skipif(not hasattr(socket, 'EAI_NODATA'), reason='EAI_NODATA not defined on this platform')
+def test_no_data_is_definitive():
+    assert _is_definitive(socket.gaierror(socket.EAI_NODATA, 'No address associated with hostname'))
+
+
+def lookups(failure):
+    """Resolve a host twice through a resolver whose queries fail with ``failure``; return (resolves, queries)."""
+    queries = []
+
+    async def getaddrinfo(host, family):
+        queries.append(host)
+        raise failure
+
+    async def run():
+        resolver = CachingResolver(cache=DnsCache())
+        resolver._getaddrinfo = getaddrinfo
+        try:
+            return [await resolver.resolves('http://shop.test/') for _ in range(2)]
+        finally:
+            await resolver.close()
+
+    return asyncio.run(run()), len(queries)
+
+
+def test_missing_domain_is_cached_as_dead():
+    assert lookups(socket.gaierror(socket.EAI_NONAME, 'not found')) == ([False, False], 1)
+
+
+def test_transient_failure_is_neither_cached_nor_dead():
+    assert lookups(socket.gaierror(socket.EAI_AGAIN, 'try again')) == ([True, True], 2)
@@ -0,0 +1,54 @@
+import pytest
+
+from app.emails.email_extractor import MAX_LOCAL_LENGTH, EmailExtractor, extract_emails
+
+
+@pytest.mark.parametrize('text', [
+    'Write to sales@shop.com today',
+    'sales&#64;shop.com',
+    'sales&#x40;shop.com',
+    'sales&commat;shop.com',
+    'sales%40shop.com',
+    'sales [at] shop [dot] com',
+    'sales (at) shop (dot) com',
+    'sales{at}shop&#46;com',
+    'sales [AT] shop.com',
+])
+def test_obfuscated_addresses_are_decoded(text):
+    assert extract_emails(text) == ['sales@shop.com']
+
+
+def test_script_and_style_bodies_are_skipped():
+    html = ('<script>var a = "tracker@analytics.com";</script>'
+            '<style>.x { content: "css@styles.com" }</style>'
+            '<p>hello@shop.com</p>')
+    assert extract_emails(html) == ['hello@shop.com']
+
+
+def test_json_ld_scripts_are_scanned():
+    html = '<script type="application/ld+json">{"email": "contact@shop.com"}</script>'
+    assert extract_emails(html) == ['contact@shop.com']
+
+
+def test_image_names_and_placeholders_are_rejected():
+    html = '<img src="logo@2x.png"> you@example.com support@shop.com'
+    assert extract_emails(html) == ['support@shop.com']
+
+
+def test_overlong_local_part_is_rejected_not_truncated():
+    overlong = 'a' * (MAX_LOCAL_LENGTH + 10) + '@shop.com'
+    assert extract_emails(overlong) == []
+    longest = 'b' * MAX_LOCAL_LENGTH + '@shop.com'
+    assert extract_emails(f'{overlong} {longest}') == [longest]
+
+
+def test_addresses_are_lowercased_and_deduplicated():
+    assert extract_emails('Info@Shop.com, info@shop.com') == ['info@shop.com']
+
+
+def test_limit_and_seen_span_several_pieces():
+    extractor = EmailExtractor()
+    seen = {}
+    assert extractor.extract('a@shop.com b@shop.com', seen=seen) == ['a@shop.com', 'b@shop.com']
+    assert extractor.extract('b@shop.com c@shop.com d@shop.com', limit=3, seen=seen) == ['c@shop.com']
+    assert list(seen) == ['a@shop.com', 'b@shop.com', 'c@shop.com']
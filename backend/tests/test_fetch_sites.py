@@ -0,0 +1,63 @@
+import pytest
+import requests
+
+from app.filters.fetch_sites import SiteFetcher
+
+
+class Health:
+    def acquire_sync(self, url):
+        pass
+
+    def record(self, url, status=None, headers=None, error=False):
+        pass
+
+
+class Session:
+    """Answers each request with the next of ``outcomes``: a status code or an exception."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url, params=None):
+        outcome = self.outcomes[self.calls]
+        self.calls += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response._content = b'{"organic_results": [{"link": "https://example.com"}]}'
+        return response
+
+
+def fetcher(session):
+    site_fetcher = SiteFetcher('key', cache=None, limiter=None, health=Health())
+    site_fetcher.session = session
+    return site_fetcher
+
+
+@pytest.mark.parametrize('outcome', [
+    requests.ConnectionError('reset'),
+    requests.ReadTimeout('slow'),
+    429,
+    503,
+])
+def test_transient_errors_are_retried(outcome):
+    session = Session(outcome, 200)
+    assert fetcher(session)._get_page('shoes', 0) == [{'link': 'https://example.com'}]
+    assert session.calls == 2
+
+
+@pytest.mark.parametrize('status', [400, 401, 403, 404])
+def test_client_errors_are_raised_at_once(status):
+    session = Session(status, 200)
+    with pytest.raises(requests.HTTPError):
+        fetcher(session)._get_page('shoes', 0)
+    assert session.calls == 1
+
+
+def test_retries_stop_after_max_retries():
+    session = Session(500, 500, 500, 200)
+    with pytest.raises(requests.HTTPError):
+        fetcher(session)._get_page('shoes', 0)
+    assert session.calls == 3
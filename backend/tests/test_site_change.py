@@ -0,0 +1,72 @@
+import asyncio
+import hashlib
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.filters.filter_sites import PROBE_PREFIX_BYTES, ProbeResult, SiteFilter, site_change
+from app.utils.host_health import HostHealth
+
+SHOPIFY_PAGE = b'<script src="https://cdn.shopify.com/s/files/theme.js"></script>'
+
+
+def previous(active=True, shopify=True, platform='shopify'):
+    return {'active': active, 'shopify': shopify, 'platform': platform}
+
+
+@pytest.mark.parametrize('before, result, change', [
+    (None, ProbeResult('u', 'GET', status=200), 'new'),
+    (previous(active=None), ProbeResult('u', 'GET', status=200), 'new'),
+    (previous(), ProbeResult('u', 'GET', status=404), 'dead'),
+    (previous(), ProbeResult('u', 'GET', error='DNS lookup failed'), 'dead'),
+    (previous(active=False, shopify=None, platform=None), ProbeResult('u', 'GET', status=200), 'alive'),
+    (previous(), ProbeResult('u', 'GET', status=200, shopify=False, platform='woocommerce'), 'platform'),
+    (previous(), ProbeResult('u', 'GET', status=200, shopify=True, platform='shopify'), None),
+    # A page that was not fingerprinted again says nothing about its platform
+    (previous(), ProbeResult('u', 'GET', status=200), None),
+])
+def test_site_change(before, result, change):
+    assert site_change(before, result) == change
+
+
+class Resolver:
+    async def resolves(self, url):
+        return True
+
+
+def probe(body, validators):
+    """Serve ``body`` and probe it with ``validators``."""
+    async def page(request):
+        return web.Response(body=body, content_type='text/html')
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/', page)
+        async with TestServer(app) as server:
+            async with SiteFilter(resolver=Resolver(), health=HostHealth(rate=1000, burst=1000)) as filterer:
+                return await filterer.probe(str(server.make_url('/')), detect_platform=True,
+                                            validators=validators)
+
+    return asyncio.run(run())
+
+
+def test_same_body_is_unchanged_and_not_fingerprinted():
+    body = SHOPIFY_PAGE + b' ' * (2 * PROBE_PREFIX_BYTES)
+    result = probe(body, {'content_hash': hashlib.sha256(body).hexdigest()})
+    assert result.unchanged
+    assert result.shopify is None
+
+
+def test_edit_past_the_prefix_is_seen():
+    body = SHOPIFY_PAGE + b' ' * (2 * PROBE_PREFIX_BYTES)
+    result = probe(body + b'<p>new</p>', {'content_hash': hashlib.sha256(body).hexdigest()})
+    assert not result.unchanged
+    assert result.content_hash == hashlib.sha256(body + b'<p>new</p>').hexdigest()
+    assert result.shopify is True
+
+
+def test_hash_is_only_kept_for_fully_read_bodies():
+    small = SHOPIFY_PAGE
+    assert probe(small, None).content_hash == hashlib.sha256(small).hexdigest()
+    assert probe(small + b' ' * (2 * PROBE_PREFIX_BYTES), None).content_hash is None
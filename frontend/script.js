@@ -35,6 +35,87 @@ function showSuccess(message) {
   setTimeout(() => successDiv.remove(), 3000);
 }
 
+// --- Helper: Format job progress for a button label ---
+function formatProgress(job) {
+  if (job.status === 'queued') return 'Queued...';
+  let text = job.total ? `Processing ${job.done}/${job.total}` : `Processing ${job.done}`;
+  // Uploads are streamed, so the row count is unknown; show how much of the file was read
+  if (!job.total && job.bytes_total) text += ` (${Math.floor(100 * job.bytes_read / job.bytes_total)}% of file)`;
+  if (job.eta !== null && job.eta !== undefined) text += ` (ETA ${Math.ceil(job.eta)}s)`;
+  return text + '...';
+}
+
+// --- Helper: Poll a background job until it finishes ---
+async function waitForJob(statusUrl, onProgress, interval = 1000) {
+  while (true) {
+    const response = await fetch(`${API_BASE_URL}${statusUrl}`);
+    const job = await response.json();
+    if (!response.ok) {
+      throw new Error(job.error || 'Failed to get job status');
+    }
+    if (job.status === 'succeeded') return job;
+    if (job.status === 'failed') throw new Error(job.error || 'Job failed');
+    if (job.status === 'cancelled') throw new Error('Job cancelled');
+    if (onProgress) onProgress(job);
+    await new Promise(resolve => setTimeout(resolve, interval));
+  }
+}
+
+// --- Helper: Render streamed rows into the results card ---
+function createResultsTable() {
+  const card = document.getElementById('resultsCard');
+  const container = document.getElementById('resultsTableContainer');
+  container.innerHTML = '';
+  card.style.display = 'none';
+  let tbody = null;
+
+  return function addRow(row) {
+    if (!tbody) {
+      const table = document.createElement('table');
+      const headRow = table.createTHead().insertRow();
+      Object.keys(row).forEach(key => {
+        const th = document.createElement('th');
+        th.textContent = key;
+        headRow.appendChild(th);
+      });
+      tbody = table.createTBody();
+      container.appendChild(table);
+      card.style.display = '';
+    }
+    const tr = tbody.insertRow();
+    Object.values(row).forEach(value => {
+      tr.insertCell().textContent = value;
+    });
+  };
+}
+
+// --- Helper: Stream a background job's rows and progress until it finishes ---
+function streamJob(statusUrl, onRow, onProgress) {
+  if (!window.EventSource) {
+    return waitForJob(statusUrl, onProgress);
+  }
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${API_BASE_URL}${statusUrl}/stream`);
+    source.addEventListener('row', e => onRow(JSON.parse(e.data)));
+    source.addEventListener('progress', e => {
+      if (onProgress) onProgress(JSON.parse(e.data));
+    });
+    source.addEventListener('end', e => {
+      source.close();
+      const job = JSON.parse(e.data);
+      if (job.status === 'succeeded') resolve(job);
+      else if (job.status === 'cancelled') reject(new Error('Job cancelled'));
+      else reject(new Error(job.error || 'Job failed'));
+    });
+    source.onerror = () => {
+      // The stream is lost for good; fall back to polling for the outcome
+      if (source.readyState === EventSource.CLOSED) {
+        waitForJob(statusUrl, onProgress).then(resolve, reject);
+      }
+    };
+  });
+}
+
 // --- Fetch Websites Logic ---
 if (fetchForm) {
   fetchForm.addEventListener('submit', async (e) => {
@@ -71,9 +152,10 @@ if (fetchForm) {
         throw new Error(data.error || data.message || 'Failed to fetch sites');
       }
 
-      if (data.status === 'success') {
+      if (data.status === 'accepted') {
+        const job = await waitForJob(data.status_url, job => { fetchBtn.textContent = formatProgress(job); });
         showSuccess('Sites fetched successfully! Downloading file...');
-        await downloadFile(data.file, 'Websites_Fetched.csv');
+        await downloadFile(job.result.file, 'Websites_Fetched.csv');
         showSuccess('Download complete!');
       } else {
         showError(data.error || data.message || 'Failed to fetch sites');
@@ -145,13 +227,15 @@ if (applyFiltersBtn) {
         body: formData
       });
       const data = await response.json();
-      if (data.status === 'success') {
-        await downloadFile(data.file, 'Websites_Filtered.csv');
+      if (data.status === 'accepted') {
+        const addRow = createResultsTable();
+        const job = await streamJob(data.status_url, addRow, job => { applyFiltersBtn.textContent = formatProgress(job); });
+        await downloadFile(job.result.file, 'Websites_Filtered.csv');
       } else {
         showError(data.error || data.message || 'Failed to filter sites');
       }
     } catch (err) {
-      showError('Error filtering sites');
+      showError(err.message || 'Error filtering sites');
     }
     applyFiltersBtn.disabled = false;
     applyFiltersBtn.textContent = 'Apply Filters';
@@ -209,9 +293,15 @@ if (fetchEmailBtn) {
         throw new Error(data.error || 'Failed to fetch emails');
       }
 
-      if (data.status === 'success' && data.file) {
+      if (data.status !== 'accepted') {
+        throw new Error(data.error || 'Failed to start email extraction');
+      }
+
+      const addRow = createResultsTable();
+      const job = await streamJob(data.status_url, addRow, job => { fetchEmailBtn.textContent = formatProgress(job); });
+      if (job.result && job.result.file) {
         showSuccess('Emails fetched successfully! Downloading file...');
-        await downloadFile(data.file, 'Emails_Extracted.csv');
+        await downloadFile(job.result.file, 'Emails_Extracted.csv');
         showSuccess('Download complete!');
       } else {
         throw new Error('No file received from server');